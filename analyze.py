@@ -0,0 +1,273 @@
+"""
+Filename : analyze.py
+Summary  : single-pass, constant-memory analyzer of sender and receiver event logs
+Author   : HyunJun KIM (2019204054)
+"""
+
+import argparse, collections, datetime, heapq, json, re, sys  # python built-in modules
+import eventlog, metrics  # custom modules
+
+LINE = re.compile(r'^(\S+ \S+) \[([^\]]+)\] (.+)$')  # text log line : time, tag, message
+MESSAGE = re.compile(r'^(.+) : (-?\d+)$')  # event text : seq, of eventlog.py and most former lines
+LEGACY = [  # former recvlog.txt/sendlog.txt messages of another shape : event text, seq, ack sent with it
+    re.compile(r'^(Received (?:Not )?Expected) ?(-?\d+), Sending ACK (-?\d+)$'),
+    re.compile(r'^(ACK LOSS Occured) at seq (-?\d+)$'),
+    re.compile(r'^(Duplicated) : (-?\d+) pass this sequence$'),
+]
+SKIPPED = re.compile(r'^RTT : Sleep ')  # former sender delay lines, no event
+TEXTS = {text: code for code, (text, _) in enumerate(eventlog.EVENTS)}  # event text -> event code
+OPEN_LIMIT = 65536  # sequences tracked at once, the oldest is closed as undelivered first
+DELIVERED = 'delivered'  # time bucket key of in-order deliveries, next to event codes
+ARRIVALS = (eventlog.RECV_EXPECTED, eventlog.RECV_UNEXPECTED, eventlog.DUPLICATED, eventlog.FEC_RECOVERED)
+
+
+def read_text(path):
+    """
+    read text log of the former sendlog.txt/recvlog.txt format, or eventlog.py output
+    a former 'Received Expected N, Sending ACK M' line gives the arrival and the ack event, like eventlog.py does
+    :param path: log file path
+    :return iterator of (wall clock ns, tag, event code, seq), lines that do not parse are counted on stderr
+    """
+    epoch = datetime.datetime(1970, 1, 1)
+    unknown = 0  # lines that are no event
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            events = _parse(line.rstrip('\n'))
+            if events is None:
+                unknown += 1
+                continue
+            for stamp, tag, event, seq in events:
+                delta = datetime.datetime.fromisoformat(stamp) - epoch  # local time, only differences matter
+                yield (delta.days * 86400 + delta.seconds) * 10 ** 9 + delta.microseconds * 1000, tag, event, seq
+    if unknown:
+        print('warning : ' + path + ' : ' + str(unknown) + ' lines not understood, skipped', file=sys.stderr)
+
+
+def _parse(line):  # events of one text log line, None if it is not understood
+    if not line.strip():
+        return []
+    match = LINE.match(line)
+    if match is None:
+        return None
+    stamp, tag, message = match.groups()
+    if SKIPPED.match(message):
+        return []
+    match = MESSAGE.match(message)
+    if match is not None and match.group(1) in TEXTS:
+        return [(stamp, tag, TEXTS[match.group(1)], int(match.group(2)))]
+    for pattern in LEGACY:
+        match = pattern.match(message)
+        if match is not None:
+            text, seq, ack = (match.groups() + (None,))[:3]
+            events = [(stamp, tag, TEXTS[text], int(seq))]
+            if ack is not None:
+                events.append((stamp, tag, eventlog.SEND_ACK, int(ack)))
+            return events
+    return None
+
+
+def read(path):
+    """
+    read binary or text event log, told apart by the chunk magic
+    :param path: log file path
+    :return iterator of (wall clock ns, tag, event code, seq)
+    """
+    with open(path, 'rb') as f:
+        binary = f.read(len(eventlog.MAGIC)) == eventlog.MAGIC
+    return eventlog.decode(path) if binary else read_text(path)
+
+
+class Timeline:
+    """
+    life of one sequence number : first send, retransmissions, losses, first arrival, in-order delivery and ack
+    """
+    __slots__ = ('sent', 'resent', 'lost', 'arrived', 'delivered', 'acked')
+
+    def __init__(self, sent):
+        self.sent = sent  # first send time in ns
+        self.resent = 0  # retransmissions
+        self.lost = 0  # copies lost on the emulated link
+        self.arrived = None  # time the first copy reached the receiver
+        self.delivered = None  # time of in-order delivery
+        self.acked = None  # time of the first ack covering it
+
+
+class Analyzer:
+    """
+    folds events of one protocol tag into totals, per-packet figures and time buckets,
+    a sequence is kept only while it is open (sent and not acked), so memory follows the window, not the log size
+    acks are cumulative unless exact_ack, where an ack names the one packet it answers (rdt 3.0)
+    a packet is delivered at 'Received Expected', or at the first ack covering it when it waited in the
+    reorder buffer (SR logs no event when the gap is filled)
+    """
+    def __init__(self, bucket=1.0, limit=OPEN_LIMIT, exact_ack=False):
+        self.bucket = int(bucket * 1e9)  # time bucket width in ns
+        self.limit = limit
+        self.exact_ack = exact_ack
+        self.events = collections.Counter()  # event code -> count
+        self.latency = metrics.Histogram()  # first send to delivery in seconds
+        self.arrival = metrics.Histogram()  # first send to first arrival in seconds
+        self.retransmits = collections.Counter()  # retransmissions of a packet -> packets
+        self.delivered = 0  # sequences delivered
+        self.undelivered = 0  # sequences closed without delivery
+        self.spurious = 0  # retransmissions of sequences already acked
+        self.buckets = collections.defaultdict(collections.Counter)  # bucket index -> event code -> count
+        self.first = None  # time of the first event in ns
+        self.last = None  # time of the last event in ns
+        self._open = collections.OrderedDict()  # seq -> Timeline
+
+    def feed(self, ns, event, seq):  # one log record
+        if self.first is None:
+            self.first = ns
+        self.last = ns
+        self.events[event] += 1
+        self.buckets[(ns - self.first) // self.bucket][event] += 1
+        if seq < 0:  # end sign, parity
+            return
+        if event == eventlog.SEND_ACK:
+            self._ack(ns, seq)
+            return
+        if event == eventlog.SEND:
+            if seq in self._open:  # sequence number reused (rdt 3.0 flag, wrap, next run in the same log)
+                self._close(seq)
+            self._open[seq] = Timeline(ns)
+            if len(self._open) > self.limit:
+                self._close(next(iter(self._open)))
+            return
+        timeline = self._open.get(seq)
+        if timeline is None:
+            if event == eventlog.RESEND:
+                self.spurious += 1
+            return
+        if event == eventlog.RESEND:
+            timeline.resent += 1
+        elif event == eventlog.DATA_LOSS:
+            timeline.lost += 1
+        elif event in ARRIVALS:
+            if timeline.arrived is None:
+                timeline.arrived = ns
+            if event == eventlog.RECV_EXPECTED and timeline.delivered is None:
+                self._deliver(timeline, ns)
+
+    def _deliver(self, timeline, ns):
+        timeline.delivered = ns
+        self.buckets[(ns - self.first) // self.bucket][DELIVERED] += 1
+
+    def _ack(self, ns, ack):  # mark open sequences answered by ack, close the delivered ones
+        done = []
+        for seq, timeline in self._open.items():  # first send order, ascending except for rdt 3.0 flags
+            if self.exact_ack and seq != ack:
+                continue
+            if seq > ack:
+                break
+            timeline.acked = ns
+            if timeline.delivered is None:
+                self._deliver(timeline, ns)
+            done.append(seq)
+        for seq in done:
+            self._close(seq)
+
+    def _close(self, seq):  # fold timeline into aggregates and forget it
+        timeline = self._open.pop(seq)
+        self.retransmits[timeline.resent] += 1
+        if timeline.delivered is None:
+            self.undelivered += 1
+        else:
+            self.delivered += 1
+            self.latency.record((timeline.delivered - timeline.sent) / 1e9)
+        if timeline.arrived is not None:
+            self.arrival.record((timeline.arrived - timeline.sent) / 1e9)
+
+    def finish(self):  # close every open sequence at end of log
+        for seq in list(self._open):
+            self._close(seq)
+
+    def summary(self):
+        """
+        :return dict of totals, ratios, latency percentiles and retransmission distribution
+        """
+        sends = self.events[eventlog.SEND]
+        resends = self.events[eventlog.RESEND]
+        span = (self.last - self.first) / 1e9 if self.first is not None else 0.0
+        return {'span': span,
+                'events': {eventlog.EVENTS[code][0]: count for code, count in sorted(self.events.items())},
+                'retransmission_ratio': resends / sends if sends else None,
+                'loss_ratio': self.events[eventlog.DATA_LOSS] / (sends + resends) if sends + resends else None,
+                'throughput': self.delivered / span if span else None,
+                'delivered': self.delivered, 'undelivered': self.undelivered, 'spurious': self.spurious,
+                'latency': self.latency.read(), 'arrival': self.arrival.read(),
+                'retransmits_per_packet': dict(sorted(self.retransmits.items()))}
+
+    def series(self):
+        """
+        :return list of (bucket start in seconds, sent, resent, lost, delivered, acks) per time bucket
+        """
+        rows = []
+        for index in range(max(self.buckets) + 1 if self.buckets else 0):
+            counts = self.buckets.get(index, {})
+            rows.append((index * self.bucket / 1e9, counts.get(eventlog.SEND, 0), counts.get(eventlog.RESEND, 0),
+                         counts.get(eventlog.DATA_LOSS, 0),
+                         counts.get(DELIVERED, 0), counts.get(eventlog.SEND_ACK, 0)))
+        return rows
+
+
+def analyze(paths, bucket=1.0):
+    """
+    merge logs by time and analyze each protocol tag, in one pass
+    :param paths: sender and/or receiver logs of the same run, binary or text
+    :param bucket: time bucket width in seconds
+    :return dict of tag -> finished Analyzer
+    """
+    analyzers = {}
+    for ns, tag, event, seq in heapq.merge(*[read(path) for path in paths], key=lambda record: record[0]):
+        analyzer = analyzers.get(tag)
+        if analyzer is None:
+            analyzer = analyzers[tag] = Analyzer(bucket, exact_ack=tag == 'RDT 3.0')
+        analyzer.feed(ns, event, seq)
+    for analyzer in analyzers.values():
+        analyzer.finish()
+    return analyzers
+
+
+def _ms(value):
+    return str(round(value * 1000, 2)) + 'ms' if value is not None else '-'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='per-sequence timeline analysis of event logs')
+    parser.add_argument('logs', nargs='+', help='sendlog/recvlog of one run, binary (.bin) or text')
+    parser.add_argument('--bucket', type=float, default=1.0, help='seconds per throughput bucket')
+    parser.add_argument('--json', help='write summaries to this JSON file')
+    parser.add_argument('--csv', help='write time buckets to this CSV file')
+    args = parser.parse_args()
+
+    analyzers = analyze(args.logs, args.bucket)
+    if not analyzers:
+        print('no events in ' + ', '.join(args.logs))
+        sys.exit(1)
+    summaries = {tag: analyzer.summary() for tag, analyzer in analyzers.items()}
+    for tag, summary in summaries.items():
+        print('[' + tag + '] ' + str(round(summary['span'], 3)) + 's')
+        for text, count in summary['events'].items():
+            print('  ' + text + ' : ' + str(count))
+        for name in ('retransmission_ratio', 'loss_ratio', 'throughput'):
+            if summary[name] is not None:
+                print('  ' + name + ' : ' + str(round(summary[name], 4)))
+        for name in ('arrival', 'latency'):
+            figures = summary[name]
+            if figures['count']:
+                print('  ' + name + ' : ' + ', '.join(key + ' ' + _ms(figures[key])
+                                                      for key in ('min', 'p50', 'p90', 'p99', 'max'))
+                      + ' (' + str(figures['count']) + ' packets)')
+        print('  delivered : ' + str(summary['delivered']) + ', undelivered : ' + str(summary['undelivered'])
+              + ', spurious retransmissions : ' + str(summary['spurious']) + ', retransmits per packet : '
+              + json.dumps(summary['retransmits_per_packet']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summaries, f, indent=1)
+    if args.csv:
+        with open(args.csv, 'w') as f:
+            f.write('tag,time,sent,resent,lost,delivered,acks\n')
+            for tag, analyzer in analyzers.items():
+                for row in analyzer.series():
+                    f.write(tag + ',' + ','.join(str(value) for value in row) + '\n')
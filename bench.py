@@ -0,0 +1,154 @@
+"""
+Filename : bench.py
+Summary  : reproducible throughput and latency benchmark of rdt 3.0, go-back-N and selective-repeat
+Author   : HyunJun KIM (2019204054)
+"""
+
+import argparse, asyncio, json, os, platform, random, sys, time  # python built-in modules
+import engine, metrics, sender, sim, sweep, transports, utils  # custom modules
+
+# standard scenarios
+PROTOCOLS = ('rdt3', 'gbn', 'sr')
+LOSSES = (0.0, 0.01, 0.1)
+RTTS = ((0.08, 0.12), (0.01, 0.02))  # long and short path
+WINDOWS = (10, 50)
+SEEDS = (1, 2, 3)  # every scenario runs once per seed
+DURATION = 10  # sending time of each run
+BASELINE = "bench_baseline.json"
+
+# metric -> (higher is better, relative tolerance) for regression checks
+CHECKS = {'goodput': (True, 0.02), 'efficiency': (True, 0.02), 'latency_p50': (False, 0.05),
+          'latency_p99': (False, 0.05), 'cpu_per_packet': (False, 0.25)}  # CPU time is noisy
+
+
+def scenario_key(params):  # 'gbn loss=0.1 rtt=0.08-0.12 window=50'
+    return params['protocol'] + ' loss=' + str(params['loss']) + ' rtt=' + str(params['rtt_min']) + '-' \
+           + str(params['rtt_max']) + ' window=' + str(params['window'])
+
+
+def run_scenario(params, duration, seeds, udp=False, transport='udp'):
+    """
+    run one scenario once per seed and pool the measurements
+    :param params: scenario dict made by sweep.grid()
+    :param duration: sending time of each run
+    :param seeds: random seeds, one run each
+    :param udp: loopback UDP with real timers instead of the virtual clock simulation
+    :param transport: datagram backend of the real timer run : udp, unix, shm
+    :return dict of goodput (packets/s), efficiency (delivered/sent), latency_p50 and latency_p99
+            (first send to in-order delivery, ms), cpu_per_packet (us) and the packet counts
+    """
+    registry = metrics.Registry()
+    delivered = sent = retransmitted = 0
+    cpu = 0.0
+    for seed in seeds:
+        watch = lambda core, receiver: metrics.watch_delivery(registry, core, receiver)
+        started = time.process_time()
+        if udp:
+            utils.LOSS_PROB = params['loss']
+            random.seed(seed)
+            core, receiver = asyncio.run(engine.transfer(
+                params['protocol'], params['window'], *sender.rto_bounds(params['timeout']), sender.TIMER_TICK,
+                sender.TIMER_SLOTS, duration, (params['rtt_min'], params['rtt_max']),
+                ack_every=sender.ACK_EVERY, ack_delay=sender.ACK_DELAY, watch=watch, transport=transport))
+        else:
+            core, receiver, _ = sim.simulate(params['protocol'], duration, params['window'],
+                                             *sender.rto_bounds(params['timeout']), sender.TIMER_TICK,
+                                             sender.TIMER_SLOTS, seed, params['loss'],
+                                             delay=('uniform', params['rtt_min'], params['rtt_max']),
+                                             ack_every=sender.ACK_EVERY, delayed_ack=sender.ACK_DELAY, watch=watch)
+        cpu += time.process_time() - started
+        delivered += receiver.delivered
+        sent += core.sent
+        retransmitted += core.retransmitted
+    latency = registry.histogram('delivery').read()
+    return {'goodput': round(delivered / (duration * len(seeds)), 3),
+            'efficiency': round(delivered / sent, 4) if sent else 0.0,
+            'latency_p50': round(latency['p50'] * 1000, 3) if latency['count'] else None,
+            'latency_p99': round(latency['p99'] * 1000, 3) if latency['count'] else None,
+            'cpu_per_packet': round(cpu / sent * 1e6, 2) if sent else None,
+            'delivered': delivered, 'sent': sent, 'retransmitted': retransmitted}
+
+
+def compare(results, baseline, scale=1.0):
+    """
+    find regressions against baseline
+    :param results: scenario key -> measurements
+    :param baseline: scenario key -> measurements of the stored baseline
+    :param scale: multiplier of every tolerance
+    :return list of regression lines
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if base.get('retransmitted') == 0 and result['retransmitted']:  # e.g. spurious timeouts on a lossless path
+            regressions.append(key + ' : retransmitted 0 -> ' + str(result['retransmitted']))
+        for name, (higher, tolerance) in CHECKS.items():
+            old, new = base.get(name), result.get(name)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher else change) > tolerance * scale:
+                regressions.append(key + ' : ' + name + ' ' + str(old) + ' -> ' + str(new)
+                                   + ' (' + ('+' if change > 0 else '') + str(round(change * 100, 1)) + '%)')
+    return regressions
+
+
+def environment(args):  # conditions a baseline is only comparable under
+    return {'mode': args.transport if args.udp else 'sim', 'duration': args.duration, 'seeds': args.seeds,
+            'python': platform.python_version(), 'machine': platform.machine()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='reproducible protocol benchmark with regression check')
+    parser.add_argument('--protocol', default=','.join(PROTOCOLS), help='comma separated : rdt3, gbn, sr')
+    parser.add_argument('--loss', default=','.join(str(x) for x in LOSSES), help='comma separated loss probabilities')
+    parser.add_argument('--rtt', default=','.join(str(low) + '-' + str(high) for low, high in RTTS),
+                        help='comma separated RTT ranges as min-max')
+    parser.add_argument('--window', default=','.join(str(x) for x in WINDOWS), help='comma separated window sizes')
+    parser.add_argument('--seeds', default=','.join(str(x) for x in SEEDS), help='comma separated random seeds')
+    parser.add_argument('--duration', type=float, default=DURATION, help='sending time of each run')
+    parser.add_argument('--udp', action='store_true', help='loopback UDP instead of virtual clock simulation')
+    parser.add_argument('--transport', choices=transports.TRANSPORTS,
+                        help='real timer run on this backend instead of simulation, implies --udp')
+    parser.add_argument('--baseline', default=BASELINE, help='stored baseline to compare against')
+    parser.add_argument('--save', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--tolerance-scale', type=float, default=1.0, help='multiplier of regression tolerances')
+    args = parser.parse_args()
+    if args.transport is not None:
+        args.udp = True
+    args.transport = args.transport or 'udp'
+
+    runs = sweep.grid(args.protocol.split(','), [float(x) for x in args.loss.split(',')],
+                      [sender.TIMEOUT_THRESHOLD], [sweep.parse_rtt(x) for x in args.rtt.split(',')],
+                      [int(x) for x in args.window.split(',')], 1)
+    seeds = [int(x) for x in args.seeds.split(',')]
+    results = {}
+    print('scenario'.ljust(44) + 'goodput'.rjust(10) + 'effic'.rjust(8) + 'p50 ms'.rjust(10) + 'p99 ms'.rjust(10)
+          + 'cpu us/pkt'.rjust(12))
+    for params in runs:
+        key = scenario_key(params)
+        result = results[key] = run_scenario(params, args.duration, seeds, args.udp, args.transport)
+        print(key.ljust(44) + str(result['goodput']).rjust(10) + str(result['efficiency']).rjust(8)
+              + str(result['latency_p50']).rjust(10) + str(result['latency_p99']).rjust(10)
+              + str(result['cpu_per_packet']).rjust(12), flush=True)
+
+    env = environment(args)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'environment': env, 'results': results}, f, indent=1, sort_keys=True)
+        print("Baseline saved to '" + args.baseline + "'")
+    elif not os.path.exists(args.baseline):
+        print("No baseline at '" + args.baseline + "', store one with --save")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['environment'] != env:
+            print('baseline was measured under ' + json.dumps(baseline['environment']) + ', not comparable')
+            sys.exit(2)
+        regressions = compare(results, baseline['results'], args.tolerance_scale)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        print(str(len(regressions)) + ' regressions against ' + str(len(baseline['results'])) + ' baseline scenarios')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,215 @@
+"""
+Filename : congestion.py
+Summary  : congestion control and pacing of go-back-N and selective-repeat senders
+Author   : HyunJun KIM (2019204054)
+"""
+
+import collections, time  # python built-in modules
+
+INITIAL_WINDOW = 10  # packets in flight before the first ack (RFC 6928)
+MIN_WINDOW = 2  # congestion window never drops below this after a loss
+
+
+class CongestionControl:
+    """
+    base of congestion controllers, windows are counted in packets
+    sender core calls on_ack() for newly acked packets, on_loss() when a loss is detected,
+    on_timeout() when the retransmission timer expires and undo() when an ack shows the loss was spurious
+    """
+    def __init__(self, max_window, clock=time.time):
+        self.max_window = max_window  # configured window size, never exceeded
+        self.clock = clock  # time source, virtual in simulation
+        self.srtt = None  # last smoothed RTT seen
+        self.losses = 0  # window reductions
+
+    def window(self):  # packets allowed in flight
+        raise NotImplementedError
+
+    def rate(self):  # pacing rate in packets per second, None for no pacing
+        raise NotImplementedError
+
+    def on_ack(self, acked, srtt):  # acked packets newly acked, srtt from the RTT estimator
+        raise NotImplementedError
+
+    def on_loss(self):  # loss detected by duplicate acks or a packet timer
+        raise NotImplementedError
+
+    def on_timeout(self):  # retransmission timer expired
+        raise NotImplementedError
+
+    def undo(self):  # the last reduction was for a packet that was not lost, restore the window it replaced
+        raise NotImplementedError
+
+
+class Reno(CongestionControl):
+    """
+    slow start then additive increase, multiplicative decrease (RFC 5681),
+    one reduction per RTT however many packets of that window are lost
+    """
+    def __init__(self, max_window, clock=time.time):
+        super().__init__(max_window, clock)
+        self.cwnd = float(min(INITIAL_WINDOW, max_window))  # congestion window
+        self.ssthresh = float(max_window)  # slow start threshold
+        self._reduced_at = None  # time of the last reduction
+        self._prior = None  # (cwnd, ssthresh) before the last reduction, until undone
+
+    def window(self):
+        return max(1, min(self.max_window, int(self.cwnd)))
+
+    def rate(self):  # spread one window over one RTT, faster while growing (Linux pacing gains)
+        if self.srtt is None:
+            return None
+        gain = 2.0 if self.cwnd < self.ssthresh else 1.25
+        return gain * self.window() / self.srtt
+
+    def on_ack(self, acked, srtt):
+        self.srtt = srtt
+        if self.cwnd < self.ssthresh:  # slow start
+            self.cwnd += acked
+        else:  # congestion avoidance
+            self.cwnd += acked / self.cwnd
+        self.cwnd = min(self.cwnd, float(self.max_window))
+
+    def _reduce(self):  # halve window once per RTT, return False if already reduced in this RTT
+        now = self.clock()
+        if self._reduced_at is not None and self.srtt is not None and now - self._reduced_at < self.srtt:
+            return False
+        self._reduced_at = now
+        self._prior = self.cwnd, self.ssthresh
+        self.ssthresh = max(self.cwnd / 2, float(MIN_WINDOW))
+        self.losses += 1
+        return True
+
+    def on_loss(self):
+        if self._reduce():
+            self.cwnd = self.ssthresh
+
+    def on_timeout(self):
+        self._reduce()
+        self.cwnd = 1.0  # restart from slow start
+
+    def undo(self):
+        if self._prior is not None:
+            cwnd, ssthresh = self._prior
+            self.cwnd = max(self.cwnd, cwnd)
+            self.ssthresh = max(self.ssthresh, ssthresh)
+            self._prior = None
+
+
+class RateBased(CongestionControl):
+    """
+    model-based control : the delivery rate measured once per RTT gives the bottleneck bandwidth
+    (max of recent samples), the window is two bandwidth-delay products and the pacing rate cycles
+    around the bandwidth to probe for more, random loss does not shrink the window
+    """
+    STARTUP_GAIN = 2.89  # 2 / ln 2, doubles delivery rate every RTT
+    GAINS = [1.25, 0.75, 1, 1, 1, 1, 1, 1]  # pacing gain per RTT once bandwidth is found
+    CWND_GAIN = 2  # bandwidth-delay products in flight
+    SAMPLES = 10  # RTT rounds of bandwidth samples to keep
+
+    def __init__(self, max_window, clock=time.time):
+        super().__init__(max_window, clock)
+        self.btl_bw = None  # bottleneck bandwidth in packets per second
+        self.min_rtt = None  # lowest RTT seen
+        self.startup = True  # growing until bandwidth stops increasing
+        self._samples = collections.deque(maxlen=self.SAMPLES)  # delivery rate per round
+        self._round_start = None  # start time of current round
+        self._round_acked = 0  # packets acked in current round
+        self._full_bw = 0  # bandwidth at the last 25% growth
+        self._full_rounds = 0  # rounds without 25% growth
+        self._cycle = 0  # index of GAINS
+        self._timed_out = False  # window is 1 until the next ack
+
+    def window(self):
+        if self._timed_out:
+            return 1
+        if self.btl_bw is None or self.min_rtt is None:
+            return min(INITIAL_WINDOW, self.max_window)
+        bdp = self.btl_bw * self.min_rtt
+        return max(MIN_WINDOW * 2, min(self.max_window, int(self.CWND_GAIN * bdp)))
+
+    def rate(self):
+        if self.btl_bw is None:
+            return None
+        gain = self.STARTUP_GAIN if self.startup else self.GAINS[self._cycle]
+        return gain * self.btl_bw
+
+    def on_ack(self, acked, srtt):
+        self.srtt = srtt
+        self._timed_out = False
+        if srtt is not None:
+            self.min_rtt = srtt if self.min_rtt is None else min(self.min_rtt, srtt)
+        now = self.clock()
+        if self._round_start is None:
+            self._round_start = now
+        self._round_acked += acked
+        if self.min_rtt is not None and now - self._round_start >= self.min_rtt:  # one round of samples
+            self._samples.append(self._round_acked / (now - self._round_start))
+            self.btl_bw = max(self._samples)
+            self._round_start = now
+            self._round_acked = 0
+            self._next_round()
+
+    def _next_round(self):
+        if self.startup:  # leave startup after 3 rounds without 25% growth
+            if self.btl_bw >= self._full_bw * 1.25:
+                self._full_bw = self.btl_bw
+                self._full_rounds = 0
+            else:
+                self._full_rounds += 1
+                self.startup = self._full_rounds < 3
+        else:
+            self._cycle = (self._cycle + 1) % len(self.GAINS)
+
+    def on_loss(self):  # random loss is not congestion, bandwidth samples decide
+        self.losses += 1
+
+    def on_timeout(self):
+        self.losses += 1
+        self._timed_out = True
+
+    def undo(self):  # nothing was reduced but the window of a timeout, which the next ack ends anyway
+        self._timed_out = False
+
+
+class Pacer:
+    """
+    token bucket spreading sends at the controller's rate, one token per packet,
+    tokens pile up to `horizon` seconds worth so a driver ticking every horizon keeps the rate
+    """
+    def __init__(self, horizon, clock=time.time):
+        self.horizon = horizon  # seconds of tokens kept
+        self.clock = clock  # time source, virtual in simulation
+        self.rate = None  # packets per second, None for no pacing
+        self.tokens = 1.0  # packets that may leave now
+        self._last = clock()  # time of the last refill
+
+    def set_rate(self, rate):
+        self.rate = rate
+
+    def take(self):  # consume a token, return False if the packet has to wait
+        if self.rate is None:
+            return True
+        now = self.clock()
+        self.tokens = min(max(1.0, self.rate * self.horizon), self.tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+CONTROLLERS = {'reno': Reno, 'rate': RateBased}
+
+
+def new_controller(kind, max_window, clock=time.time):
+    """
+    build congestion controller
+    :param kind: controller type : reno, rate, or None for a fixed window
+    :param max_window: configured window size
+    :param clock: time source, virtual in simulation
+    :return controller or None
+    """
+    if kind is None:
+        return None
+    return CONTROLLERS[kind](max_window, clock)
@@ -0,0 +1,580 @@
+"""
+Filename : engine.py
+Summary  : event-driven asyncio driver for sender and receiver state machines
+Author   : HyunJun KIM (2019204054)
+"""
+
+import asyncio, collections, random, socket, sys  # python built-in modules
+import eventlog, fec, metrics, profiling, protocol, transports, utils  # custom modules
+
+END_SEQ = -1  # end sign of transfer
+RECV_BATCH = 64  # datagrams drained per wakeup
+
+
+def make_log(log, tag):
+    """
+    build log callback of state machine
+    :param log: EventLog or None
+    :param tag: protocol tag of log record
+    :return log(event, seq) function
+    """
+    if log is None:
+        return lambda event, seq: None
+    return log.bind(tag)
+
+
+def bind_socket(addr):  # non-blocking UDP socket bound to (Address, Port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(addr)
+    sock.setblocking(False)
+    return sock
+
+
+class SocketEndpoint(asyncio.DatagramTransport):
+    """
+    datagram transport on a raw non-blocking socket : each wakeup drains up to batch datagrams
+    into protocol.pool, hands them to protocol.datagram_received(view, addr) and then calls protocol.drained(),
+    send_batch() writes a burst with as few syscalls as the kernel allows
+    """
+    def __init__(self, loop, sock, protocol, batch=RECV_BATCH, gso=False):
+        super().__init__({'socket': sock, 'sockname': sock.getsockname()})
+        self._loop = loop
+        self._sock = sock
+        self._protocol = protocol
+        self._batch = batch  # most datagrams per wakeup
+        self._closing = False
+        self.gso = gso and utils.gso_supported(sock)  # kernel segments equal-sized bursts
+        self.recv = utils.recv  # datagram drain, replaced to time it when profiling
+        sock.setblocking(False)
+        loop.add_reader(sock.fileno(), self._read)
+        protocol.connection_made(self)
+
+    def _read(self):  # drain waiting datagrams
+        pool = self._protocol.pool
+        try:
+            packets = self.recv(self._sock, pool, self._batch)
+        except OSError as exc:  # socket keeps failing, give up on it
+            self._close(exc)
+            return
+        for view, addr in packets:
+            if self._closing:
+                pool.give(view.obj)
+            else:
+                self._protocol.datagram_received(view, addr)
+        if not self._closing:
+            self._protocol.drained()
+
+    def sendto(self, data, addr=None):
+        try:
+            self._sock.sendto(data, addr)
+        except (BlockingIOError, InterruptedError):  # kernel buffer is full, datagram is dropped
+            pass
+
+    def send_batch(self, packets, addr):  # burst with emulated loss, return sent flags
+        try:
+            return utils.send_batch(packets, self._sock, addr, self.gso)
+        except OSError:
+            if not self.gso:
+                raise
+            self.gso = False  # no GSO on this path after all
+            return utils.send_batch(packets, self._sock, addr)
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        self._close(None)
+
+    def _close(self, exc):  # stop reading, the protocol learns of it with exc on the next loop pass
+        if not self._closing:
+            self._closing = True
+            self._loop.remove_reader(self._sock.fileno())
+            self._loop.call_soon(self._closed, exc)
+
+    def _closed(self, exc):
+        self._sock.close()
+        self._protocol.connection_lost(exc)
+
+
+class PortableEndpoint(asyncio.DatagramProtocol):
+    """
+    fallback of SocketEndpoint for event loops without add_reader (Windows proactor) or sockets without sendmsg :
+    the loop's own datagram transport hands over one datagram per callback, it is copied into protocol.pool
+    and protocol.drained() runs once the datagrams of this loop pass are in, bursts go out one sendto each
+    the protocol gets this object as its transport, with the same methods as SocketEndpoint
+    """
+    def __init__(self, protocol):
+        self._protocol = protocol
+        self._transport = None  # datagram transport of the loop
+        self._loop = None
+        self._draining = False  # drained() is scheduled
+        self.gso = False
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._loop = asyncio.get_running_loop()
+        self._protocol.connection_made(self)
+
+    def connection_lost(self, exc):
+        self._protocol.connection_lost(exc)
+
+    def error_received(self, exc):  # ICMP error of an earlier send
+        pass
+
+    def datagram_received(self, data, addr):
+        if self._transport.is_closing():
+            return
+        buf = self._protocol.pool.take()
+        nbytes = len(data)
+        buf[:nbytes] = data
+        self._protocol.datagram_received(memoryview(buf)[:nbytes], addr)
+        if not self._draining:
+            self._draining = True
+            self._loop.call_soon(self._drained)
+
+    def _drained(self):
+        self._draining = False
+        if not self._transport.is_closing():
+            self._protocol.drained()
+
+    def sendto(self, data, addr=None):
+        self._transport.sendto(data, addr)
+
+    def sendmsg(self, buffers, ancdata, flags, addr):  # gather write of utils.send_batch, joined into one datagram
+        self._transport.sendto(b''.join(buffers), addr)
+
+    def send_batch(self, packets, addr):  # burst with emulated loss, return sent flags
+        return utils.send_batch(packets, self, addr)
+
+    def recv(self, *args):  # datagrams come from the loop's transport
+        return []
+
+    def is_closing(self):
+        return self._transport.is_closing()
+
+    def close(self):
+        self._transport.close()
+
+
+async def open_endpoint(loop, sock, protocol, gso=False):
+    """
+    attach protocol to sock : SocketEndpoint where the loop and socket allow it, PortableEndpoint otherwise
+    :param loop: running event loop
+    :param sock: bound python socket object
+    :param protocol: protocol with pool, datagram_received(view, addr) and drained()
+    :param gso: send bursts with UDP GSO when the kernel supports it
+    :return transport given to protocol.connection_made
+    """
+    if hasattr(sock, 'sendmsg'):
+        try:
+            return SocketEndpoint(loop, sock, protocol, gso=gso)
+        except NotImplementedError:  # loop without add_reader
+            pass
+    _, endpoint = await loop.create_datagram_endpoint(lambda: PortableEndpoint(protocol), sock=sock)
+    return endpoint
+
+
+class SenderProtocol(asyncio.DatagramProtocol):
+    """
+    drives a sender core : acks slide the window as soon as they arrive,
+    timers are checked every tick and packets cross an emulated FIFO link with random delay,
+    packets due at the same time leave in one burst
+    with a FileSource, packets carry its chunks and sending stops once the whole file is acked
+    with fec_group, an XOR parity packet follows every fec_group new packets
+    """
+    def __init__(self, core, peer, duration, rtt_range, tick, done, log=None, source=None, fec_group=0,
+                 registry=None):
+        self.core = core
+        self.peer = peer  # (Address, Port) of receiver
+        self.duration = duration  # sending time, None to run until finished
+        self.rtt_range = rtt_range  # (min, max) emulated delay
+        self.tick = tick  # timer check interval
+        self.done = done  # future resolved when transport is closed, failed with its socket error
+        self.log = make_log(log, core.tag)
+        self.source = source  # FileSource of payload, None for header-only packets
+        self.pool = utils.BufferPool(utils.ACK_SIZE, RECV_BATCH)  # ack buffers
+        self.fec = None
+        if fec_group and not isinstance(core, protocol.Rdt3Sender):  # alternating bit has no groups
+            self.fec = fec.FecEncoder(fec_group)
+        self.registry = registry or metrics.Registry()
+        metrics.watch_sender(self.registry, core)
+        self._acks_in = self.registry.counter('acks_received')
+        self._lost = self.registry.counter('lost')
+        if self.fec is not None:
+            self.registry.counter('parities', lambda: self.fec.parities)
+        self.transport = None
+        self.loop = None
+        self._running = False
+        self._ticker = None  # timer check handle
+        self._link_free = 0  # time the emulated link delivers the last queued packet
+        self._link = collections.deque()  # (deadline, packet, seq, log event) on the emulated link in order
+        self._scheduled = None  # latest deadline with a pending arrival
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self.core.output = self._output
+        self.core.log = self.log
+        self._running = True
+        if self.source is not None:
+            self.core.total = self.source.packets
+        if self.duration is not None:
+            self.loop.call_later(self.duration, self._finish)
+        self._ticker = self.loop.call_later(self.tick, self._tick)
+        self.core.transmit()
+        self._check_finished()
+
+    def connection_lost(self, exc):
+        if self.done.done():
+            return
+        if exc is not None:  # socket failed, stop sending
+            self._running = False
+            self._ticker.cancel()
+            self.done.set_exception(exc)
+        else:
+            self.done.set_result(self.core)
+
+    def datagram_received(self, data, addr):
+        self._acks_in.inc()
+        if self._running:
+            self.core.on_ack_packet(data)
+        self.pool.give(data.obj)
+
+    def drained(self):  # every waiting ack is in, send what the window allows at once
+        if self._running:
+            self.core.transmit()
+            self._check_finished()
+
+    def _check_finished(self):  # whole file is acked
+        if self._running and self.core.total is not None and self.core.finished():
+            self._finish()
+
+    def _tick(self):  # check retransmission timers
+        self.core.on_tick()
+        self.core.transmit()
+        self._ticker = self.loop.call_later(self.tick, self._tick)
+
+    def _delay(self, pack, seq, event):  # pass through the emulated link in order
+        now = self.loop.time()
+        self._link_free = max(now + random.uniform(*self.rtt_range), self._link_free)
+        self._link.append((self._link_free, pack, seq, event))
+        if self._scheduled is None or self._link_free > self._scheduled:
+            self._scheduled = self._link_free
+            self.loop.call_at(self._link_free, self._arrive, self._link_free)
+
+    def _arrive(self, deadline):  # everything due by deadline leaves together, in FIFO order
+        if deadline == self._scheduled:
+            self._scheduled = None
+        batch = []
+        while self._link and self._link[0][0] <= deadline:
+            _, pack, seq, event = self._link.popleft()
+            if pack is None:  # end sign
+                self._transmit(batch)
+                self._close()
+                return
+            batch.append((pack, seq, event))
+        self._transmit(batch)
+
+    def _output(self, seq, retransmit):
+        if self._running:
+            data = None if self.source is None else self.source.chunk(self.core.offset(seq))
+            if data is None:
+                pack = utils.make_packet(seq)
+            else:  # header and file chunk leave in one sendmsg
+                pack = [utils.make_packet(seq), data]
+            self._delay(pack, seq, eventlog.RESEND if retransmit else eventlog.SEND)
+            if self.fec is not None and not retransmit:
+                parity = self.fec.add(seq, data)
+                if parity is None and self.core.total is not None and seq == self.core.total - 1:
+                    parity = self.fec.flush()  # last group of the file is short
+                if parity is not None:
+                    self._delay(parity, seq, eventlog.SEND_PARITY)
+
+    def _transmit(self, batch):
+        if not batch or self.transport.is_closing():
+            return
+        sent = self.transport.send_batch([pack for pack, _, _ in batch], self.peer)
+        for ok, (_, seq, event) in zip(sent, batch):
+            if ok:
+                self.log(event, seq)
+            else:
+                self._lost.inc()
+                self.log(eventlog.DATA_LOSS, seq)
+
+    def _finish(self):  # stop sending, then close after the end sign leaves the link
+        self._running = False
+        self._ticker.cancel()
+        self._delay(None, END_SEQ, None)
+
+    def _close(self):
+        utils.send(utils.make_packet(END_SEQ), self.transport, self.peer)
+        self.transport.close()
+
+
+class ReceiverProtocol(asyncio.DatagramProtocol):
+    """
+    drives a receiver core : every datagram is handled as soon as it arrives,
+    acks made while draining one wakeup leave together, delayed acks are flushed every tick
+    with a sink, in-order payload is written to sink straight from the pooled buffer it was read into
+    with fec_group, packets lost inside a parity group are rebuilt without waiting for retransmission
+    """
+    def __init__(self, core, done, tick, log=None, sink=None, mss=0, pool=None, fec_group=0, registry=None):
+        self.core = core
+        self.done = done  # future resolved with receiver core at end sign, failed with socket error
+        self.tick = tick  # delayed ack check interval
+        self.log = make_log(log, core.tag)
+        self.sink = sink  # writable binary file of payload, None for header-only packets
+        # buffers parked in the reorder buffer come back on delivery, flows of a server share one pool
+        # an empty pool is falsy (BufferPool.__len__), so test for None
+        self.pool = pool if pool is not None else utils.BufferPool(
+            utils.HEADER_SIZE + mss + (fec.OVERHEAD if fec_group else 0), core.window_size + RECV_BATCH)
+        self.transport = None
+        self.loop = None
+        self._ticker = None  # delayed ack check handle
+        self._peer = None  # address of current sender
+        self._started = None  # arrival time of the first packet
+        self._current = None  # buffer of the packet being handled
+        self._acks = []  # acks to flush
+        self.fec = None
+        if fec_group and not isinstance(core, protocol.Rdt3Receiver):
+            # go-back-N drops packets after a gap, hold them to hand over after rebuilding
+            self.fec = fec.FecDecoder(fec_group, keep=isinstance(core, protocol.GbnReceiver),
+                                      limit=core.window_size // fec_group + 2)
+        self.registry = registry or metrics.Registry()
+        metrics.watch_receiver(self.registry, core)
+        self._received = self.registry.counter('received')
+        self._acks_lost = self.registry.counter('acks_lost')
+        if self.fec is not None:
+            self.registry.counter('fec_recovered', lambda: self.fec.recovered)
+        if sink is not None:
+            core.deliver = self._write
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self.core.output = self._output
+        self.core.log = self.log
+        self._ticker = self.loop.call_later(self.tick, self._tick)
+
+    def connection_lost(self, exc):
+        self._ticker.cancel()
+        if self.done.done():
+            return
+        if exc is not None:  # socket failed
+            self.done.set_exception(exc)
+        else:
+            self.done.set_result(self.core)
+
+    def _tick(self):
+        if self._peer is not None:
+            self.core.on_tick()
+            self._flush()
+        self._ticker = self.loop.call_later(self.tick, self._tick)
+
+    def datagram_received(self, data, addr):
+        self._received.inc()
+        seq = utils.extract_packet(data)
+        if seq == END_SEQ:  # check end sign
+            if self._started is not None:
+                self.core.elapsed = self.loop.time() - self._started
+            self.transport.close()
+        elif seq == fec.PARITY_SEQ:
+            if self.fec is not None:
+                self._rebuilt(self.fec.on_parity(data))
+        else:
+            if self._started is None:
+                self._started = self.loop.time()
+            self._peer = addr
+            self._current = data.obj
+            payload = data[utils.HEADER_SIZE:] if self.sink is not None else None
+            rebuilt = self.fec.on_data(seq, payload) if self.fec is not None else None
+            kept = self.core.on_packet(seq, payload)
+            if rebuilt:
+                self._rebuilt(rebuilt)
+            if kept:
+                return  # parked in reorder buffer
+        self.pool.give(data.obj)
+
+    def _rebuilt(self, packets):  # hand packets rebuilt by FEC to core, in a buffer of the pool
+        current = self._current
+        for seq, payload in packets:
+            if not self.core.needs(seq):
+                continue
+            self.log(eventlog.FEC_RECOVERED, seq)
+            if payload is None:
+                self.core.on_packet(seq)
+                continue
+            buf = self.pool.take()
+            buf[utils.HEADER_SIZE:utils.HEADER_SIZE + len(payload)] = payload
+            self._current = buf
+            if not self.core.on_packet(seq, memoryview(buf)[utils.HEADER_SIZE:utils.HEADER_SIZE + len(payload)]):
+                self.pool.give(buf)
+        self._current = current
+
+    def drained(self):
+        self._flush()
+
+    def _write(self, seq, data):  # in-order payload straight from its buffer
+        self.sink.write(data)
+        if data.obj is not self._current:  # parked buffer is free again
+            self.pool.give(data.obj)
+
+    def _output(self, packet):
+        self._acks.append(packet)
+
+    def _flush(self):  # send queued acks in one burst
+        if not self._acks or self.transport.is_closing():
+            return
+        sent = self.transport.send_batch(self._acks, self._peer)
+        for ok, packet in zip(sent, self._acks):
+            if ok:
+                self.log(eventlog.SEND_ACK, utils.extract_packet(packet))
+            else:
+                self._acks_lost.inc()
+                self.log(eventlog.ACK_LOSS, utils.extract_packet(packet))
+        self._acks = []
+
+
+async def send(core, sock, peer, duration, rtt_range, tick, log=None, source=None, buffers=None, gso=False,
+               fec_group=0, reporter=None, profiler=None):
+    """
+    run sender core until duration passes
+    :param core: sender state machine
+    :param sock: bound python socket object, or (Address, Port) to bind
+    :param peer: (Address, Port) of receiver
+    :param duration: sending time, None to run until source is acked
+    :param rtt_range: (min, max) emulated delay
+    :param tick: timer check interval
+    :param log: EventLog or None
+    :param source: FileSource of payload or None
+    :param buffers: (SO_SNDBUF, SO_RCVBUF) bytes or None for kernel default
+    :param gso: send bursts with UDP GSO when the kernel supports it
+    :param fec_group: data packets per XOR parity packet, 0 without FEC
+    :param reporter: metrics.Reporter writing snapshots while running, or None
+    :param profiler: profiling.Profiler timing the run, or None
+    :return sender core
+    """
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    if isinstance(sock, tuple):
+        sock = bind_socket(sock)
+    if buffers is not None:
+        utils.tune_socket(sock, *buffers)
+    sender = SenderProtocol(core, peer, duration, rtt_range, tick, done, log, source, fec_group,
+                            reporter.registry if reporter is not None else None)
+    if profiler is not None:
+        profiling.watch_sender(profiler, sender)
+        profiler.start(loop)
+    transport = await open_endpoint(loop, sock, sender, gso)
+    if profiler is not None:
+        profiling.watch_transport(profiler, transport)
+    if reporter is not None:
+        reporter.start(loop)
+    core = await done
+    if profiler is not None:
+        profiler.stop()
+    if reporter is not None:
+        reporter.stop()
+    return core
+
+
+async def receive(core, sock, tick, log=None, ready=None, sink=None, mss=0, buffers=None, gso=False,
+                  fec_group=0, reporter=None, profiler=None):
+    """
+    run receiver core until end sign arrives
+    :param core: receiver state machine
+    :param sock: bound python socket object, or (Address, Port) to bind
+    :param tick: delayed ack check interval
+    :param log: EventLog or None
+    :param ready: future resolved with bound (Address, Port)
+    :param sink: writable binary file of payload or None
+    :param mss: payload bytes per packet
+    :param buffers: (SO_SNDBUF, SO_RCVBUF) bytes or None for kernel default
+    :param gso: send ack bursts with UDP GSO when the kernel supports it
+    :param fec_group: data packets per XOR parity packet, 0 without FEC
+    :param reporter: metrics.Reporter writing snapshots while running, or None
+    :param profiler: profiling.Profiler timing the run, or None
+    :return receiver core
+    """
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    if isinstance(sock, tuple):
+        sock = bind_socket(sock)
+    if buffers is not None:
+        utils.tune_socket(sock, *buffers)
+    receiver = ReceiverProtocol(core, done, tick, log, sink, mss, fec_group=fec_group,
+                                registry=reporter.registry if reporter is not None else None)
+    if profiler is not None:
+        profiling.watch_receiver(profiler, receiver)
+        profiler.start(loop)
+    transport = await open_endpoint(loop, sock, receiver, gso)
+    if profiler is not None:
+        profiling.watch_transport(profiler, transport)
+    if ready is not None:
+        ready.set_result(sock.getsockname())
+    if reporter is not None:
+        reporter.start(loop)
+    core = await done
+    if profiler is not None:
+        profiler.stop()
+    if reporter is not None:
+        reporter.stop()
+    return core
+
+
+async def transfer(kind, window_size, timeout, min_rto, max_rto, tick, slots,
+                   duration, rtt_range, addr='127.0.0.1', send_log=None, recv_log=None,
+                   ack_every=1, ack_delay=0.0, cc=None, pacing=False, fec_group=0, watch=None, transport='udp'):
+    """
+    run one sender/receiver pair on ephemeral ports in this process
+    :param kind: protocol type : rdt3, gbn, sr
+    :param cc: congestion control : reno, rate, or None for a fixed window
+    :param pacing: spread sends at the congestion controller's rate, or one window per RTT without one
+    :param fec_group: data packets per XOR parity packet, 0 without FEC
+    :param watch: watch(sender core, receiver core) called before the run to attach instruments, or None
+    :param transport: datagram backend : udp, unix, shm, emulated loss and delay are the same on each
+    :return (sender core, receiver core)
+    """
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    core = protocol.new_sender(kind, window_size, timeout, min_rto, max_rto, tick, slots, cc=cc, pacing=pacing)
+    receiver_core = protocol.new_receiver(kind, window_size, ack_every, ack_delay)
+    if watch is not None:
+        watch(core, receiver_core)
+    if transport == 'udp':
+        local = remote = (addr, 0)
+    else:
+        local = transports.open_socket(transport, transports.ephemeral(transport))
+        remote = transports.open_socket(transport, transports.ephemeral(transport))
+        if transport == 'unix':  # before the first burst, see transports.UnixSocket
+            remote.connect(local.getsockname())
+    receiver = asyncio.ensure_future(receive(receiver_core, remote, tick, recv_log, ready, fec_group=fec_group))
+    peer = await ready
+    await send(core, local, peer, duration, rtt_range, tick, send_log, fec_group=fec_group)
+    return core, await receiver
+
+
+async def transfers(kind, flows, *args):
+    """
+    run many sender/receiver pairs concurrently on one event loop
+    :param kind: protocol type : rdt3, gbn, sr
+    :param flows: number of concurrent transfers
+    :return list of (sender core, receiver core)
+    """
+    return await asyncio.gather(*[transfer(kind, *args) for _ in range(flows)])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] not in protocol.SENDERS:
+        print("Usage:: python engine.py <protocol type : rdt3, gbn, sr> <number of concurrent transfers>")
+        exit()
+
+    import sender  # module constants
+    results = asyncio.run(transfers(sys.argv[1], int(sys.argv[2]), sender.WINDOW_SIZE,
+                                    *sender.rto_bounds(sender.TIMEOUT_THRESHOLD),
+                                    sender.TIMER_TICK, sender.TIMER_SLOTS, sender.MAXIMUM_TIME,
+                                    (sender.RTT_MIN, sender.RTT_MAX)))
+    for i, (core, receiver) in enumerate(results):
+        print('transfer ' + str(i) + ' : sent ' + str(core.sent) + ', retransmitted '
+              + str(core.retransmitted) + ', fast retransmits ' + str(core.fast_retransmits)
+              + ', received ' + str(receiver.delivered))
@@ -0,0 +1,147 @@
+"""
+Filename : eventlog.py
+Summary  : buffered binary event log of sender and receiver, with text decoder
+Author   : HyunJun KIM (2019204054)
+"""
+
+import datetime, queue, struct, sys, threading, time  # python built-in modules
+
+# log levels
+OFF = 0  # nothing
+WARN = 1  # loss, timeout
+INFO = 2  # + retransmission, unexpected and duplicated packets
+TRACE = 3  # + every packet and ack
+
+# event code -> (text, level), text is the same as the former text log
+EVENTS = [
+    ('Sending sequence', TRACE),
+    ('Resending sequence', INFO),
+    ('Data Loss Occured', WARN),
+    ('Timeout', WARN),
+    ('Received Expected', TRACE),
+    ('Received Not Expected', INFO),
+    ('Duplicated', INFO),
+    ('Sending ACK', TRACE),
+    ('ACK LOSS Occured', WARN),
+    ('Fast Retransmit', WARN),
+    ('Sending parity', TRACE),
+    ('Recovered by FEC', INFO),
+    ('Zero Window Probe', INFO),
+    ('Receive Buffer Full', WARN),
+]
+SEND, RESEND, DATA_LOSS, TIMEOUT, RECV_EXPECTED, RECV_UNEXPECTED, DUPLICATED, SEND_ACK, ACK_LOSS, \
+    FAST_RETRANSMIT, SEND_PARITY, FEC_RECOVERED, WINDOW_PROBE, RECV_FULL = range(len(EVENTS))
+TAGS = ['RDT 3.0', 'GoBackN', 'SelRep']  # tag code -> protocol tag
+
+RECORD = struct.Struct('<QBBq')  # monotonic ns, tag code, event code, sequence
+CHUNK = struct.Struct('<4sIq')  # magic, record count, wall clock - monotonic clock in ns
+MAGIC = b'RDTL'
+
+
+class EventLog:
+    """
+    fixed-size records are packed into a preallocated buffer,
+    full buffers are written to file by a background thread
+    """
+    def __init__(self, path, level=TRACE, capacity=4096):
+        self._file = open(path, 'ab')
+        self.level = level
+        self._capacity = capacity  # records per buffer
+        self._offset = time.time_ns() - time.monotonic_ns()  # to render wall clock time
+        self._free = queue.Queue()  # empty buffers
+        self._full = queue.Queue()  # (buffer, count) to write
+        for _ in range(3):
+            self._free.put(bytearray(capacity * RECORD.size))
+        self._buf = self._free.get()
+        self._count = 0  # records in current buffer
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def record(self, tag, event, seq):  # append one record
+        RECORD.pack_into(self._buf, self._count * RECORD.size, time.monotonic_ns(), tag, event, seq)
+        self._count += 1
+        if self._count == self._capacity:
+            self.flush()
+
+    def bind(self, tag):
+        """
+        build log(event, seq) callback of state machine, events above level are dropped
+        :param tag: protocol tag, one of TAGS
+        :return log function
+        """
+        code = TAGS.index(tag)
+        enabled = [lvl <= self.level for _, lvl in EVENTS]
+        if not any(enabled):
+            return lambda event, seq: None
+        record = self.record
+
+        def log(event, seq):
+            if enabled[event]:
+                record(code, event, seq)
+        return log
+
+    def flush(self):  # hand current buffer to writer
+        if self._count:
+            self._full.put((self._buf, self._count))
+            try:
+                self._buf = self._free.get_nowait()
+            except queue.Empty:  # writer is behind, grow the pool
+                self._buf = bytearray(self._capacity * RECORD.size)
+            self._count = 0
+
+    def close(self):  # write everything and close file
+        self.flush()
+        self._full.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def _write_loop(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                break
+            buf, count = item
+            self._file.write(CHUNK.pack(MAGIC, count, self._offset))
+            self._file.write(memoryview(buf)[:count * RECORD.size])
+            self._free.put(buf)
+
+
+def decode(path):
+    """
+    read binary event log
+    :param path: log file path
+    :return iterator of (wall clock ns, tag, event code, seq)
+    """
+    with open(path, 'rb') as f:
+        while True:
+            head = f.read(CHUNK.size)
+            if len(head) < CHUNK.size:
+                break
+            magic, count, offset = CHUNK.unpack(head)
+            if magic != MAGIC:
+                raise ValueError('broken event log : ' + path)
+            body = f.read(count * RECORD.size)
+            for mono, tag, event, seq in RECORD.iter_unpack(body):
+                yield mono + offset, TAGS[tag], event, seq
+
+
+def render(path, level=TRACE):
+    """
+    render binary event log as text lines of the former sendlog.txt/recvlog.txt
+    :param path: log file path
+    :param level: highest level to show
+    :return iterator of lines
+    """
+    for ns, tag, event, seq in decode(path):
+        text, lvl = EVENTS[event]
+        if lvl <= level:
+            yield str(datetime.datetime.fromtimestamp(ns / 1e9)) + ' [' + tag + '] ' + text + ' : ' + str(seq) + '\n'
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage:: python eventlog.py <binary log : sendlog.bin, recvlog.bin> [level : 1, 2, 3]")
+        exit()
+
+    for line in render(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else TRACE):
+        sys.stdout.write(line)
@@ -0,0 +1,127 @@
+"""
+Filename : fec.py
+Summary  : XOR parity forward error correction of go-back-N and selective-repeat streams
+Author   : HyunJun KIM (2019204054)
+"""
+
+import collections, struct  # python built-in modules
+import utils  # custom modules
+
+PARITY_SEQ = -2  # sign of parity packet
+PARITY_HEAD = struct.Struct('<iIHH')  # sign, first sequence of group, packets in group, xor of payload lengths
+OVERHEAD = PARITY_HEAD.size - utils.HEADER_SIZE  # parity packet is longer than a full data packet by this
+
+
+class FecEncoder:
+    """
+    one XOR parity packet after every `group` new data packets,
+    any single loss inside a group can be rebuilt from the rest of the group and its parity
+    """
+    def __init__(self, group):
+        self.group = group  # data packets per parity
+        self.parities = 0  # parity packets made
+        self._reset(0)
+
+    def _reset(self, first):
+        self._first = first  # first sequence of open group
+        self._count = 0  # packets in open group
+        self._lens = 0  # xor of payload lengths
+        self._xor = 0  # xor of payloads as little-endian integers, shorter ones are zero padded
+        self._size = 0  # longest payload
+
+    def add(self, seq, data=None):  # count new data packet, return parity packet when its group is complete
+        first = seq - seq % self.group
+        if first != self._first:  # previous group was cut short
+            self._reset(first)
+        self._count += 1
+        if data is not None:
+            self._lens ^= len(data)
+            self._xor ^= int.from_bytes(data, 'little')
+            self._size = max(self._size, len(data))
+        if self._count < self.group:
+            return None
+        return self.flush()
+
+    def flush(self):  # parity packet of the open group, None if it is empty
+        if not self._count:
+            return None
+        head = PARITY_HEAD.pack(PARITY_SEQ, self._first % utils.SEQ_SPACE, self._count, self._lens)
+        body = self._xor.to_bytes(self._size, 'little')
+        self.parities += 1
+        self._reset(self._first + self.group)
+        return [head, body] if body else head
+
+
+class FecDecoder:
+    """
+    rebuilds the single missing packet of a group once its parity and the other packets are in
+    with keep, arrived packets are held so the ones after a rebuilt packet can be handed over again,
+    for receivers that drop out-of-order packets (G&B)
+    """
+    def __init__(self, group, keep=False, limit=64):
+        self.group = group  # data packets per parity
+        self.keep = keep  # hold arrived packets for replay
+        self.limit = limit  # groups tracked at once, the oldest is forgotten first
+        self.recovered = 0  # packets rebuilt
+        self._groups = collections.OrderedDict()  # first sequence -> group state
+        self._ref = 0  # highest sequence seen, to unwrap wire sequences
+
+    def _state(self, first):
+        state = self._groups.get(first)
+        if state is None:
+            state = self._groups[first] = {'seqs': set(), 'lens': 0, 'xor': 0, 'parity': None, 'held': {}}
+            if len(self._groups) > self.limit:
+                self._groups.popitem(last=False)
+        return state
+
+    def on_data(self, wire_seq, data=None):
+        """
+        account data packet
+        :param wire_seq: sequence number read from packet
+        :param data: payload or None
+        :return list of (sequence, payload) rebuilt or handed over again
+        """
+        seq = utils.unwrap(wire_seq, self._ref)
+        self._ref = max(self._ref, seq)
+        first = seq - seq % self.group
+        state = self._state(first)
+        if seq in state['seqs']:
+            return []
+        state['seqs'].add(seq)
+        if data is not None:
+            state['lens'] ^= len(data)
+            state['xor'] ^= int.from_bytes(data, 'little')
+        if self.keep:
+            state['held'][seq] = bytes(data) if data is not None else None
+        return self._rebuild(first, state)
+
+    def on_parity(self, packet):
+        """
+        account parity packet
+        :param packet: received parity packet
+        :return list of (sequence, payload) rebuilt or handed over again
+        """
+        _, first, count, lens = PARITY_HEAD.unpack_from(packet)
+        first = utils.unwrap(first, self._ref)
+        state = self._state(first)
+        body = packet[PARITY_HEAD.size:]
+        state['parity'] = (count, lens, int.from_bytes(body, 'little') if len(body) else None)
+        return self._rebuild(first, state)
+
+    def _rebuild(self, first, state):
+        if state['parity'] is None:
+            return []
+        count, lens, xor = state['parity']
+        if len(state['seqs']) >= count:  # nothing lost
+            del self._groups[first]
+            return []
+        if len(state['seqs']) < count - 1:  # XOR covers one loss only
+            return []
+        missing = next(seq for seq in range(first, first + count) if seq not in state['seqs'])
+        data = None
+        if xor is not None:
+            data = (xor ^ state['xor']).to_bytes(lens ^ state['lens'], 'little')
+        self.recovered += 1
+        del self._groups[first]
+        held = sorted((seq, d) for seq, d in state['held'].items() if seq > missing)
+        return [(missing, data)] + held
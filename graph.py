@@ -1,51 +1,191 @@
 """
 Filename : graph.py
-Summary  : efficiency graph maker
+Summary  : columnar results loader, grouped statistics and headless batch plotting
 Author   : HyunJun KIM (2019204054)
 """
 
+import argparse, json, os, re  # python built-in modules
+import matplotlib
+matplotlib.use('Agg')  # render to files, no display needed
 from matplotlib import pyplot as plt
-import sys
+import numpy as np  # third-party modules
+import results  # custom modules
 
-# data : data#  TestingTime  LossProbability  TimeoutThreshold  RTT  (WindowSize)
+# metrics a source did not record are NaN : retransmissions and goodput are missing from the text files
+COLUMNS = [('protocol', str), ('received', int), ('duration', float), ('loss', float), ('timeout', float),
+           ('rtt_min', float), ('rtt_max', float), ('window', int), ('retransmitted', float), ('goodput', float)]
+# two-sided 95% Student t critical values by degrees of freedom, normal beyond the table, single runs get none
+T95 = np.array([0.0, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042])
+
+
+def _text_rows(path):  # rows of a former text result file or Collected_Dataset.txt
+    for run in results.read_text(path):
+        yield tuple(run.get(name, np.nan) for name, _ in COLUMNS)
+
+
+def _json_rows(path):  # rows of a sweep results.jsonl
+    with open(path) as f:
+        for line in f:
+            run = json.loads(line)
+            yield tuple(run.get(name, np.nan) for name, _ in COLUMNS)
+
+
+def _db_rows(path, protocols=None):  # rows of a results store, protocol filter applied by its index
+    store = results.ResultStore(path)
+    rows = store.rows([name for name, _ in COLUMNS], protocol=protocols)
+    store.close()
+    return [tuple(np.nan if value is None else value for value in row) for row in rows]
+
+
+def load(paths, protocols=None):
+    """
+    load result files into one columnar table
+    :param paths: results store .db, former receiver .txt files, Collected_Dataset.txt or sweep results.jsonl
+    :param protocols: protocols to keep, None for all
+    :return dict of column name -> numpy array, one element per run, with efficiency and rtt label added
+    """
+    rows = []
+    for path in paths:
+        if path.endswith('.db'):
+            rows.extend(_db_rows(path, protocols))
+        else:
+            rows.extend(_json_rows(path) if path.endswith('.jsonl') else _text_rows(path))
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    table = {name: np.array(values, dtype=dtype) for (name, dtype), values in zip(COLUMNS, columns)}
+    table['rtt'] = np.char.add(np.char.add(np.char.add('[', table['rtt_min'].astype(str)),
+                                           np.char.add(',', table['rtt_max'].astype(str))), ']')
+    table['efficiency'] = efficiency(table)
+    if protocols is not None:
+        keep = np.isin(table['protocol'], protocols)
+        table = {name: column[keep] for name, column in table.items()}
+    return table
+
+
+def efficiency(table):
+    """
+    link utilization of every run : packets received over packets a lossless window could deliver,
+    window packets per mean RTT for the whole sending time
+    :param table: columnar table
+    :return numpy array
+    """
+    mean_rtt = (table['rtt_min'] + table['rtt_max']) / 2
+    return table['received'] * mean_rtt / (table['window'] * table['duration'])
+
+
+def select(table, **filters):  # rows whose columns equal the given values
+    mask = np.ones(len(table['received']), dtype=bool)
+    for name, value in filters.items():
+        mask &= table[name] == value
+    return {name: column[mask] for name, column in table.items()}
+
+
+def group(table, keys, metric):
+    """
+    mean and 95% confidence interval of metric for every combination of keys, over repeated runs
+    :param table: columnar table
+    :param keys: column names to group by
+    :param metric: column name to aggregate
+    :return dict of key columns and 'n', 'mean', 'std', 'ci' arrays, one element per group, sorted by keys
+    """
+    codes, uniques = [], []
+    for key in keys:
+        values, code = np.unique(table[key], return_inverse=True)
+        uniques.append(values)
+        codes.append(code)
+    shape = [len(values) for values in uniques]
+    flat = np.ravel_multi_index(codes, shape) if keys else np.zeros(len(table[metric]), dtype=int)
+    groups, index = np.unique(flat, return_inverse=True)
+    values = table[metric]
+    n = np.bincount(index)
+    total = np.bincount(index, weights=values)
+    squares = np.bincount(index, weights=values * values)
+    mean = total / n
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(np.maximum(squares - n * mean * mean, 0) / (n - 1))
+    std[n < 2] = 0.0
+    t = np.where(n - 1 < len(T95), T95[np.minimum(n - 1, len(T95) - 1)], 1.96)
+    result = {'n': n, 'mean': mean, 'std': std, 'ci': t * std / np.sqrt(n)}
+    for key, values, code in zip(keys, uniques, np.unravel_index(groups, shape) if keys else []):
+        result[key] = values[code]
+    return result
+
+
+def plot(table, x, series, metric, title, path, log_x=True):
+    """
+    one figure : metric against x, one line with confidence bars per series combination
+    :param table: columnar table of one facet
+    :param x: column of x axis
+    :param series: columns telling lines apart
+    :param metric: column of y axis
+    :param title: figure title
+    :param path: image file to write
+    :param log_x: logarithmic x axis
+    """
+    stats = group(table, series + [x], metric)
+    fig, ax = plt.subplots(figsize=(7, 4.5))
+    labels = [' '.join(key + '=' + str(value) for key, value in zip(series, combo))
+              for combo in zip(*[stats[key] for key in series])] if series else [''] * len(stats['n'])
+    for label in sorted(set(labels)):
+        mask = np.array([item == label for item in labels])
+        ax.errorbar(stats[x][mask], stats['mean'][mask], yerr=stats['ci'][mask], marker='.', capsize=3,
+                    label=label or None)
+    if log_x:
+        ax.set_xscale('log')
+    ax.set_xlabel(x)
+    ax.set_ylabel(metric)
+    ax.set_title(title)
+    if series:
+        ax.legend(fontsize='small')
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+
+
+def write_csv(stats, keys, path):  # grouped statistics as CSV
+    with open(path, 'w') as f:
+        f.write(','.join(keys + ['n', 'mean', 'std', 'ci']) + '\n')
+        for i in range(len(stats['n'])):
+            f.write(','.join([str(stats[key][i]) for key in keys]
+                             + [str(stats['n'][i])] + [repr(float(stats[name][i])) for name in ('mean', 'std', 'ci')])
+                    + '\n')
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Usage:: python graph.py <protocol type : rdt3, gbn, sr>")
-        exit()
-    if sys.argv[1] == 'rdt3':
-        pro = 'RDT_3'
-    elif sys.argv[1] == 'gbn':
-        pro = 'Go_Back_N'
-    elif sys.argv[1] == 'sr':
-        pro = 'Selective_Repeat'
-    else:
-        print("Invalid Protocol Type Input : {'rdt3', 'gbn', 'sr'}")
+    parser = argparse.ArgumentParser(description='plot experiment results with 95% confidence intervals')
+    parser.add_argument('files', nargs='*', help='result files, the results store by default')
+    parser.add_argument('--protocol', help='comma separated protocols to plot : rdt3, gbn, sr')
+    parser.add_argument('--x', default='loss', help='column of x axis')
+    parser.add_argument('--series', default='rtt,window', help='comma separated columns telling lines apart')
+    parser.add_argument('--facet', default='protocol', help='comma separated columns, one figure per combination')
+    parser.add_argument('--metric', default='efficiency', help='column of y axis : efficiency, received, ...')
+    parser.add_argument('--linear', action='store_true', help='linear x axis')
+    parser.add_argument('--out', default='plots', help='output directory')
+    parser.add_argument('--csv', action='store_true', help='also write grouped statistics as CSV')
+    args = parser.parse_args()
+
+    files = args.files or ([results.RESULTS_DB] if os.path.exists(results.RESULTS_DB) else [])
+    table = load(files, args.protocol.split(',') if args.protocol else None)
+    if not len(table['received']):
+        print('no results in ' + (', '.join(files) or "'" + results.RESULTS_DB + "' (python results.py import "
+                                  "Collected_Dataset.txt)"))
         exit()
 
-    data1_y = []
-    data2_y = []
-    data_x = ['10^(-1)', '10^(-2)', '10^(-3)', '10^(-4)', '10^(-5)', '10^(-6)', '10^(-7)', '10^(-8)', '10^(-9)']
-
-    #rdt3
-    with open(pro + '.txt') as f:
-        while True:
-            line = f.readline().split()
-            if not line:
-                break
-            if line[1] == '10':
-                data1_y.append(int(line[0]) / 10000)
-            elif line[1] == '100':
-                data2_y.append(int(line[0]) / 100000)
-
-    plt.plot(data_x, data1_y,'r.-')
-    plt.plot(data_x, data2_y, 'b.-')
-    plt.xlabel('Loss Probability')
-    plt.ylabel('Efficiency')
-    plt.title('Experiment Result of ' + pro)
-    plt.text(1,0.5,'TimeoutThreshold is 11ms, 110ms at t1, t2')
-    plt.legend(['t1:[8ms,12ms]', 't2:[80ms,120ms]'])
-    #plt.legend(['N_s = 10', 'N_s = 100'])
-    #plt.legend(['N_s = N_r = 10', 'N_s = N_r = 100'])
-    plt.show()
+    series = [key for key in args.series.split(',') if key]
+    facets = [key for key in args.facet.split(',') if key]
+    os.makedirs(args.out, exist_ok=True)
+    combos = group(table, facets, args.metric) if facets else {'n': [len(table['received'])]}
+    for i in range(len(combos['n'])):
+        values = {key: combos[key][i] for key in facets}
+        facet = select(table, **values)
+        name = '_'.join([args.metric] + [key + '-' + str(value) for key, value in values.items()])
+        name = re.sub(r'[^\w.=-]', '', name)
+        title = args.metric + ' ' + ' '.join(key + '=' + str(value) for key, value in values.items())
+        plot(facet, args.x, [key for key in series if key not in values], args.metric, title,
+             os.path.join(args.out, name + '.png'), not args.linear)
+        if args.csv:
+            keys = [key for key in series if key not in values] + [args.x]
+            write_csv(group(facet, keys, args.metric), keys, os.path.join(args.out, name + '.csv'))
+        print(os.path.join(args.out, name + '.png') + ' : ' + str(len(facet['received'])) + ' runs')
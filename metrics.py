@@ -0,0 +1,269 @@
+"""
+Filename : metrics.py
+Summary  : in-process metrics registry with counters, gauges, streaming histograms and JSON-lines snapshots
+Author   : HyunJun KIM (2019204054)
+"""
+
+import collections, json, math, sys, time  # python built-in modules
+
+PERCENTILES = (50, 90, 99)  # percentiles of histogram summaries
+
+
+class Counter:
+    """
+    monotonically increasing count, either incremented in place or read from fn
+    """
+    def __init__(self, fn=None):
+        self.value = 0
+        self._fn = fn  # fn() -> current count, for counts already kept by a state machine
+
+    def inc(self, n=1):
+        self.value += n
+
+    def read(self):
+        return self._fn() if self._fn is not None else self.value
+
+
+class Gauge:
+    """
+    value that goes up and down, either set in place or read from fn
+    """
+    def __init__(self, fn=None):
+        self.value = None
+        self._fn = fn  # fn() -> current value
+
+    def set(self, value):
+        self.value = value
+
+    def read(self):
+        return self._fn() if self._fn is not None else self.value
+
+
+class Histogram:
+    """
+    streaming histogram of positive values in log-spaced buckets,
+    each bucket is `growth` times wider than the previous one so percentiles are exact to that ratio
+    memory is bounded by the value range, not by the number of samples
+    """
+    def __init__(self, lowest=1e-6, growth=1.02):
+        self.lowest = lowest  # values below are counted in bucket 0
+        self.growth = growth  # bucket width ratio, relative error of percentiles
+        self._log = math.log(growth)
+        self.buckets = {}  # bucket index -> samples
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        index = int(math.log(value / self.lowest) / self._log) if value > self.lowest else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):  # value below which p percent of samples fall, None if empty
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:  # middle of bucket, clamped to the values actually seen
+                value = self.lowest * self.growth ** (index + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def read(self):  # summary dict
+        summary = {'count': self.count, 'mean': self.sum / self.count if self.count else None,
+                   'min': self.min, 'max': self.max}
+        for p in PERCENTILES:
+            summary['p' + str(p)] = self.percentile(p)
+        return summary
+
+
+class Registry:
+    """
+    named instruments of one process, created on first use
+    """
+    def __init__(self):
+        self.counters = {}  # name -> Counter
+        self.gauges = {}  # name -> Gauge
+        self.histograms = {}  # name -> Histogram
+
+    def counter(self, name, fn=None):
+        if name not in self.counters:
+            self.counters[name] = Counter(fn)
+        return self.counters[name]
+
+    def gauge(self, name, fn=None):
+        if name not in self.gauges:
+            self.gauges[name] = Gauge(fn)
+        return self.gauges[name]
+
+    def histogram(self, name, **kwargs):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(**kwargs)
+        return self.histograms[name]
+
+    def snapshot(self):  # current value of every instrument
+        return {'counters': {name: c.read() for name, c in self.counters.items()},
+                'gauges': {name: g.read() for name, g in self.gauges.items()},
+                'histograms': {name: h.read() for name, h in self.histograms.items()}}
+
+
+class Reporter:
+    """
+    appends a registry snapshot to a JSON-lines file every interval seconds on the event loop,
+    and a final line with "summary": true when stopped
+    every counter also gets a per-second rate, over the last interval in snapshots and over the run in the summary
+    """
+    def __init__(self, path, role, interval=1.0, registry=None):
+        self.path = path  # JSON-lines file, None to keep snapshots in memory only
+        self.role = role  # 'sender' or 'receiver', written in every line
+        self.interval = interval  # seconds between snapshots
+        self.registry = registry or Registry()
+        self.last = None  # last snapshot written
+        self._file = open(path, 'a') if path is not None else None
+        self._handle = None  # snapshot timer handle
+        self._loop = None
+        self._started = None  # loop time of start()
+        self._previous = (0.0, {})  # (elapsed, counters) of the last snapshot
+
+    def start(self, loop):
+        self._loop = loop
+        self._started = loop.time()
+        self._handle = loop.call_later(self.interval, self._tick)
+
+    def _tick(self):
+        self.write()
+        self._handle = self._loop.call_later(self.interval, self._tick)
+
+    def write(self, summary=False):  # append one snapshot
+        snapshot = self.registry.snapshot()
+        elapsed = self._loop.time() - self._started if self._loop is not None else 0.0
+        since, before = (0.0, {}) if summary else self._previous
+        span = elapsed - since
+        snapshot['rates'] = {name: (value - before.get(name, 0)) / span if span > 0 else 0.0
+                             for name, value in snapshot['counters'].items()}
+        snapshot.update({'time': time.time(), 'role': self.role, 'summary': summary, 'elapsed': elapsed})
+        self._previous = (elapsed, snapshot['counters'])
+        self.last = snapshot
+        if self._file is not None:
+            self._file.write(json.dumps(snapshot) + '\n')
+            self._file.flush()
+        return snapshot
+
+    def stop(self):  # write summary and close file
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.write(True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return self.last
+
+
+def watch_sender(registry, core):
+    """
+    expose sender core state : counters it keeps, window occupancy, advertised window, timeout and RTT histogram
+    :param registry: Registry
+    :param core: sender state machine
+    """
+    for name in ('sent', 'retransmitted', 'timeouts', 'fast_retransmits', 'probes'):
+        registry.counter(name, lambda name=name: getattr(core, name))
+    registry.gauge('in_flight', core.in_flight)
+    registry.gauge('peer_window', lambda: core.advertised_edge - core.base if core.advertised_edge is not None
+                   else None)
+    registry.gauge('window', lambda: core.cc.window() if core.cc is not None else core.window_size)
+    registry.gauge('rto', core.rtt_est.rto)
+    registry.gauge('srtt', core.rtt_est.srtt)
+    core.rtt_sample = registry.histogram('rtt').record
+
+
+def watch_receiver(registry, core):
+    """
+    expose receiver core state : delivery, duplicates, acks, reorder and application buffer occupancy
+    :param registry: Registry
+    :param core: receiver state machine
+    """
+    for name in ('delivered', 'bytes', 'duplicates', 'acks', 'buffer_full'):
+        registry.counter(name, lambda name=name: getattr(core, name))
+    registry.gauge('unread', lambda: core.unread)
+    registry.gauge('advertised', core.advertised)
+    registry.counter('acks_coalesced', lambda: core.policy.coalesced)
+    window = getattr(core, 'window', None)
+    registry.gauge('buffered', lambda: window.buffered if window is not None else 0)
+
+
+def watch_delivery(registry, sender, receiver):
+    """
+    measure first send to in-order delivery of every packet into histogram 'delivery',
+    packets are delivered in the order they are first sent, so the k-th delivery is the k-th new packet
+    both cores must run in this process on the sender's clock, and the receiver's deliver callback must be set
+    :param registry: Registry
+    :param sender: sender state machine
+    :param receiver: receiver state machine
+    """
+    first_sent = collections.deque()  # first send time of packets not delivered yet
+    histogram = registry.histogram('delivery')
+    clock = sender.clock
+    emit = sender._emit
+    deliver = receiver.deliver
+
+    def timed_emit(seq, retransmit):
+        if not retransmit:
+            first_sent.append(clock())
+        emit(seq, retransmit)
+
+    def timed_deliver(seq, data):
+        if first_sent:
+            histogram.record(clock() - first_sent.popleft())
+        deliver(seq, data)
+    sender._emit = timed_emit
+    receiver.deliver = timed_deliver
+
+
+def format_summary(snapshot):
+    """
+    render snapshot for the console
+    :param snapshot: dict made by Registry.snapshot() or Reporter.write()
+    :return multi-line text
+    """
+    lines = []
+    rates = snapshot.get('rates', {})
+    for name, value in sorted(snapshot['counters'].items()):
+        line = '  ' + name + ' : ' + str(value)
+        if rates.get(name):
+            line += ' (' + str(round(rates[name], 1)) + '/s)'
+        lines.append(line)
+    for name, value in sorted(snapshot['gauges'].items()):
+        lines.append('  ' + name + ' : ' + str(round(value, 3) if isinstance(value, float) else value))
+    for name, summary in sorted(snapshot['histograms'].items()):
+        if not summary['count']:
+            continue
+        lines.append('  ' + name + ' : ' + ', '.join(
+            key + ' ' + str(round(summary[key] * 1000, 2)) + 'ms'
+            for key in ['min', 'mean'] + ['p' + str(p) for p in PERCENTILES] + ['max'])
+            + ' (' + str(summary['count']) + ' samples)')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage:: python metrics.py <metrics file>")
+        exit()
+
+    last = None
+    with open(sys.argv[1]) as f:
+        for line in f:
+            snapshot = json.loads(line)
+            if snapshot['summary']:
+                print(snapshot['role'] + ' run, ' + str(round(snapshot['elapsed'], 3)) + 's')
+                print(format_summary(snapshot))
+            last = snapshot
+    if last is not None and not last['summary']:  # run still going or killed
+        print(last['role'] + ' run in progress, ' + str(round(last['elapsed'], 3)) + 's')
+        print(format_summary(last))
@@ -0,0 +1,178 @@
+"""
+Filename : profiling.py
+Summary  : phase timers, event loop lag, cProfile and tracemalloc reports of sender and receiver runs
+Author   : HyunJun KIM (2019204054)
+"""
+
+import cProfile, io, pstats, time, tracemalloc  # python built-in modules
+import metrics  # custom modules
+
+LAG_INTERVAL = 0.01  # seconds between event loop lag probes
+TOP = 15  # functions and allocation sites in report
+
+
+class Profiler:
+    """
+    times phases of a run with perf_counter around the wrapped callables, inclusive of nested phases,
+    probes how late the event loop runs a timer, and optionally runs cProfile and tracemalloc
+    nothing is wrapped unless a profiler is given, so runs without one pay nothing
+    """
+    def __init__(self, cpu=False, memory=False, lag_interval=LAG_INTERVAL):
+        self.cpu = cpu  # run cProfile on the event loop thread
+        self.memory = memory  # trace allocations
+        self.lag_interval = lag_interval
+        self.phases = {}  # name -> [calls, seconds]
+        self.lag = metrics.Histogram()  # event loop lag in seconds
+        self._profile = cProfile.Profile() if cpu else None
+        self._loop = None
+        self._handle = None  # lag probe handle
+        self._started = None  # (perf_counter, process_time) of start()
+        self._stopped = None
+        self._memory = None  # (snapshot, peak bytes) at stop()
+
+    def wrap(self, name, fn):  # fn timed as phase name
+        phase = self.phases.setdefault(name, [0, 0.0])
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            started = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                phase[0] += 1
+                phase[1] += clock() - started
+        return timed
+
+    def start(self, loop):
+        self._loop = loop
+        if self.memory:
+            tracemalloc.start()
+        self._started = (time.perf_counter(), time.process_time())
+        self._probe(loop.time() + self.lag_interval)
+        if self._profile is not None:
+            self._profile.enable()
+
+    def _probe(self, expected):  # record how late the previous probe ran, schedule the next
+        now = self._loop.time()
+        if self._handle is not None:
+            self.lag.record(max(0.0, now - expected))
+        self._handle = self._loop.call_at(now + self.lag_interval, self._probe, now + self.lag_interval)
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        self._stopped = (time.perf_counter(), time.process_time())
+        if self._handle is not None:
+            self._handle.cancel()
+        if self.memory:
+            self._memory = (tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    def report(self, title, packets=0):
+        """
+        render profile
+        :param title: first line of report
+        :param packets: packets handled, for CPU time per packet
+        :return report text
+        """
+        wall = self._stopped[0] - self._started[0]
+        cpu = self._stopped[1] - self._started[1]
+        lines = [title + ' : ' + str(round(wall, 3)) + 's wall, ' + str(round(cpu, 3)) + 's CPU']
+        if packets:
+            lines.append('CPU time per packet : ' + str(round(cpu / packets * 1e6, 1)) + 'us (' + str(packets)
+                         + ' packets)')
+        lines.append('phase'.ljust(12) + 'calls'.rjust(10) + 'total ms'.rjust(12) + 'mean us'.rjust(10)
+                     + 'wall %'.rjust(8))
+        for name, (calls, seconds) in sorted(self.phases.items(), key=lambda item: -item[1][1]):
+            lines.append(name.ljust(12) + str(calls).rjust(10) + str(round(seconds * 1000, 1)).rjust(12)
+                         + str(round(seconds / calls * 1e6, 1) if calls else 0.0).rjust(10)
+                         + str(round(seconds / wall * 100, 1) if wall else 0.0).rjust(8))
+        lag = self.lag.read()
+        if lag['count']:
+            lines.append('event loop lag : ' + ', '.join(key + ' ' + str(round(lag[key] * 1000, 2)) + 'ms'
+                                                         for key in ('p50', 'p90', 'p99', 'max'))
+                         + ' (' + str(lag['count']) + ' probes every ' + str(self.lag_interval * 1000) + 'ms)')
+        if self._profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(TOP)
+            lines.append('cProfile of event loop thread, top ' + str(TOP) + ' by cumulative time')
+            lines.append(out.getvalue().strip())
+        if self._memory is not None:
+            snapshot, peak = self._memory
+            lines.append('tracemalloc : peak ' + str(round(peak / 1024, 1)) + ' KiB, top ' + str(TOP)
+                         + ' allocation sites still held')
+            for stat in snapshot.statistics('lineno')[:TOP]:
+                lines.append('  ' + str(stat))
+        return '\n'.join(lines)
+
+    def dump(self, path):  # raw cProfile stats for snakeviz or pstats, if cProfile ran
+        if self._profile is not None:
+            self._profile.dump_stats(path)
+
+
+def from_flag(args):
+    """
+    pick the profiling flag out of command line arguments
+    :param args: sys.argv, the flag is removed
+    :return Profiler, or None without --profile
+    --profile times phases and event loop lag, --profile=cpu,mem adds cProfile and tracemalloc
+    """
+    for arg in list(args):
+        if arg == '--profile' or arg.startswith('--profile='):
+            args.remove(arg)
+            options = arg.partition('=')[2].split(',')
+            return Profiler(cpu='cpu' in options, memory='mem' in options)
+    return None
+
+
+def watch_sender(profiler, protocol):
+    """
+    time the phases of a sender protocol : window sends, ack handling, timer checks, logging and socket I/O
+    call before the transport is made, so the first window is timed as well
+    :param profiler: Profiler
+    :param protocol: engine.SenderProtocol
+    """
+    core = protocol.core
+    core.transmit = profiler.wrap('transmit', core.transmit)
+    core.on_ack_packet = profiler.wrap('ack', core.on_ack_packet)
+    core.on_tick = profiler.wrap('timers', core.on_tick)
+    protocol.log = profiler.wrap('log', protocol.log)
+
+
+def watch_receiver(profiler, protocol):
+    """
+    time the phases of a receiver protocol : packet handling, ack flushes, delayed ack checks,
+    logging, payload writes and socket I/O
+    call before the transport is made
+    :param profiler: Profiler
+    :param protocol: engine.ReceiverProtocol
+    """
+    core = protocol.core
+    core.on_packet = profiler.wrap('packet', core.on_packet)
+    core.on_tick = profiler.wrap('timers', core.on_tick)
+    protocol._flush = profiler.wrap('ack', protocol._flush)
+    protocol.log = profiler.wrap('log', protocol.log)
+    if protocol.sink is not None:
+        protocol.sink = _TimedSink(protocol.sink, profiler.wrap('write', protocol.sink.write))
+
+
+def watch_transport(profiler, transport):
+    """
+    time socket syscalls of a transport
+    :param profiler: Profiler
+    :param transport: engine.SocketEndpoint
+    """
+    transport.recv = profiler.wrap('io', transport.recv)
+    transport.send_batch = profiler.wrap('io', transport.send_batch)
+
+
+class _TimedSink:
+    """
+    file wrapper whose write() is timed, everything else goes to the file
+    """
+    def __init__(self, sink, write):
+        self._sink = sink
+        self.write = write
+
+    def __getattr__(self, name):
+        return getattr(self._sink, name)
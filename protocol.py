@@ -0,0 +1,667 @@
+"""
+Filename : protocol.py
+Summary  : rdt 3.0, go-back-N and selective-repeat state machines without I/O
+Author   : HyunJun KIM (2019204054)
+"""
+
+import time
+import congestion, eventlog, utils  # custom modules
+
+READ_HORIZON = 0.05  # seconds of reads a paced application catches up on at once
+
+
+class SenderCore:
+    """
+    base of sender state machines
+    driver sets output(seq, retransmit) to transmit and log(event, seq) to trace,
+    then calls transmit() / on_ack() / on_tick() as events happen
+    with total set, only that many packets are sent and finished() tells when all of them are acked
+    with cc set, packets in flight are capped by its congestion window and with pacer set, sends follow its rate,
+    without cc the pacer spreads window_size packets over the smoothed RTT
+    acks carrying a receive window cap new packets at the edge the receiver advertised, while the edge stops
+    every new packet and nothing is in flight, one packet is let past it every timeout to learn the window again
+    """
+    tag = ''  # log tag of protocol
+
+    def __init__(self, window_size, rtt_est, clock=time.time):
+        self.window_size = window_size
+        self.rtt_est = rtt_est  # adaptive timeout
+        self.clock = clock  # time source, virtual in simulation
+        self.send_times = {}  # sequence -> first send time, retransmitted ones are dropped (Karn)
+        self.output = lambda seq, retransmit: None
+        self.log = lambda event, seq: None
+        self.rtt_sample = lambda rtt: None  # every RTT sample, for metrics
+        self.sent = 0  # packets handed to output
+        self.retransmitted = 0  # packets sent again
+        self.timeouts = 0  # timer expirations
+        self.fast_retransmits = 0  # retransmissions triggered by duplicate acks
+        self.total = None  # packets to send, None to send until the driver stops
+        self.cc = None  # congestion controller, None for a fixed window
+        self.pacer = None  # token bucket pacer, None to send windows back to back
+        self.advertised_edge = None  # first sequence past the receiver's advertised window, None until advertised
+        self.probes = 0  # zero window probes
+        self.persist = utils.Timer(rtt_est.rto(), clock)  # zero window probe timer
+        self._probe = False  # next packet may pass the advertised edge
+
+    def _emit(self, seq, retransmit):  # hand packet to driver and keep RTT bookkeeping
+        if retransmit:
+            self.send_times.pop(seq, None)
+            self.retransmitted += 1
+        else:
+            self.send_times[seq] = self.clock()
+        self.sent += 1
+        self.output(seq, retransmit)
+
+    def _measure(self, seq):  # feed RTT sample of seq if it was never retransmitted
+        sent_at = self.send_times.pop(seq, None)
+        if sent_at is not None:
+            rtt = self.clock() - sent_at
+            self.rtt_est.sample(rtt)
+            self.rtt_sample(rtt)
+
+    def _more(self, index):  # check index-th packet is still to be sent
+        return self.total is None or index < self.total
+
+    def _can_send(self, in_flight):  # window, congestion window and pacer allow one more packet
+        if in_flight >= self.window_size:
+            return False
+        if self.cc is not None and in_flight >= self.cc.window():
+            return False
+        if self.advertised_edge is not None and self.next_seq >= self.advertised_edge:  # zero window, inlined
+            if not self._probe:
+                return False
+            self._probe = False  # probe goes out
+        if self.pacer is not None:
+            self.pacer.set_rate(self._pace_rate())
+            return self.pacer.take()
+        return True
+
+    def _pace_rate(self):  # controller's rate, without one a fixed window per smoothed RTT
+        if self.cc is not None:
+            return self.cc.rate()
+        srtt = self.rtt_est.srtt()
+        return self.window_size / srtt if srtt else None
+
+    def _acked(self, count):  # count packets newly acked
+        if self.cc is not None and count:
+            self.cc.on_ack(count, self.rtt_est.srtt())
+
+    def _lost(self, timeout):  # loss detected by duplicate acks, packet timer or retransmission timeout
+        if self.cc is not None:
+            if timeout:
+                self.cc.on_timeout()
+            else:
+                self.cc.on_loss()
+
+    def _advertise(self, cum_ack, window):  # move the advertised edge, late acks do not pull it back
+        edge = utils.unwrap(cum_ack, self.base) + 1 + window
+        if self.advertised_edge is None or edge > self.advertised_edge:
+            self.advertised_edge = edge
+
+    def _closed(self):  # advertised window is zero : the next packet is at or past the edge
+        return self.advertised_edge is not None and self.next_seq >= self.advertised_edge
+
+    def _persist(self):  # zero window probing : let one packet past the edge once the persist timer expires
+        if not self._closed() or self.in_flight() or not self._more(self.next_seq):
+            self.persist.reset()
+        elif not self.persist.isOngoing():
+            self.persist.set_duration(self.rtt_est.rto())
+            self.persist.start()
+        elif self.persist.chk_timeout():
+            self.log(eventlog.WINDOW_PROBE, self.next_seq)
+            self.probes += 1
+            self._probe = True
+            self.persist.reset()
+
+    def offset(self, seq):  # index of the packet carried by seq, payload position
+        return seq
+
+    def in_flight(self):  # packets sent and not acked yet
+        return self.next_seq - self.base
+
+    def finished(self):  # every packet up to total is acked
+        raise NotImplementedError
+
+    def transmit(self):  # send what the window allows
+        raise NotImplementedError
+
+    def on_ack(self, ack):  # process received ack
+        raise NotImplementedError
+
+    def on_ack_packet(self, packet):  # process received ack packet
+        self.on_ack(utils.extract_packet(packet))
+
+    def on_tick(self):  # check timers
+        raise NotImplementedError
+
+
+class Rdt3Sender(SenderCore):
+    """
+    rdt 3.0 (alternating bit) sender
+    """
+    tag = 'RDT 3.0'
+
+    def __init__(self, window_size, rtt_est, clock=time.time):
+        super().__init__(window_size, rtt_est, clock)
+        self.seq = 0  # sequence flag
+        self.index = 0  # packets acked so far
+        self.waiting = False  # waiting ack of seq
+        self.timer = utils.Timer(rtt_est.rto(), clock)
+
+    def offset(self, seq):  # alternating bit does not count packets
+        return self.index
+
+    def in_flight(self):
+        return int(self.waiting)
+
+    def finished(self):
+        return not self._more(self.index)
+
+    def transmit(self):
+        if not self.waiting and self._more(self.index):
+            self._emit(self.seq, False)
+            self.waiting = True
+            self.timer.set_duration(self.rtt_est.rto())
+            self.timer.start()
+
+    def on_ack(self, ack):
+        if self.waiting and ack == self.seq:
+            self._measure(ack)
+            self.rtt_est.clear_backoff()
+            self.timer.reset()
+            self.seq = 1 - self.seq  # flip seq num
+            self.index += 1
+            self.waiting = False
+
+    def on_tick(self):
+        if self.timer.chk_timeout():
+            self.log(eventlog.TIMEOUT, self.seq)
+            self.timeouts += 1
+            self.rtt_est.backoff()
+            self.timer.reset()
+            self._emit(self.seq, True)
+            self.timer.set_duration(self.rtt_est.rto())
+            self.timer.start()
+
+
+class GbnSender(SenderCore):
+    """
+    go-back-N sender with fast retransmit on duplicate acks
+    going back resends the packet presumed lost and every later one, which the receiver dropped behind the gap,
+    so these later ones are timed again from their new copy, the lost one is not (Karn)
+    a cumulative ack is timed by the newest packet it covers that was never resent, else by the newest one resent
+    behind a gap, unless that sample is below the lowest clean one : then the receiver took the first copy
+    after all (reordering, spurious go back) and the sample belongs to neither copy
+    """
+    tag = 'GoBackN'
+
+    def __init__(self, window_size, rtt_est, clock=time.time, dup_ack_threshold=3):
+        super().__init__(window_size, rtt_est, clock)
+        self.base = 0  # Window flag
+        self.next_seq = 0  # next sequence number
+        self.highest_sent = -1  # highest sequence number ever sent
+        self.timer = utils.Timer(rtt_est.rto(), clock)
+        self.dup_ack_threshold = dup_ack_threshold  # duplicate acks before going back, 0 to disable
+        self.dup_acks = 0  # duplicate acks of base - 1 in a row
+        self.lost_seq = None  # base when the sender last went back, its ack is never timed
+        self.resend_times = {}  # sequence -> send time of the copy resent behind a gap
+        self.min_rtt = None  # lowest RTT of packets never resent, floor of resent packet samples
+
+    def _start_timer(self):
+        self.timer.set_duration(self.rtt_est.rto())
+        self.timer.start()
+
+    def finished(self):
+        return not self._more(self.base)
+
+    def transmit(self):
+        while self._more(self.next_seq) and self._can_send(self.next_seq - self.base):  # send packets in Window
+            retransmit = self.next_seq <= self.highest_sent
+            self._emit(self.next_seq, retransmit)
+            if retransmit:
+                if self.next_seq != self.lost_seq:  # first copy was dropped behind the gap
+                    self.resend_times[self.next_seq] = self.clock()
+                else:
+                    self.resend_times.pop(self.next_seq, None)
+            self.highest_sent = max(self.highest_sent, self.next_seq)
+            self.next_seq += 1
+        if self.base < self.next_seq and not self.timer.isOngoing():
+            self._start_timer()
+
+    def on_ack_packet(self, packet):
+        if len(packet) < utils.SACK_HEAD.size:  # plain ack, receiver advertises no window
+            return self.on_ack(utils.extract_packet(packet))
+        cum_ack, _, window = utils.extract_sack_packet(packet)
+        edge = self.advertised_edge
+        if window is not None:
+            self._advertise(cum_ack, window)
+        if self.advertised_edge != edge and utils.unwrap(cum_ack, self.base) == self.base - 1:
+            return  # window update, not a duplicate ack
+        self.on_ack(cum_ack)
+
+    def _measure_acked(self, ack):  # one RTT sample for a cumulative ack, every packet up to ack is forgotten
+        clean = resent = None
+        for seq in range(self.base, ack + 1):
+            sent_at = self.send_times.pop(seq, None)
+            if sent_at is not None:
+                clean = sent_at
+        if self.resend_times:
+            for seq in range(self.base, ack + 1):
+                sent_at = self.resend_times.pop(seq, None)
+                if sent_at is not None:
+                    resent = sent_at
+        if clean is not None:
+            rtt = self.clock() - clean
+            self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+        elif resent is not None and self.min_rtt is not None and self.clock() - resent >= self.min_rtt:
+            rtt = self.clock() - resent
+        else:
+            return
+        self.rtt_est.sample(rtt)
+        self.rtt_sample(rtt)
+
+    def on_ack(self, ack):
+        ack = utils.unwrap(ack, self.base)
+        if ack >= self.base:
+            self._measure_acked(ack)
+            self._acked(ack + 1 - self.base)
+            self.base = ack + 1
+            self.dup_acks = 0
+            self.rtt_est.clear_backoff()
+            self.timer.reset()
+            if self.base < self.next_seq:  # packets still in flight
+                self._start_timer()
+        elif ack == self.base - 1 and self.base < self.next_seq:  # receiver is missing base
+            self.dup_acks += 1
+            if self.dup_acks == self.dup_ack_threshold:
+                self.log(eventlog.FAST_RETRANSMIT, self.base)
+                self.fast_retransmits += 1
+                self._lost(False)
+                self.timer.reset()
+                self.lost_seq = self.base
+                self.next_seq = self.base  # go back N without waiting for timeout
+
+    def on_tick(self):
+        if self.timer.chk_timeout():
+            self.log(eventlog.TIMEOUT, self.base)
+            self.timeouts += 1
+            self._lost(True)
+            self.rtt_est.backoff()
+            self.timer.reset()
+            self.lost_seq = self.base
+            self.next_seq = self.base  # go back N
+            self.transmit()
+        if self.persist.isOngoing() or self._closed():  # persist timer is armed only on a zero window
+            self._persist()
+
+
+class SrSender(SenderCore):
+    """
+    selective-repeat sender with one timer per packet
+    timers expiring for packets sent before the last loss reduction are the same loss and do not reduce again,
+    and a resent packet acked sooner than the lowest RTT was not lost, so that reduction is undone
+    """
+    tag = 'SelRep'
+
+    def __init__(self, window_size, rtt_est, tick, slots, clock=time.time):
+        super().__init__(window_size, rtt_est, clock)
+        self.window = utils.SendWindow(window_size)  # isAcked checker
+        self.next_seq = 0  # next sequence number
+        self.wheel = utils.TimingWheel(tick, slots, clock)  # per-packet timers
+        self.recover = None  # highest sequence sent at the last loss reduction, timers up to it are that loss
+        self.resent_at = {}  # sequence -> time of its last retransmission, until acked
+        self.min_rtt = None  # lowest RTT measured, an ack sooner than this after a resend is for the first copy
+
+    @property
+    def base(self):  # Window flag
+        return self.window.base
+
+    def finished(self):
+        return not self._more(self.window.base)
+
+    def transmit(self):
+        while self._more(self.next_seq) and self._can_send(self.next_seq - self.window.base):
+            self._emit(self.next_seq, False)
+            self.wheel.start(self.next_seq, self.rtt_est.rto())
+            self.next_seq += 1
+
+    def _mark(self, seq):  # mark seq acked and stop its timer, return True if newly acked
+        if self.window.mark(seq):
+            self.wheel.cancel(seq)
+            if self.resent_at:
+                self._check_resent(seq)
+            return True
+        return False
+
+    def _check_resent(self, seq):  # undo the loss reduction when the ack of a resent packet came too soon
+        resent = self.resent_at.pop(seq, None)
+        if resent is not None and self.min_rtt is not None and self.clock() - resent < self.min_rtt \
+                and self.cc is not None and self.recover is not None and seq <= self.recover:
+            self.cc.undo()
+
+    def _sample(self, sent_at):  # RTT sample of a packet first sent at sent_at
+        rtt = self.clock() - sent_at
+        if self.min_rtt is None or rtt < self.min_rtt:
+            self.min_rtt = rtt
+        self.rtt_est.sample(rtt)
+        self.rtt_sample(rtt)
+
+    def _slide(self):  # update base and shift window
+        if self.window.advance():
+            self.rtt_est.clear_backoff()
+
+    def on_ack(self, ack):
+        ack = utils.unwrap(ack, self.window.base)
+        if self._mark(ack):
+            sent_at = self.send_times.pop(ack, None)
+            if sent_at is not None:
+                self._sample(sent_at)
+            self._acked(1)
+        self._slide()
+
+    def on_ack_packet(self, packet):
+        if len(packet) < utils.SACK_HEAD.size:  # plain ack of one packet
+            return self.on_ack(utils.extract_packet(packet))
+        cum_ack, ranges, window = utils.extract_sack_packet(packet)
+        if window is not None:
+            self._advertise(cum_ack, window)
+        spans = [(self.window.base, utils.unwrap(cum_ack, self.window.base) + 1)]
+        for start, length in ranges:
+            start = utils.unwrap(start, self.window.base)
+            spans.append((start, start + length))
+        send_times = self.send_times
+        oldest = None  # earliest first send among newly acked packets, its RTT includes the receiver's ack delay
+        acked = 0
+        for first, last in spans:
+            for seq in range(first, last):
+                if self._mark(seq):
+                    acked += 1
+                    sent_at = send_times.pop(seq, None)  # every acked packet is forgotten, one is measured
+                    if sent_at is not None and (oldest is None or sent_at < oldest):
+                        oldest = sent_at
+        if oldest is not None:
+            self._sample(oldest)
+        self._acked(acked)
+        self._slide()
+
+    def on_tick(self):
+        # resend only the packets whose own timer expired
+        expired = self.wheel.expired()
+        if expired:
+            self.rtt_est.backoff()
+            if self.recover is None or max(expired) > self.recover:  # one reduction per window, as Reno recovery
+                self.recover = self.next_seq - 1
+                self._lost(False)  # a packet timer is the loss signal of SR, not an idle path
+            now = self.clock()
+            for seq in expired:
+                self.log(eventlog.TIMEOUT, seq)
+                self.timeouts += 1
+                self._emit(seq, True)
+                self.resent_at[seq] = now
+                self.wheel.start(seq, self.rtt_est.rto())
+        if self.persist.isOngoing() or self._closed():
+            self._persist()
+
+
+class AckPolicy:
+    """
+    decides when receiver acks : at once on out-of-order arrival, otherwise
+    every `every` in-order packets or when `delay` has passed since the first unacked one
+    """
+    def __init__(self, every=1, delay=0.0, clock=time.time):
+        self.every = every  # in-order packets per ack
+        self.delay = delay  # longest wait of an in-order packet for its ack
+        self.clock = clock  # time source, virtual in simulation
+        self.pending = 0  # in-order packets not acked yet
+        self.since = None  # arrival time of the oldest one
+        self.coalesced = 0  # acks saved
+
+    def on_arrival(self, in_order):  # count arrival, return True if ack is due now
+        self.pending += 1
+        if not in_order or self.pending >= self.every:
+            return True
+        if self.since is None:
+            self.since = self.clock()
+        return False
+
+    def due(self):  # check delayed ack timer
+        return self.pending > 0 and self.clock() - self.since >= self.delay
+
+    def acked(self):  # ack was sent
+        self.coalesced += max(0, self.pending - 1)
+        self.pending = 0
+        self.since = None
+
+
+class ReceiverCore:
+    """
+    base of receiver state machines
+    driver sets output(packet) to send ack and log(event, seq) to trace,
+    then calls on_packet() as packets arrive and on_tick() to flush delayed acks
+    in-order packets go to deliver(seq, data), which collects them in received unless the driver replaces it
+    on_packet() returns True when it keeps data for later delivery, so the driver must not reuse its buffer
+    with reader set, delivered packets wait in an application buffer of buffer_size packets until the reader's
+    rate lets the application take them, acks of G&B and SR advertise the room left in it
+    without reader and with a buffer as large as the window there is always room, acks carry no window then
+    """
+    tag = ''  # log tag of protocol
+
+    def __init__(self, window_size, policy=None, buffer_size=None, reader=None):
+        self.window_size = window_size
+        self.policy = policy or AckPolicy()  # ack every packet by default
+        self.buffer_size = buffer_size or window_size  # packets the application buffer holds
+        self.reader = reader  # congestion.Pacer of application reads, None to read at delivery
+        self.unread = 0  # delivered packets the application has not taken yet
+        self.buffer_full = 0  # packets dropped for want of application buffer
+        self._advertised = self.buffer_size  # window of the last ack
+        self.advertising = reader is not None or self.buffer_size < window_size  # acks carry the window
+        self.expected_seq = 0  # Expected value of the packet sequence number to receive
+        self.received = []  # received packet
+        self.deliver = lambda seq, data: self.received.append(seq)
+        self.delivered = 0  # packets delivered in order
+        self.bytes = 0  # payload bytes delivered in order
+        self.elapsed = 0.0  # first packet to end sign, measured by driver
+        self.output = lambda packet: None
+        self.log = lambda event, seq: None
+        self.acks = 0  # ack packets sent
+        self.duplicates = 0  # packets received again after delivery
+
+    def on_packet(self, seq, data=None):  # process received data packet
+        raise NotImplementedError
+
+    def _deliver(self, seq, data):  # count and hand in-order packet to deliver
+        self.delivered += 1
+        if data is not None:
+            self.bytes += len(data)
+        self.deliver(seq, data)
+        if self.reader is not None:
+            self.unread += 1
+
+    def advertised(self):  # packets taken beyond the cumulative ack, room left in the application buffer
+        return max(0, self.buffer_size - self.unread)
+
+    def _full(self, seq):  # drop seq for want of buffer, the ack tells the sender the window
+        self.log(eventlog.RECV_FULL, seq)
+        self.buffer_full += 1
+        self._arrived(False)
+
+    def make_ack(self):  # ack packet of current state
+        raise NotImplementedError
+
+    def needs(self, seq):  # check seq would still be taken, for packets rebuilt by FEC
+        raise NotImplementedError
+
+    def _arrived(self, in_order):  # let policy decide to ack now
+        if self.policy.on_arrival(in_order):
+            self._ack()
+
+    def _ack(self):
+        self.policy.acked()
+        self.acks += 1
+        if self.advertising:
+            self._advertised = self.advertised()
+        self.output(self.make_ack())
+
+    def on_tick(self):  # let the application read, flush delayed ack
+        if self.reader is not None and self.unread:
+            self._read()
+        if self.policy.due():
+            self._ack()
+
+    def _read(self):  # application takes what its rate allows
+        while self.unread and self.reader.take():
+            self.unread -= 1
+        if self._advertised < max(1, self.buffer_size // 2) <= self.advertised():  # window update
+            self._ack()
+
+
+class Rdt3Receiver(ReceiverCore):
+    """
+    rdt 3.0 receiver, stop-and-wait acks every packet at once
+    """
+    tag = 'RDT 3.0'
+
+    def on_packet(self, seq, data=None):
+        if seq == self.expected_seq:  # received expected sequence
+            self.log(eventlog.RECV_EXPECTED, seq)
+            self._deliver(seq, data)
+            self.expected_seq = 1 - self.expected_seq  # seq0 -> seq1, seq1 -> seq0
+        else:  # received unexpected sequence
+            self.log(eventlog.RECV_UNEXPECTED, seq)
+            self.duplicates += 1
+        self._ack()
+
+    def make_ack(self):  # both expected and repeated packets are acked with the last received flag
+        return utils.make_packet(1 - self.expected_seq)
+
+    def needs(self, seq):
+        return seq == self.expected_seq
+
+
+class GbnReceiver(ReceiverCore):
+    """
+    go-back-N receiver with cumulative acks
+    """
+    tag = 'GoBackN'
+
+    def on_packet(self, seq, data=None):
+        seq = utils.unwrap(seq, self.expected_seq)
+        if seq == self.expected_seq and self.advertising and not self.advertised():  # no room to deliver it
+            self._full(seq)
+        elif seq == self.expected_seq:  # received expected sequence
+            self.log(eventlog.RECV_EXPECTED, seq)
+            self._deliver(seq, data)
+            self.expected_seq += 1
+            self._arrived(True)
+        else:  # received unexpected sequence, duplicate ack at once
+            self.log(eventlog.RECV_UNEXPECTED, seq)
+            if seq < self.expected_seq:
+                self.duplicates += 1
+            self._arrived(False)
+
+    def make_ack(self):
+        if not self.advertising:
+            return utils.make_packet(self.expected_seq - 1)
+        return utils.make_sack_packet(self.expected_seq - 1, [], self.advertised())
+
+    def needs(self, seq):  # only the expected one, later ones are dropped
+        return utils.unwrap(seq, self.expected_seq) == self.expected_seq
+
+
+class SrReceiver(ReceiverCore):
+    """
+    selective-repeat receiver with bounded reorder buffer,
+    acks carry cumulative ack and SACK ranges of buffered packets
+    """
+    tag = 'SelRep'
+
+    def __init__(self, window_size, policy=None, buffer_size=None, reader=None):
+        super().__init__(window_size, policy, buffer_size, reader)
+        self.window = utils.RecvWindow(window_size, self._deliver)
+
+    def on_packet(self, seq, data=None):
+        seq = utils.unwrap(seq, self.window.base)
+        if self.advertising and seq in self.window and seq - self.window.base >= self.advertised() \
+                and not self.window.isReceived(seq):
+            self._full(seq)  # past the advertised window
+            return False
+        if seq == self.window.base:  # received expected sequence
+            self.log(eventlog.RECV_EXPECTED, seq)
+        elif seq in self.window:  # received unexpected sequence
+            self.log(eventlog.RECV_UNEXPECTED, seq)
+        elif self.window.base - self.window_size <= seq < self.window.base:  # ack was lost, ack again
+            self.log(eventlog.DUPLICATED, seq)
+            self.duplicates += 1
+            self._arrived(False)
+            return False
+        else:  # outside of both windows
+            return False
+        in_order = seq == self.window.base and not self.window.buffered  # filling a gap is acked at once
+        stored = self.window.put(seq, data)
+        if not stored:
+            self.log(eventlog.DUPLICATED, seq)
+            self.duplicates += 1
+        self.expected_seq = self.window.base
+        self._arrived(in_order)
+        return stored and seq >= self.window.base  # waits in reorder buffer
+
+    def needs(self, seq):
+        seq = utils.unwrap(seq, self.window.base)
+        return seq in self.window and not self.window.isReceived(seq)
+
+    def make_ack(self):
+        return utils.make_sack_packet(self.window.base - 1, self.window.ranges(utils.MAX_SACK_RANGES),
+                                      self.advertised() if self.advertising else None)
+
+
+SENDERS = {'rdt3': Rdt3Sender, 'gbn': GbnSender, 'sr': SrSender}
+RECEIVERS = {'rdt3': Rdt3Receiver, 'gbn': GbnReceiver, 'sr': SrReceiver}
+
+
+def new_sender(kind, window_size, timeout, min_rto, max_rto, tick, slots, clock=time.time, dup_ack_threshold=3,
+               cc=None, pacing=False):
+    """
+    build sender state machine
+    :param kind: protocol type : rdt3, gbn, sr
+    :param window_size: sender window size (G&B, SR)
+    :param timeout: initial timeout value
+    :param min_rto: lower bound of adaptive timeout
+    :param max_rto: upper bound of adaptive timeout
+    :param tick: timing wheel resolution (SR)
+    :param slots: timing wheel slots (SR)
+    :param clock: time source, virtual in simulation
+    :param dup_ack_threshold: duplicate acks before fast retransmit (G&B), 0 to disable
+    :param cc: congestion control : reno, rate, or None for a fixed window (G&B, SR)
+    :param pacing: spread sends at the congestion controller's rate, or one window per RTT without one (G&B, SR)
+    :return sender core
+    """
+    rtt_est = utils.RttEstimator(timeout, min_rto, max_rto)
+    if kind == 'sr':
+        core = SrSender(window_size, rtt_est, tick, slots, clock)
+    elif kind == 'gbn':
+        core = GbnSender(window_size, rtt_est, clock, dup_ack_threshold)
+    else:  # stop-and-wait has nothing to control
+        return SENDERS[kind](window_size, rtt_est, clock)
+    core.cc = congestion.new_controller(cc, window_size, clock)
+    if pacing:
+        core.pacer = congestion.Pacer(2 * tick, clock)
+    return core
+
+
+def new_receiver(kind, window_size, ack_every=1, ack_delay=0.0, clock=time.time, buffer_size=None, read_rate=None):
+    """
+    build receiver state machine
+    :param kind: protocol type : rdt3, gbn, sr
+    :param window_size: receiver window size (SR)
+    :param ack_every: in-order packets per ack (G&B, SR)
+    :param ack_delay: longest wait of an in-order packet for its ack (G&B, SR)
+    :param clock: time source, virtual in simulation
+    :param buffer_size: packets of application buffer advertised to the sender (G&B, SR), None for window_size
+    :param read_rate: packets per second the application reads, None to read at delivery
+    :return receiver core
+    """
+    reader = None
+    if read_rate is not None:
+        reader = congestion.Pacer(READ_HORIZON, clock)
+        reader.set_rate(read_rate)
+    return RECEIVERS[kind](window_size, AckPolicy(ack_every, ack_delay, clock), buffer_size, reader)
@@ -4,59 +4,92 @@ Summary  : receiver in rdt protocol
 Author   : HyunJun KIM (2019204054)
 """
 
-from socket import *
-from sender import WINDOW_SIZE, TIMEOUT_THRESHOLD, MAXIMUM_TIME, RTT_MIN, RTT_MAX
-import datetime, sys
-import utils
+from sender import WINDOW_SIZE, TIMEOUT_THRESHOLD, MAXIMUM_TIME, RTT_MIN, RTT_MAX, LOG_LEVEL, \
+    TIMER_TICK, ACK_EVERY, ACK_DELAY, RECV_BUFFER, READ_RATE, MSS, SOCKET_BUFFER, USE_GSO, FEC_GROUP, \
+    METRICS_INTERVAL, TRANSPORT, ENDPOINTS, CONGESTION, write_profile
+import asyncio, sys
+import engine, eventlog, metrics, profiling, protocol, results, transports, utils
 
 # Constants
 RECEIVER_ADDR = "127.0.0.1"
 RECEIVER_PORT = 4242
+RECV_LOG = "recvlog.bin"  # binary event log, read with eventlog.py
+RECV_METRICS = "recvmetrics.jsonl"  # metrics snapshots, read with metrics.py
+RECV_PROFILE = "recvprofile"  # report .txt and cProfile .prof of --profile runs
 
 
-def rdt3_receive(sock):
+def run_receive(kind, sock, path=None, profiler=None):
     """
-    receive function in rdt 3.0 protocal
-    :param sock: python socket object
-    :return all of received packet
+    run receiver state machine on the event loop until end sign arrives
+    :param kind: protocol type : rdt3, gbn, sr
+    :param sock: python socket object, or socket-like object of transports.py
+    :param path: file to write received payload, None to receive sequence numbers only
+    :param profiler: profiling.Profiler or None
+    :return receiver core
     """
-    expected_seq = 0  # Expected value of the packet sequence number to receive
-    received_pack = []  # received packet
-
     # log file input
     try:
-        log = open("recvlog.txt", 'a')
+        log = eventlog.EventLog(RECV_LOG, LOG_LEVEL)
     except IOError:
-        print('cannot open recvlog.txt')
+        print('cannot open ' + RECV_LOG)
         return
     print('working')
-    while True:
-        # Get next packet from sender
-        pack, addr = utils.recv(sock)
-        seq_num = utils.extract_packet(pack)
-        if seq_num == -1:  # check end sign
-            break
-        if seq_num == expected_seq:  # received expected sequence
-            pack = utils.make_packet(expected_seq)
-            sent = utils.send(pack, sock, addr)
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [RDT 3.0] ACK LOSS Occured at seq ' + str(seq_num) + '\n')
-            else:
-                log.write(str(datetime.datetime.now()) + ' [RDT 3.0] Received Expected ' +
-                          str(seq_num) + ', Sending ACK ' + str(expected_seq) + '\n')
-            received_pack.append(expected_seq)
-            expected_seq = 1 - expected_seq  # seq0 -> seq1, seq1 -> seq0
-        else:  # received unexpected sequence
-            pack = utils.make_packet(seq_num)
-            sent = utils.send(pack, sock, addr)
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [RDT 3.0] ACK LOSS Occured at seq ' + str(seq_num) + '\n')
-            else:
-                log.write(str(datetime.datetime.now()) + ' [RDT 3.0] Received Not Expected' +
-                          str(seq_num) + ', Sending ACK ' + str(1 - expected_seq) + '\n')
+    core = protocol.new_receiver(kind, WINDOW_SIZE, ACK_EVERY, ACK_DELAY, buffer_size=RECV_BUFFER, read_rate=READ_RATE)
+    buffers = (SOCKET_BUFFER, SOCKET_BUFFER) if SOCKET_BUFFER else None
+    reporter = metrics.Reporter(RECV_METRICS, 'receiver', METRICS_INTERVAL)
+    if path:
+        with open(path, 'wb') as sink:
+            asyncio.run(engine.receive(core, sock, TIMER_TICK, log, sink=sink, mss=MSS, buffers=buffers, gso=USE_GSO,
+                                       fec_group=FEC_GROUP, reporter=reporter, profiler=profiler))
+    else:
+        asyncio.run(engine.receive(core, sock, TIMER_TICK, log, buffers=buffers, gso=USE_GSO, fec_group=FEC_GROUP,
+                                   reporter=reporter, profiler=profiler))
 
     log.close()
-    return received_pack
+    print("Metrics written to '" + RECV_METRICS + "' (python metrics.py " + RECV_METRICS + ")")
+    print(metrics.format_summary(reporter.last))
+    if profiler is not None:
+        write_profile(profiler, RECV_PROFILE, 'receiver ' + kind, reporter.last['counters']['received'])
+    return core
+
+
+def write_result(kind, core, duration=MAXIMUM_TIME, source='receiver'):
+    """
+    append one experiment result to the results store, replaces the per-protocol .txt result files
+    :param kind: protocol type : rdt3, gbn, sr
+    :param core: finished receiver core
+    :param duration: sending time of the run, MAXIMUM_TIME unless a file was transferred
+    :param source: what produced the run : receiver, server
+    """
+    append_result(kind, {'received': core.delivered, 'duplicates': core.duplicates, 'acks': core.acks,
+                         'bytes': core.bytes, 'elapsed': core.elapsed}, duration, source)
+
+
+def append_result(kind, measured, duration=MAXIMUM_TIME, source='receiver'):
+    """
+    append one run with the parameters of sender.py to the results store
+    :param kind: protocol type : rdt3, gbn, sr
+    :param measured: result column -> value, received and whatever else the run measured
+    :param duration: sending time of the run, MAXIMUM_TIME unless a file was transferred
+    :param source: what produced the run : receiver, server, stripe
+    """
+    run = {'protocol': kind, 'loss': utils.LOSS_PROB, 'timeout': TIMEOUT_THRESHOLD, 'rtt_min': RTT_MIN,
+           'rtt_max': RTT_MAX, 'window': WINDOW_SIZE if kind != 'rdt3' else 1,
+           'cc': CONGESTION if kind != 'rdt3' else None, 'fec': FEC_GROUP, 'duration': duration}
+    run.update(measured)
+    run['goodput'] = utils.goodput(run['bytes'], run['elapsed']) if run.get('bytes') else None
+    store = results.ResultStore(results.RESULTS_DB)
+    store.append([run], source)
+    store.close()
+
+
+def rdt3_receive(sock):
+    """
+    receive function in rdt 3.0 protocal
+    :param sock: python socket object
+    :return all of received packet
+    """
+    return run_receive('rdt3', sock).received
 
 
 def gbn_receive(sock):
@@ -64,42 +97,7 @@ def gbn_receive(sock):
     receive function in go-back-n protocal
     :param sock: python socket object
     """
-    expected_seq = 0  # Expected value of the packet sequence number to receive
-    received_pack = []  # received packet
-    # log file input
-    try:
-        log = open("recvlog.txt", 'a')
-    except IOError:
-        print('cannot open recvlog.txt')
-        return
-    print('working')
-    while True:
-        # Get next packet from sender
-        pack, addr = utils.recv(sock)
-        seq_num = utils.extract_packet(pack)
-        if seq_num == -1:  # check end sign
-            break
-        if seq_num == expected_seq:  # received expected sequence
-            pack = utils.make_packet(expected_seq)
-            sent = utils.send(pack, sock, addr)
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [GoBackN] ACK LOSS Occured at seq ' + str(seq_num) + '\n')
-            else:
-                log.write(str(datetime.datetime.now()) + ' [GoBackN] Received Expected ' + str(seq_num)
-                          + ', Sending ACK ' + str(expected_seq) + '\n')
-            received_pack.append(expected_seq)
-            expected_seq += 1
-        else:
-            pack = utils.make_packet(expected_seq - 1)
-            sent = utils.send(pack, sock, addr)
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [GoBackN] ACK LOSS Occured at seq ' + str(seq_num) + '\n')
-            else:  # received unexpected sequence
-                log.write(str(datetime.datetime.now()) + ' [GoBackN] Received Not Expected ' + str(seq_num)
-                      + ', Sending ACK ' + str(expected_seq) + '\n')
-
-    log.close()
-    return received_pack
+    return run_receive('gbn', sock).received
 
 
 def sr_receive(sock):
@@ -107,86 +105,53 @@ def sr_receive(sock):
     receive function in selective-repeat protocal
     :param sock: python socket object
     """
-    expected_seq = 0  # Expected value of the packet sequence number to receive
-    received_pack = []  # received packet
-    # log file input
-    try:
-        log = open("recvlog.txt", 'a')
-    except IOError:
-        print('cannot open recvlog.txt')
-        return
-    print('working')
-    while True:
-        # Get next packet from sender
-        pack, addr = utils.recv(sock)
-        sequence_num = utils.extract_packet(pack)
-        if sequence_num == -1:  # check end sign
-            break
-        if sequence_num == expected_seq:  # received expected sequence
-            pack = utils.make_packet(sequence_num)
-            sent = utils.send(pack, sock, addr)
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [SelRep] ACK LOSS Occured at seq ' + str(sequence_num) + '\n')
-                continue
-            else:
-                log.write(str(datetime.datetime.now()) + ' [SelRep] Received Expected' + str(sequence_num)
-                      + ', Sending ACK ' + str(sequence_num) + '\n')
-            if len(received_pack) == 0:  # first packet received
-                received_pack.append(expected_seq)
-                expected_seq += 1
-            elif expected_seq < received_pack[-1]:  # unordered packet received
-                received_pack.append(expected_seq)
-                received_pack.sort()
-                expected_seq = received_pack[-1] + 1
-            else:  # ordered packet received
-                received_pack.append(expected_seq)
-                expected_seq += 1
-        else:  # received unexpected sequence
-            pack = utils.make_packet(sequence_num)
-            sent = utils.send(pack, sock, addr)
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [SelRep] ACK LOSS Occured at seq ' + str(sequence_num) + '\n')
-            else:
-                log.write(str(datetime.datetime.now()) + ' [SelRep] Received Not Expected' + str(sequence_num)
-                      + ', Sending ACK ' + str(sequence_num) + '\n')
-            received_pack.append(sequence_num)
-    log.close()
-    return received_pack
+    return run_receive('sr', sock).received
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Usage:: python receiver.py <protocol type : rdt3, gbn, sr>")
+    import stripe  # reads the constants above
+    profiler = profiling.from_flag(sys.argv)
+    transport = transports.from_flag(sys.argv, TRANSPORT)
+    stripes = stripe.from_flag(sys.argv)
+    if len(sys.argv) not in (2, 3):
+        print("Usage:: python receiver.py <protocol type : rdt3, gbn, sr> [file to write] [--profile[=cpu,mem]] "
+              "[--transport=udp|unix|shm] [--stripes=N]")
         exit()
 
-    sock = socket(AF_INET, SOCK_DGRAM)
-    sock.bind((RECEIVER_ADDR, RECEIVER_PORT))
-    if sys.argv[1] == 'rdt3':
-        pro = 'RDT_3'
-        result = rdt3_receive(sock)
-    elif sys.argv[1] == 'gbn':
-        pro = 'Go_Back_N'
-        result = gbn_receive(sock)
-    elif sys.argv[1] == 'sr':
-        pro = 'Selective_Repeat'
-        result = sr_receive(sock)
+    if stripes > 1:  # sub-flows of one transfer, merged into one in-order stream
+        if sys.argv[1] not in ('gbn', 'sr'):
+            print("Striping needs a windowed protocol : {'gbn', 'sr'}")
+            exit()
+        if profiler is not None:
+            print("--profile times one process, it is not used with --stripes")
+        path = sys.argv[2] if len(sys.argv) == 3 else None
+        stripe_results, merged = stripe.receive(sys.argv[1], path, stripes, transport)
+        stripe.print_receive(stripe_results, merged)
+        stripe.write_receive(sys.argv[1], stripe_results, merged, path)
+        print("Log files generated at '" + stripe.log_name(RECV_LOG, 0) + "' ... (python eventlog.py <log file>)")
+        if path:
+            print("Wrote the merged stream to '" + path + "'")
+        print("Successfully Received!")
+        exit()
+
+    sock = transports.open_socket(transport, (RECEIVER_ADDR, RECEIVER_PORT) if transport == 'udp'
+                                  else ENDPOINTS[transport][1])
+    path = sys.argv[2] if len(sys.argv) == 3 else None
+    if sys.argv[1] in protocol.RECEIVERS:
+        core = run_receive(sys.argv[1], sock, path, profiler)
     else:
         print("Invalid Protocol Type Input : {'rdt3', 'gbn', 'sr'}")
         exit()
     sock.close()
 
-    with open(pro + '.txt', 'a') as f:
-        if pro == 'RDT_3':
-            log = str(len(result)) + ' ' + str(MAXIMUM_TIME) + ' ' \
-                  + str(utils.LOSS_PROB) + ' ' + str(TIMEOUT_THRESHOLD) + ' ' \
-                  + '[' + str(RTT_MIN) + ',' + str(RTT_MAX) + ']'
-        else:
-            log = str(len(result)) + ' ' + str(MAXIMUM_TIME) + ' ' \
-                  + str(utils.LOSS_PROB) + ' ' + str(TIMEOUT_THRESHOLD) + ' ' \
-                  + '[' + str(RTT_MIN) + ',' + str(RTT_MAX) + '] ' + str(WINDOW_SIZE)
-        f.write(log + '\n')
-
-    print("Log file generated at 'recvlog.txt'")
+    write_result(sys.argv[1], core, core.elapsed if path else MAXIMUM_TIME)
+
+    print("Log file generated at '" + RECV_LOG + "' (python eventlog.py " + RECV_LOG + ")")
     print("Successfully Received!")
-    print(result)
+    if path:
+        print("Wrote " + str(core.bytes) + " bytes in " + str(core.delivered) + " packets to '" + path + "', "
+              + str(round(core.elapsed, 3)) + "s, goodput " + str(round(utils.goodput(core.bytes, core.elapsed), 3))
+              + " MB/s")
+    else:
+        print(core.received)
     print("The program will exit.")
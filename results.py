@@ -0,0 +1,234 @@
+"""
+Filename : results.py
+Summary  : indexed, append-only SQLite store of experiment results, with import of the former text result files
+Author   : HyunJun KIM (2019204054)
+"""
+
+import argparse, math, os, re, sqlite3, time  # python built-in modules
+
+RESULTS_DB = "results.db"
+BUSY_TIMEOUT = 30  # seconds a writer waits for another one before giving up
+TEXT_FILES = {'RDT_3.txt': 'rdt3', 'Go_Back_N.txt': 'gbn', 'Selective_Repeat.txt': 'sr'}  # former receiver output
+SECTIONS = {'RDT 3.0': 'rdt3', 'Go-Back-N': 'gbn', 'Selective-Repeat': 'sr'}  # section titles of Collected_Dataset.txt
+LINE = re.compile(r'^(\d+) (\S+) (\S+) (\S+) \[(\S+),(\S+)\](?: (\d+))?$')  # one text result line
+KEYS = ('protocol', 'loss', 'timeout', 'rtt_min', 'rtt_max', 'window')  # experiment parameters, indexed
+# column -> SQL type, every run has the parameters and received, the other metrics only where the run measured them
+# timeout is the fixed timeout value, NULL for runs whose timeout adapts to measured RTT,
+# rto is the sender's timeout derived from measured RTT averaged over its samples, NULL where the sender is not seen
+COLUMNS = {'protocol': 'TEXT NOT NULL', 'loss': 'REAL NOT NULL', 'timeout': 'REAL',
+           'rtt_min': 'REAL NOT NULL', 'rtt_max': 'REAL NOT NULL', 'window': 'INTEGER NOT NULL',
+           'cc': 'TEXT', 'fec': 'INTEGER', 'received': 'INTEGER NOT NULL', 'duration': 'REAL NOT NULL',
+           'sent': 'INTEGER', 'retransmitted': 'INTEGER', 'timeouts': 'INTEGER', 'fast_retransmits': 'INTEGER',
+           'duplicates': 'INTEGER', 'acks': 'INTEGER', 'bytes': 'INTEGER', 'elapsed': 'REAL', 'goodput': 'REAL',
+           'rto': 'REAL', 'seed': 'INTEGER', 'source': 'TEXT', 'time': 'REAL'}
+SCHEMA = ['CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, '
+          + ', '.join(name + ' ' + sql for name, sql in COLUMNS.items()) + ')',
+          'CREATE INDEX IF NOT EXISTS runs_params ON runs (' + ', '.join(KEYS) + ')',
+          'CREATE INDEX IF NOT EXISTS runs_source ON runs (source)']
+INSERT = 'INSERT INTO runs (' + ', '.join(COLUMNS) + ') VALUES (' + ', '.join('?' * len(COLUMNS)) + ')'
+
+
+class ResultStore:
+    """
+    one row per run in a SQLite database : write-ahead logging lets readers run beside a writer,
+    and writers of many processes take turns, each append is one short transaction
+    filters on the parameters use the (protocol, loss, timeout, rtt_min, rtt_max, window) index,
+    aggregates are computed by SQLite so only one row per group leaves the database
+    """
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)  # transactions made below
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')  # durable at checkpoints, enough for measurements
+        self._db.execute('BEGIN IMMEDIATE')
+        self._db.execute(SCHEMA[0])
+        self._migrate()
+        for statement in SCHEMA[1:]:
+            self._db.execute(statement)
+        self._db.execute('COMMIT')
+
+    def _migrate(self):  # rebuild a table of an older schema with COLUMNS, keeping its rows
+        present = {row[1]: bool(row[3]) for row in self._db.execute('PRAGMA table_info(runs)')}  # -> NOT NULL
+        wanted = {name: 'NOT NULL' in sql for name, sql in COLUMNS.items()}
+        wanted['id'] = False
+        if present == wanted:
+            return
+        kept = ', '.join(['id'] + [name for name in COLUMNS if name in present])
+        for index in ('runs_params', 'runs_source'):  # names are taken again by the new table
+            self._db.execute('DROP INDEX IF EXISTS ' + index)
+        self._db.execute('ALTER TABLE runs RENAME TO runs_old')
+        self._db.execute(SCHEMA[0])
+        self._db.execute('INSERT INTO runs (' + kept + ') SELECT ' + kept + ' FROM runs_old')
+        self._db.execute('DROP TABLE runs_old')
+
+    def append(self, runs, source=None):
+        """
+        add runs in one transaction
+        :param runs: iterable of dicts with at least the parameters, received and duration, unknown keys are ignored
+        :param source: what produced the runs, for rows that do not name it
+        :return number of rows added
+        """
+        return self._write(_rows(runs, source))
+
+    def replace_source(self, runs, source):
+        """
+        swap every row of source for runs in one transaction, so importing the same file twice keeps one copy
+        :param runs: iterable of run dicts
+        :param source: what produced the runs
+        :return number of rows added
+        """
+        return self._write(_rows(runs, source, force=True), source)
+
+    def _write(self, rows, replace=None):  # insert rows, after deleting the rows of source replace
+        self._db.execute('BEGIN IMMEDIATE')  # take the write lock now, waiting up to BUSY_TIMEOUT
+        try:
+            if replace is not None:
+                self._db.execute('DELETE FROM runs WHERE source = ?', (replace,))
+            self._db.executemany(INSERT, rows)
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+        return len(rows)
+
+    def rows(self, columns, **filters):
+        """
+        :param columns: column names to read
+        :param filters: column name -> value or list of values
+        :return list of row tuples
+        """
+        where, values = _where(filters)
+        return self._db.execute('SELECT ' + ', '.join(_column(name) for name in columns) + ' FROM runs'
+                                + where + ' ORDER BY id', values).fetchall()
+
+    def aggregate(self, keys, metric, **filters):
+        """
+        count, mean and standard deviation of metric for every combination of keys
+        :param keys: column names to group by
+        :param metric: column name or SQL expression over columns, rows where it is NULL are skipped
+        :param filters: column name -> value or list of values
+        :return list of dicts with the keys and 'n', 'mean', 'std', sorted by keys
+        """
+        where, values = _where(filters)
+        where += (' AND ' if where else ' WHERE ') + '(' + metric + ') IS NOT NULL'
+        group = ', '.join(_column(key) for key in keys)
+        cursor = self._db.execute('SELECT ' + (group + ', ' if keys else '') + 'COUNT(*), AVG(' + metric + '), AVG(('
+                                  + metric + ') * (' + metric + ')) FROM runs' + where
+                                  + (' GROUP BY ' + group + ' ORDER BY ' + group if keys else ''), values)
+        groups = []
+        for row in cursor:
+            n, mean, square = row[len(keys):]
+            if not n:
+                continue
+            variance = max(square - mean * mean, 0.0) * n / (n - 1) if n > 1 else 0.0
+            group_row = dict(zip(keys, row[:len(keys)]))
+            group_row.update({'n': n, 'mean': mean, 'std': math.sqrt(variance)})
+            groups.append(group_row)
+        return groups
+
+    def count(self, **filters):
+        where, values = _where(filters)
+        return self._db.execute('SELECT COUNT(*) FROM runs' + where, values).fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+def _rows(runs, source, force=False):  # INSERT values of run dicts, source and time filled in where missing
+    now = time.time()
+    rows = []
+    for run in runs:
+        row = [run.get(name) for name in COLUMNS]
+        if force or row[-2] is None:
+            row[-2] = source
+        if row[-1] is None:
+            row[-1] = now
+        rows.append(row)
+    return rows
+
+
+def _column(name):  # checked column name, never user text in SQL
+    if name not in COLUMNS and name != 'id':
+        raise ValueError('unknown result column : ' + name)
+    return name
+
+
+def _where(filters):  # WHERE clause and values of column filters, a list matches any of its values
+    clauses, values = [], []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            clauses.append(_column(name) + ' IN (' + ', '.join('?' * len(value)) + ')')
+            values.extend(value)
+        else:
+            clauses.append(_column(name) + ' = ?')
+            values.append(value)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), values
+
+
+def read_text(path):
+    """
+    read a former text result file : per-protocol receiver output or Collected_Dataset.txt with section titles
+    line : received  TestingTime  LossProbability  TimeoutThreshold  [RTT_MIN,RTT_MAX]  (WindowSize)
+    :param path: text result file
+    :return iterator of run dicts, rdt 3.0 runs get window 1
+    """
+    protocol = TEXT_FILES.get(os.path.basename(path))
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            title = line.strip('* ')
+            if title in SECTIONS:
+                protocol = SECTIONS[title]
+                continue
+            match = LINE.match(line)
+            if match is None or protocol is None:
+                continue
+            received, duration, loss, timeout, rtt_min, rtt_max, window = match.groups()
+            yield {'protocol': protocol, 'received': int(received), 'duration': float(duration),
+                   'loss': float(loss), 'timeout': float(timeout), 'rtt_min': float(rtt_min),
+                   'rtt_max': float(rtt_max), 'window': int(window) if window else 1}
+
+
+def import_text(store, path):
+    """
+    load a former text result file into store, importing the same file again replaces its rows
+    :param store: ResultStore
+    :param path: text result file
+    :return number of runs imported
+    """
+    runs = list(read_text(path))
+    store.replace_source(runs, os.path.basename(path))
+    return len(runs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='experiment results store')
+    parser.add_argument('--db', default=RESULTS_DB, help='results database')
+    commands = parser.add_subparsers(dest='command')
+    importer = commands.add_parser('import', help='load former text result files, Collected_Dataset.txt')
+    importer.add_argument('files', nargs='+')
+    summary = commands.add_parser('summary', help='mean and deviation per parameter set')
+    summary.add_argument('--protocol', help='comma separated protocols : rdt3, gbn, sr')
+    summary.add_argument('--loss', help='comma separated loss probabilities')
+    summary.add_argument('--window', help='comma separated window sizes')
+    summary.add_argument('--metric', default='received', help='column to aggregate : received, goodput, ...')
+    args = parser.parse_args()
+
+    store = ResultStore(args.db)
+    if args.command == 'import':
+        for path in args.files:
+            print(path + ' : ' + str(import_text(store, path)) + ' runs')
+        print(str(store.count()) + " runs in '" + args.db + "'")
+    elif args.command == 'summary':
+        filters = {'protocol': args.protocol.split(',') if args.protocol else None,
+                   'loss': [float(x) for x in args.loss.split(',')] if args.loss else None,
+                   'window': [int(x) for x in args.window.split(',')] if args.window else None}
+        _column(args.metric)
+        for group in store.aggregate(list(KEYS), args.metric, **filters):
+            print(' '.join(str(group[key]) for key in KEYS) + ' : n ' + str(group['n']) + ', mean '
+                  + str(round(group['mean'], 3)) + ', std ' + str(round(group['std'], 3)))
+    else:
+        parser.print_help()
+    store.close()
@@ -4,287 +4,168 @@ Summary  : sender in rdt protocol
 Author   : HyunJun KIM (2019204054)
 """
 
-from socket import *  # python built-in socket module
-import time, sys, _thread, random, datetime  # python built-in modules
-import utils  # custom module
+import asyncio, sys, time  # python built-in modules
+import engine, eventlog, metrics, profiling, protocol, transports, utils  # custom modules
 
 # Constants
 RECEIVER_ADDR = "127.0.0.1"
 RECEIVER_PORT = 4242
 SENDER_ADDR = "127.0.0.1"
 SENDER_PORT = 2424
-TIMEOUT_THRESHOLD = 0.083  # default timeout value
+TRANSPORT = 'udp'  # datagram backend : 'udp', 'unix' (AF_UNIX datagram), 'shm' (shared memory ring)
+ENDPOINTS = {'udp': ((SENDER_ADDR, SENDER_PORT), (RECEIVER_ADDR, RECEIVER_PORT)),
+             'unix': (transports.unix_path('rdt_sender'), transports.unix_path('rdt_receiver')),
+             'shm': ('rdt_sender', 'rdt_receiver')}  # backend -> (sender address, receiver address)
+TIMEOUT_THRESHOLD = None  # fixed timeout value (0.083 in the original runs), None to adapt it to measured RTT
+INITIAL_RTO = 1  # initial value of adaptive timeout (RFC 6298)
+MIN_RTO = 0.2  # lower bound of adaptive timeout, above RTT plus ACK_DELAY as in Linux (RFC 6298 says 1)
+MAX_RTO = 10  # upper bound of adaptive timeout
 WINDOW_SIZE = 50  # sender window size (G&B, SR)
+MSS = 1400  # payload bytes per packet in file transfer
+SOCKET_BUFFER = 4 * 1024 * 1024  # SO_SNDBUF and SO_RCVBUF bytes, None for kernel default
+USE_GSO = True  # send bursts with Linux UDP GSO when available
+DUP_ACK_THRESHOLD = 3  # duplicate acks before fast retransmit (G&B), 0 to disable
+CONGESTION = None  # congestion control (G&B, SR) : None for a fixed window, 'reno', 'rate'
+PACING = False  # spread each window over the RTT at the congestion controller's rate, or the fixed window's (G&B, SR)
+FEC_GROUP = 0  # data packets per XOR parity packet (G&B, SR), 0 to disable
+ACK_EVERY = 2  # in-order packets per ack of receiver (G&B, SR)
+ACK_DELAY = 0.02  # longest wait of an in-order packet for its ack (G&B, SR)
+RECV_BUFFER = None  # packets of receiver application buffer advertised in acks (G&B, SR), None for WINDOW_SIZE
+READ_RATE = None  # packets per second the receiving application reads, None to read at delivery
 MAXIMUM_TIME = 10  # max execute time
-TIME_LIMITER = time.time() + MAXIMUM_TIME  # max time threshold
 RTT_MIN = 0.08  # Minimum Round-Trip Time
 RTT_MAX = 0.12  # Maximum Round-Trip Time
+TIMER_TICK = 0.005  # timer check interval, timing wheel resolution (SR)
+TIMER_SLOTS = 512  # timing wheel slots (SR)
+LOG_LEVEL = eventlog.TRACE  # event log level : OFF, WARN, INFO, TRACE
+SEND_LOG = "sendlog.bin"  # binary event log, read with eventlog.py
+METRICS_INTERVAL = 1.0  # seconds between metrics snapshots
+SEND_METRICS = "sendmetrics.jsonl"  # metrics snapshots, read with metrics.py
+SEND_PROFILE = "sendprofile"  # report .txt and cProfile .prof of --profile runs
 
-# thread acrossing resources
-base = 0  # Window flag
-mutex = _thread.allocate_lock()  # allocate lock object
-send_timer = utils.Timer(TIMEOUT_THRESHOLD)  # Timeout checker
-acked = [False for _ in range(WINDOW_SIZE)]  # isAcked checker in SR
 
-
-def rdt3_send(sock):
+def rto_bounds(timeout):
     """
-    send function in rdt 3.0 protocol
-    :param sock: python socket object
+    timeout arguments of protocol.new_sender
+    :param timeout: fixed timeout value, None to adapt it to measured RTT
+    :return (initial, lower bound, upper bound) of retransmission timeout
     """
-    global base, mutex, send_timer
-
-    # log file input
-    try:
-        log = open("sendlog.txt", 'a')
-    except IOError:
-        print('cannot open sendlog.txt')
-        return
-    print('working')
-    next_seq_num = 0  # next sequence number
-    base = 0  # sequence flag
-
-    _thread.start_new_thread(rdt3_ack_receive, (sock,))  # start parallel thread
-
-    while time.time() <= TIME_LIMITER:  # limit work time
-        mutex.acquire()  # lock object acquire
-        pack = utils.make_packet(next_seq_num)
-        sent = utils.send(pack, sock, (RECEIVER_ADDR, RECEIVER_PORT))
-        if not sent:
-            log.write(str(datetime.datetime.now()) + ' [RDT 3.0] Data Loss Occured : ' + str(next_seq_num) + '\n')
-        else:
-            log.write(str(datetime.datetime.now()) + ' [RDT 3.0] Sending sequence : ' + str(next_seq_num) + '\n')
-            next_seq_num = 1 - next_seq_num  # flip seq num
-
-        if not send_timer.isOngoing():
-            send_timer.start()
-
-        # sleep to raise timeout
-        while send_timer.isOngoing() and not send_timer.chk_timeout():
-            mutex.release()
-            sleeper = random.uniform(RTT_MIN, RTT_MAX)
-            time.sleep(sleeper)
-            log.write(str(datetime.datetime.now()) + ' [RDT 3.0] RTT : Sleep ' + str(sleeper) + 's at' + str(
-                1 - next_seq_num) + '\n')
-            mutex.acquire()
-
-        if send_timer.chk_timeout():
-            log.write(str(datetime.datetime.now()) + ' [RDT 3.0] Timeout : ' + str(base) + '\n')
-            send_timer.reset()
-            next_seq_num = base
-        mutex.release()  # lock object acquire
-
-    utils.send(utils.make_packet(-1), sock, (RECEIVER_ADDR, RECEIVER_PORT))
-    print("Log file generated at 'sendlog.txt'")
-    print("Successfully sent! The program will exit.")
-
-    log.close()
-    _thread.exit()
-    sock.close()
+    if timeout is None:
+        return INITIAL_RTO, MIN_RTO, MAX_RTO
+    return timeout, timeout, timeout  # estimator clamps every sample and backoff to it
 
 
-def gbn_send(sock):
+def run_send(kind, sock, path=None, profiler=None, peer=(RECEIVER_ADDR, RECEIVER_PORT)):
     """
-    send function in go-back-N protocol
-    :param sock: python socket object
+    run sender state machine on the event loop until MAXIMUM_TIME passes,
+    or until the whole file is acked when path is given
+    :param kind: protocol type : rdt3, gbn, sr
+    :param sock: python socket object, or socket-like object of transports.py
+    :param path: file to transfer, None to send sequence numbers only
+    :param profiler: profiling.Profiler or None
+    :param peer: receiver address on the transport of sock
+    :return sender core
     """
-    global base, mutex, send_timer
-
     # log file input
     try:
-        log = open("sendlog.txt", 'a')
+        log = eventlog.EventLog(SEND_LOG, LOG_LEVEL)
     except IOError:
-        print('cannot open recvlog.txt')
+        print('cannot open ' + SEND_LOG)
         return
+    source = utils.FileSource(path, MSS) if path else None
     print('working')
-    next_seq_num = 0  # next sequence number
-    base = 0  # Window flag
-
-    _thread.start_new_thread(gbn_ack_receive, (sock,))  # start parallel thread
-
-    while time.time() <= TIME_LIMITER:  # limit work time
-        mutex.acquire()  # lock object acquire
-
-        while next_seq_num < base + WINDOW_SIZE:  # send packets in Window
-            pack = utils.make_packet(next_seq_num)
-            sent = utils.send(pack, sock, (RECEIVER_ADDR, RECEIVER_PORT))
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [GoBackN] Data Loss Occured : ' + str(next_seq_num - 1) + '\n')
-            else:
-                log.write(str(datetime.datetime.now()) + ' [GoBackN] Sending sequence : ' + str(next_seq_num - 1) + '\n')
-            next_seq_num += 1
-
-        if not send_timer.isOngoing():
-            send_timer.start()
-
-        # sleep to raise timeout
-        while send_timer.isOngoing() and not send_timer.chk_timeout():
-            mutex.release()
-            sleeper = random.uniform(RTT_MIN, RTT_MAX)
-            time.sleep(sleeper)
-            log.write(str(datetime.datetime.now()) + ' [GoBackN] RTT : Sleep ' + str(sleeper) + 's at' + str(
-                next_seq_num - 1) + '\n')
-            mutex.acquire()
-
-        if send_timer.chk_timeout():
-            log.write(str(datetime.datetime.now()) + ' [GoBackN] Timeout : ' + str(next_seq_num - 1) + '\n')
-            send_timer.reset()
-            next_seq_num = base
-        mutex.release()
-
-    utils.send(utils.make_packet(-1), sock, (RECEIVER_ADDR, RECEIVER_PORT))
-    print("Log file generated at 'sendlog.txt'")
-    print("Successfully sent! The program will exit.")
-
+    core = protocol.new_sender(kind, WINDOW_SIZE, *rto_bounds(TIMEOUT_THRESHOLD), TIMER_TICK, TIMER_SLOTS,
+                               dup_ack_threshold=DUP_ACK_THRESHOLD, cc=CONGESTION, pacing=PACING)
+    reporter = metrics.Reporter(SEND_METRICS, 'sender', METRICS_INTERVAL)
+    started = time.perf_counter()
+    asyncio.run(engine.send(core, sock, peer, MAXIMUM_TIME if source is None else None,
+                            (RTT_MIN, RTT_MAX), TIMER_TICK, log, source,
+                            (SOCKET_BUFFER, SOCKET_BUFFER) if SOCKET_BUFFER else None, USE_GSO, FEC_GROUP, reporter,
+                            profiler))
+    elapsed = time.perf_counter() - started
     log.close()
-    _thread.exit()
-    sock.close()
+    if source is not None:
+        print("Sent " + str(source.size) + " bytes in " + str(source.packets) + " packets, "
+              + str(round(elapsed, 3)) + "s, goodput " + str(round(utils.goodput(source.size, elapsed), 3)) + " MB/s")
+        source.close()
+    print("Log file generated at '" + SEND_LOG + "' (python eventlog.py " + SEND_LOG + ")")
+    print("Metrics written to '" + SEND_METRICS + "' (python metrics.py " + SEND_METRICS + ")")
+    print(metrics.format_summary(reporter.last))
+    if profiler is not None:
+        write_profile(profiler, SEND_PROFILE, 'sender ' + kind, core.sent)
+    if core.cc is not None:
+        print("Congestion window " + str(core.cc.window()) + " of " + str(WINDOW_SIZE) + ", reduced "
+              + str(core.cc.losses) + " times")
+    print("Successfully sent! The program will exit.")
+    return core
 
 
-def sr_send(sock):
+def write_profile(profiler, name, title, packets):
     """
-    send function in Selective Repeat protocol
-    :param sock: python socket object
+    print profile report and save it with the raw cProfile stats
+    :param profiler: stopped profiling.Profiler
+    :param name: file name without extension
+    :param title: first line of report
+    :param packets: packets handled
     """
-    global base, mutex, send_timer, acked
-
-    # log file input
-    try:
-        log = open("sendlog.txt", 'a')
-    except IOError:
-        print('cannot open recvlog.txt')
-        return
-    print('working')
-    next_seq_num = 0  # next sequence number
-    base = 0  # Window flag
-
-    _thread.start_new_thread(sr_ack_receive, (sock,))  # start parallel thread
-
-    while time.time() <= TIME_LIMITER:  # limit work time
-        mutex.acquire()  # lock object acquire
-        while next_seq_num < len(acked) and next_seq_num < base + WINDOW_SIZE:  # repeat (window size) times
-            if acked[next_seq_num]:  # pass if acked
-                log.write(str(datetime.datetime.now()) + ' [SelRep] Duplicated : ' + str(next_seq_num)
-                          + ' pass this sequence\n')
-                next_seq_num += 1
-                continue
-            # send if not acked
-            pack = utils.make_packet(next_seq_num)
-            sent = utils.send(pack, sock, (RECEIVER_ADDR, RECEIVER_PORT))
-            if not sent:
-                log.write(str(datetime.datetime.now()) + ' [SelRep] Data Loss Occured : ' + str(next_seq_num) + '\n')
-            else:
-                log.write(str(datetime.datetime.now()) + ' [SelRep] Sending sequence : ' + str(next_seq_num) + '\n')
-            next_seq_num += 1
-
-        if not send_timer.isOngoing():
-            send_timer.start()
-
-        # sleep to raise timeout
-        while send_timer.isOngoing() and not send_timer.chk_timeout():
-            mutex.release()
-            sleeper = random.uniform(RTT_MIN, RTT_MAX)
-            time.sleep(sleeper)
-            log.write(str(datetime.datetime.now()) + ' [SelRep] RTT : Sleep ' + str(sleeper) + 's at'
-                      + str(next_seq_num - 1) + '\n')
-            mutex.acquire()
-
-        if send_timer.chk_timeout():
-            log.write(str(datetime.datetime.now()) + ' [SelRep] Timeout : ' + str(next_seq_num - 1) + '\n')
-            send_timer.reset()
-            next_seq_num = base
-
-        # catch if not acked
-        for i in range(len(acked)):
-            if not acked[i]:
-                next_seq_num = i
-                break
-        mutex.release()
-
-    utils.send(utils.make_packet(-1), sock, (RECEIVER_ADDR, RECEIVER_PORT))
-    print("Log file generated at 'sendlog.txt'")
-    print("Successfully sent! The program will exit.")
-
-    log.close()
-    _thread.exit()
-    sock.close()
+    report = profiler.report(title, packets)
+    with open(name + '.txt', 'w') as f:
+        f.write(report + '\n')
+    profiler.dump(name + '.prof')
+    print(report)
+    print("Profile written to '" + name + ".txt'")
 
 
-def rdt3_ack_receive(sock):
+def rdt3_send(sock):
     """
-    rdt 3.0 ack receiver
+    send function in rdt 3.0 protocol
     :param sock: python socket object
     """
-    global base, mutex, send_timer
-    while True:
-        pack, _ = utils.recv(sock)
-        ack = utils.extract_packet(pack)
+    return run_send('rdt3', sock)
 
-        # update base
-        if ack >= base:
-            mutex.acquire()
-            base = 1 - ack
-            send_timer.reset()
-            mutex.release()
 
-
-def gbn_ack_receive(sock):
+def gbn_send(sock):
     """
-    go-bakc-N ack receiver
+    send function in go-back-N protocol
     :param sock: python socket object
     """
-    global base, mutex, send_timer
-    while True:
-        pack, _ = utils.recv(sock)
-        ack = utils.extract_packet(pack)
-
-        # update base
-        if ack >= base:
-            mutex.acquire()
-            base = ack + 1
-            send_timer.reset()
-            mutex.release()
+    return run_send('gbn', sock)
 
 
-def sr_ack_receive(sock):
+def sr_send(sock):
     """
-    selective-repeat ack receiver
+    send function in Selective Repeat protocol
     :param sock: python socket object
     """
-    global base, mutex, send_timer, acked
-    while True:
-        pack, _ = utils.recv(sock)
-        ack = utils.extract_packet(pack)
-
-        # mark ack and update base and shift window
-        acked[ack] = True
-        if acked[base]:
-            mutex.acquire()
-            base = ack + 1
-            acked.append(False)
-            send_timer.reset()
-            mutex.release()
-
-        for i in range(base, len(acked)):
-            if not acked[i]:
-                base = i
-                break
+    return run_send('sr', sock)
 
 
 # Main Function
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Usage:: python sender.py <protocol type : rdt3, gbn, sr>")
+    import stripe  # reads the constants above
+    profiler = profiling.from_flag(sys.argv)
+    transport = transports.from_flag(sys.argv, TRANSPORT)
+    stripes = stripe.from_flag(sys.argv)
+    if len(sys.argv) not in (2, 3):
+        print("Usage:: python sender.py <protocol type : rdt3, gbn, sr> [file to transfer] [--profile[=cpu,mem]] "
+              "[--transport=udp|unix|shm] [--stripes=N]")
+        exit()
+
+    if stripes > 1:  # one transfer over parallel sub-flows, each in its own process
+        if sys.argv[1] not in ('gbn', 'sr'):
+            print("Striping needs a windowed protocol : {'gbn', 'sr'}")
+            exit()
+        if profiler is not None:
+            print("--profile times one process, it is not used with --stripes")
+        stripe.print_send(stripe.send(sys.argv[1], sys.argv[2] if len(sys.argv) == 3 else None, stripes, transport))
+        print("Log files generated at '" + stripe.log_name(SEND_LOG, 0) + "' ... (python eventlog.py <log file>)")
+        print("Successfully sent! The program will exit.")
         exit()
 
-    sock = socket(AF_INET, SOCK_DGRAM)
-    sock.bind((SENDER_ADDR, SENDER_PORT))
-    if sys.argv[1] == 'gbn':
-        gbn_send(sock)
-    elif sys.argv[1] == 'rdt3':
-        rdt3_send(sock)
-    elif sys.argv[1] == 'sr':
-        sr_send(sock)
+    local, peer = ENDPOINTS[transport]
+    sock = transports.open_socket(transport, local)
+    if sys.argv[1] in protocol.SENDERS:
+        run_send(sys.argv[1], sock, sys.argv[2] if len(sys.argv) == 3 else None, profiler, peer)
     else:
         print("Invalid Protocol Type. Input one of these : {'rdt3', 'gbn', 'sr'}")
         exit()
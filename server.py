@@ -0,0 +1,203 @@
+"""
+Filename : server.py
+Summary  : multi-client receiver, worker processes share the port with SO_REUSEPORT
+Author   : HyunJun KIM (2019204054)
+"""
+
+import asyncio, multiprocessing, os, signal, socket, sys  # python built-in modules
+from sender import WINDOW_SIZE, LOG_LEVEL, TIMER_TICK, ACK_EVERY, ACK_DELAY, RECV_BUFFER, READ_RATE, MSS, \
+    SOCKET_BUFFER, USE_GSO, FEC_GROUP, MAXIMUM_TIME
+import engine, eventlog, fec, protocol, receiver, utils  # custom modules
+
+# Constants
+WORKERS = os.cpu_count()  # worker processes sharing the port
+FLOW_IDLE = 30  # seconds without a packet before a flow is dropped
+SERVER_LOG = "recvlog"  # binary event log of worker n is recvlog.n.bin
+
+
+class FlowTransport:
+    """
+    transport of one flow inside a server : sends through the shared endpoint, close() ends only this flow
+    """
+    def __init__(self, server, addr):
+        self._server = server
+        self._addr = addr  # (Address, Port) of sender
+        self._closing = False
+
+    def sendto(self, data, addr=None):
+        self._server.transport.sendto(data, self._addr)
+
+    def send_batch(self, packets, addr=None):
+        return self._server.transport.send_batch(packets, self._addr)
+
+    def is_closing(self):
+        return self._closing or self._server.transport.is_closing()
+
+    def close(self):
+        if not self._closing:
+            self._closing = True
+            self._server.loop.call_soon(self._server.end_flow, self._addr)
+
+
+class ServerProtocol(asyncio.DatagramProtocol):
+    """
+    one receiver state machine per sender address, all flows of a worker share one socket and buffer pool
+    a flow starts with its first packet and ends with its end sign or after FLOW_IDLE seconds of silence
+    """
+    def __init__(self, kind, tick, log=None, out_dir=None, mss=0):
+        self.kind = kind  # protocol type : rdt3, gbn, sr
+        self.tick = tick  # delayed ack check interval
+        self.log = log  # EventLog shared by flows or None
+        self.out_dir = out_dir  # directory of received files, None for header-only packets
+        self.mss = mss  # payload bytes per packet
+        self.pool = utils.BufferPool(utils.HEADER_SIZE + mss + (fec.OVERHEAD if FEC_GROUP else 0), engine.RECV_BATCH)
+        self.flows = {}  # (Address, Port) -> ReceiverProtocol
+        self.last_seen = {}  # (Address, Port) -> time of the last packet
+        self.accepted = 0  # flows started
+        self.finished = 0  # flows ended
+        self.transport = None
+        self.loop = None
+        self._touched = {}  # flows that got packets in this wakeup, in arrival order
+        self._reaper = None  # idle flow check handle
+        self.closed = None  # future resolved with the socket error, or None, once the shared socket is closed
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self._reaper = self.loop.call_later(FLOW_IDLE, self._reap)
+        self.closed = self.loop.create_future()
+
+    def connection_lost(self, exc):
+        self._reaper.cancel()
+        for addr in list(self.flows):
+            self.end_flow(addr)
+        self.closed.set_result(exc)
+
+    def datagram_received(self, data, addr):
+        flow = self.flows.get(addr)
+        if flow is None:
+            if utils.extract_packet(data) == engine.END_SEQ:  # end sign of a flow already gone
+                self.pool.give(data.obj)
+                return
+            flow = self._start_flow(addr)
+        self.last_seen[addr] = self.loop.time()
+        self._touched[addr] = flow
+        flow.datagram_received(data, addr)
+
+    def drained(self):  # flush acks of every flow that got packets
+        for flow in self._touched.values():
+            flow.drained()
+        self._touched.clear()
+
+    def _start_flow(self, addr):
+        core = protocol.new_receiver(self.kind, WINDOW_SIZE, ACK_EVERY, ACK_DELAY, buffer_size=RECV_BUFFER,
+                                     read_rate=READ_RATE)
+        sink = None
+        if self.out_dir is not None:
+            name = addr[0] + '_' + str(addr[1]) + '_' + str(os.getpid()) + '_' + str(self.accepted) + '.bin'
+            sink = open(os.path.join(self.out_dir, name), 'wb')
+        done = self.loop.create_future()
+        flow = engine.ReceiverProtocol(core, done, self.tick, self.log, sink, self.mss, self.pool, FEC_GROUP)
+        flow.connection_made(FlowTransport(self, addr))
+        done.add_done_callback(lambda future: self._report(addr, future.result(), sink))
+        self.flows[addr] = flow
+        self.accepted += 1
+        return flow
+
+    def end_flow(self, addr):  # forget flow state
+        flow = self.flows.pop(addr, None)
+        self.last_seen.pop(addr, None)
+        self._touched.pop(addr, None)
+        if flow is not None:
+            flow.connection_lost(None)
+
+    def _report(self, addr, core, sink):
+        self.finished += 1
+        line = 'worker ' + str(os.getpid()) + ' flow ' + addr[0] + ':' + str(addr[1]) + ' : received ' \
+               + str(core.delivered) + ' packets'
+        if sink is not None:
+            sink.close()
+            line += ', ' + str(core.bytes) + ' bytes to ' + sink.name + ', goodput ' \
+                    + str(round(utils.goodput(core.bytes, core.elapsed), 3)) + ' MB/s'
+        print(line, flush=True)
+        receiver.write_result(self.kind, core, core.elapsed if sink is not None else MAXIMUM_TIME, 'server')
+
+    def _reap(self):  # drop flows whose sender went silent
+        now = self.loop.time()
+        for addr, last in list(self.last_seen.items()):
+            if now - last >= FLOW_IDLE:
+                self.flows[addr].transport.close()
+        self._reaper = self.loop.call_later(FLOW_IDLE, self._reap)
+
+
+def open_socket(addr, reuse_port):  # UDP socket bound to (Address, Port), shared between workers if reuse_port
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(addr)
+    if SOCKET_BUFFER:
+        utils.tune_socket(sock, SOCKET_BUFFER, SOCKET_BUFFER)
+    return sock
+
+
+async def run_server(kind, sock, log=None, out_dir=None):
+    """
+    serve flows on sock until SIGINT or SIGTERM, or until the socket fails
+    :param kind: protocol type : rdt3, gbn, sr
+    :param sock: bound python socket object
+    :param log: EventLog or None
+    :param out_dir: directory of received files, None for header-only packets
+    """
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+    server = ServerProtocol(kind, TIMER_TICK, log, out_dir, MSS if out_dir is not None else 0)
+    transport = await engine.open_endpoint(loop, sock, server, USE_GSO)
+    await asyncio.wait([stop, server.closed], return_when=asyncio.FIRST_COMPLETED)
+    transport.close()
+    exc = await server.closed  # the transport has reported its flows
+    if exc is not None:  # socket failed
+        raise exc
+
+
+def serve(kind, addr, worker, reuse_port, out_dir=None):
+    """
+    worker process : bind the shared port and serve until interrupted
+    :param kind: protocol type : rdt3, gbn, sr
+    :param addr: (Address, Port) to bind
+    :param worker: worker number, names the event log
+    :param reuse_port: share the port with other workers
+    :param out_dir: directory of received files, None for header-only packets
+    """
+    sock = open_socket(addr, reuse_port)
+    log = eventlog.EventLog(SERVER_LOG + '.' + str(worker) + '.bin', LOG_LEVEL)
+    asyncio.run(run_server(kind, sock, log, out_dir))
+    log.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3, 4) or sys.argv[1] not in protocol.RECEIVERS:
+        print("Usage:: python server.py <protocol type : rdt3, gbn, sr> [number of workers] [directory to write files]")
+        exit()
+
+    workers = int(sys.argv[2]) if len(sys.argv) >= 3 else WORKERS
+    out_dir = sys.argv[3] if len(sys.argv) == 4 else None
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    reuse_port = hasattr(socket, 'SO_REUSEPORT')
+    if not reuse_port and workers > 1:
+        print('SO_REUSEPORT is not available, serving with one worker')
+        workers = 1
+
+    addr = (receiver.RECEIVER_ADDR, receiver.RECEIVER_PORT)
+    procs = [multiprocessing.Process(target=serve, args=(sys.argv[1], addr, i, reuse_port, out_dir))
+             for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the workers, wait for them to finish
+    print('serving ' + sys.argv[1] + ' on ' + addr[0] + ':' + str(addr[1]) + ' with ' + str(workers)
+          + ' workers, Ctrl+C to stop')
+    for proc in procs:
+        proc.join()
+    print("Log files generated at '" + SERVER_LOG + ".<worker>.bin' (python eventlog.py <log>)")
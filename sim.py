@@ -0,0 +1,201 @@
+"""
+Filename : sim.py
+Summary  : deterministic discrete-event simulation of rdt 3.0, go-back-N and selective-repeat
+Author   : HyunJun KIM (2019204054)
+"""
+
+import heapq, itertools, random, sys, time  # python built-in modules
+import fec, protocol, utils  # custom modules
+
+
+class Simulator:
+    """
+    event queue with virtual clock, events of equal time run in scheduling order
+    """
+    def __init__(self, seed):
+        self.now = 0.0  # virtual time
+        self.random = random.Random(seed)  # every random choice of a run comes from here
+        self.events = 0  # processed events
+        self.links = []  # links of this run
+        self._queue = []  # (time, order, callback, args)
+        self._order = itertools.count()
+
+    def clock(self):  # time source of state machines
+        return self.now
+
+    def schedule(self, delay, callback, *args):  # run callback after delay
+        heapq.heappush(self._queue, (self.now + delay, next(self._order), callback, args))
+
+    def run(self, until):  # process events up to virtual time until
+        while self._queue and self._queue[0][0] <= until:
+            self.now, _, callback, args = heapq.heappop(self._queue)
+            self.events += 1
+            callback(*args)
+        self.now = until
+
+
+class Link:
+    """
+    one-way emulated link : loss, delay distribution, reordering, bandwidth and drop-tail queue
+    delay is ('constant', d), ('uniform', min, max), ('normal', mean, sd) or ('exponential', min, mean extra)
+    """
+    def __init__(self, sim, deliver, loss=0.0, delay=('constant', 0.0), reorder=0.0, bandwidth=None, buffer=None):
+        self.sim = sim
+        self.deliver = deliver  # deliver(packet) at the other end
+        self.loss = loss  # loss probability
+        self.delay = delay  # propagation delay distribution
+        self.reorder = reorder  # probability a packet may overtake earlier ones
+        self.bandwidth = bandwidth  # bytes per second, None for unlimited
+        self.buffer = buffer  # bytes waiting for serialization before drop-tail, None for unlimited
+        self.sent = 0  # packets offered
+        self.lost = 0  # packets dropped
+        self.overflowed = 0  # packets dropped by full queue
+        self._busy_until = 0.0  # end of current serialization
+        self._last_arrival = 0.0  # arrival time of the last in-order packet
+        sim.links.append(self)
+
+    def _sample_delay(self):
+        rng = self.sim.random
+        dist = self.delay[0]
+        if dist == 'constant':
+            return self.delay[1]
+        if dist == 'uniform':
+            return rng.uniform(self.delay[1], self.delay[2])
+        if dist == 'normal':
+            return max(0.0, rng.gauss(self.delay[1], self.delay[2]))
+        if dist == 'exponential':
+            return self.delay[1] + rng.expovariate(1 / self.delay[2])
+        raise ValueError('unknown delay distribution : ' + dist)
+
+    def send(self, packet):  # offer packet to link
+        self.sent += 1
+        if self.sim.random.random() < self.loss:
+            self.lost += 1
+            return False
+        start = max(self.sim.now, self._busy_until)
+        if self.bandwidth and self.buffer is not None and (start - self.sim.now) * self.bandwidth > self.buffer:
+            self.lost += 1  # queue is full
+            self.overflowed += 1
+            return False
+        if self.bandwidth:
+            self._busy_until = start + len(packet) / self.bandwidth
+        else:
+            self._busy_until = start
+        arrival = self._busy_until + self._sample_delay()
+        if self.sim.random.random() >= self.reorder:  # keep FIFO order
+            arrival = max(arrival, self._last_arrival)
+            self._last_arrival = arrival
+        self.sim.schedule(arrival - self.sim.now, self.deliver, packet)
+        return True
+
+
+def simulate(kind, duration, window_size, timeout, min_rto, max_rto, tick, slots, seed=0,
+             loss=0.1, ack_loss=None, delay=('uniform', 0.08, 0.12), ack_delay=('constant', 0.0),
+             reorder=0.0, bandwidth=None, ack_every=1, delayed_ack=0.0, cc=None, pacing=False, buffer=None,
+             fec_group=0, watch=None, buffer_size=None, read_rate=None):
+    """
+    run one transfer against virtual clock
+    :param kind: protocol type : rdt3, gbn, sr
+    :param duration: virtual sending time
+    :param seed: random seed, same seed gives the same run
+    :param loss: data loss probability
+    :param ack_loss: ack loss probability, same as loss if None
+    :param delay: data link delay distribution
+    :param ack_delay: ack link delay distribution
+    :param reorder: probability a packet may overtake earlier ones
+    :param bandwidth: bytes per second of both links, None for unlimited
+    :param ack_every: in-order packets per ack (G&B, SR)
+    :param delayed_ack: longest wait of an in-order packet for its ack (G&B, SR)
+    :param cc: congestion control : reno, rate, or None for a fixed window (G&B, SR)
+    :param pacing: spread sends at the congestion controller's rate, or one window per RTT without one (G&B, SR)
+    :param buffer: bytes queued at the data link before drop-tail, None for unlimited
+    :param fec_group: data packets per XOR parity packet (G&B, SR), 0 without FEC
+    :param watch: watch(sender core, receiver core) called before the run to attach instruments, or None
+    :param buffer_size: packets of receiver application buffer advertised in acks (G&B, SR), None for window_size
+    :param read_rate: packets per second the receiving application reads, None to read at delivery
+    :return (sender core, receiver core, simulator), simulator.links is [data link, ack link]
+    """
+    sim = Simulator(seed)
+    sender = protocol.new_sender(kind, window_size, timeout, min_rto, max_rto, tick, slots, sim.clock,
+                                 cc=cc, pacing=pacing)
+    receiver = protocol.new_receiver(kind, window_size, ack_every, delayed_ack, sim.clock, buffer_size, read_rate)
+    state = {'running': True}
+    encoder = decoder = None
+    if fec_group and kind != 'rdt3':
+        encoder = fec.FecEncoder(fec_group)
+        decoder = fec.FecDecoder(fec_group, kind == 'gbn', window_size // fec_group + 2)
+    if watch is not None:
+        watch(sender, receiver)
+
+    def on_data(packet):
+        seq = utils.extract_packet(packet)
+        if seq == fec.PARITY_SEQ:
+            rebuilt = decoder.on_parity(packet)
+        else:
+            rebuilt = decoder.on_data(seq) if decoder is not None else []
+            receiver.on_packet(seq)
+        for seq, _ in rebuilt:
+            if receiver.needs(seq):
+                receiver.on_packet(seq)
+
+    def on_ack(packet):
+        if state['running']:
+            sender.on_ack_packet(packet)
+            sender.transmit()
+
+    forward = Link(sim, on_data, loss, delay, reorder, bandwidth, buffer)
+    backward = Link(sim, on_ack, loss if ack_loss is None else ack_loss, ack_delay, reorder, bandwidth)
+
+    def send_data(seq, retransmit):
+        if state['running']:
+            forward.send(utils.make_packet(seq))
+            if encoder is not None and not retransmit:
+                parity = encoder.add(seq)
+                if parity is not None:
+                    forward.send(parity)
+
+    def send_ack(packet):
+        backward.send(packet)
+
+    sender.output = send_data
+    receiver.output = send_ack
+
+    def tick_timers():
+        if state['running']:
+            sender.on_tick()
+            sender.transmit()
+            receiver.on_tick()
+            sim.schedule(tick, tick_timers)
+
+    def finish():
+        state['running'] = False
+
+    sim.schedule(0, sender.transmit)
+    sim.schedule(tick, tick_timers)
+    sim.schedule(duration, finish)
+    sim.run(duration + max_rto)  # let packets in flight arrive
+    return sender, receiver, sim
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in protocol.SENDERS:
+        print("Usage:: python sim.py <protocol type : rdt3, gbn, sr> [seed]")
+        exit()
+
+    import sender  # module constants
+    started = time.perf_counter()
+    core, receiver, sim = simulate(sys.argv[1], sender.MAXIMUM_TIME, sender.WINDOW_SIZE,
+                                   *sender.rto_bounds(sender.TIMEOUT_THRESHOLD), sender.TIMER_TICK, sender.TIMER_SLOTS,
+                                   int(sys.argv[2]) if len(sys.argv) == 3 else 0, utils.LOSS_PROB,
+                                   delay=('uniform', sender.RTT_MIN, sender.RTT_MAX),
+                                   ack_every=sender.ACK_EVERY, delayed_ack=sender.ACK_DELAY,
+                                   cc=sender.CONGESTION, pacing=sender.PACING, fec_group=sender.FEC_GROUP,
+                                   buffer_size=sender.RECV_BUFFER, read_rate=sender.READ_RATE)
+    print(str(receiver.delivered) + ' ' + str(sender.MAXIMUM_TIME) + ' ' + str(utils.LOSS_PROB) + ' '
+          + str(sender.TIMEOUT_THRESHOLD) + ' [' + str(sender.RTT_MIN) + ',' + str(sender.RTT_MAX) + '] '
+          + str(sender.WINDOW_SIZE))
+    print('sent ' + str(core.sent) + ', retransmitted ' + str(core.retransmitted) + ', timeouts '
+          + str(core.timeouts) + ', fast retransmits ' + str(core.fast_retransmits) + ', probes ' + str(core.probes)
+          + ', buffer full ' + str(receiver.buffer_full) + ', acks '
+          + str(receiver.acks) + ', events ' + str(sim.events) + ', '
+          + str(round((time.perf_counter() - started) * 1000, 1)) + 'ms')
@@ -0,0 +1,238 @@
+"""
+Filename : stripe.py
+Summary  : striped transfer, one logical transfer split over parallel sub-flows in worker processes
+Author   : HyunJun KIM (2019204054)
+"""
+
+import asyncio, math, multiprocessing, os, queue, time  # python built-in modules
+import receiver, sender  # module constants
+import engine, eventlog, protocol, transports, utils  # custom modules
+
+WORKER_POLL = 1.0  # seconds between checks that no stripe worker died while waiting for results
+
+# packet i of the transfer travels on stripe i mod stripes as that stripe's packet i // stripes
+
+
+def from_flag(args):
+    """
+    pick the stripe flag out of command line arguments
+    :param args: sys.argv, the flag is removed
+    :return number of sub-flows, 1 without --stripes
+    """
+    for arg in list(args):
+        if arg.startswith('--stripes='):
+            args.remove(arg)
+            return max(1, int(arg.partition('=')[2]))
+    return 1
+
+
+def nth(addr, stripe):
+    """
+    address of a sub-flow : next ports for udp, numbered path or name for unix and shm
+    :param addr: address of the whole transfer
+    :param stripe: sub-flow number
+    :return address of sub-flow stripe
+    """
+    if isinstance(addr, tuple):
+        return addr[0], addr[1] + stripe
+    root, ext = os.path.splitext(addr)
+    return root + '_' + str(stripe) + ext
+
+
+class StripeSource:
+    """
+    one stripe of a utils.FileSource : packet j of stripe s carries chunk j * stripes + s of the file
+    """
+    def __init__(self, source, stripe, stripes):
+        self._source = source
+        self._stripe = stripe
+        self._stripes = stripes
+        self.mss = source.mss
+        self.packets = max(0, math.ceil((source.packets - stripe) / stripes))  # packets of this stripe
+        self.size = self.packets * source.mss  # bytes of this stripe
+        if source.packets and (source.packets - 1) % stripes == stripe:  # short last chunk is ours
+            self.size -= source.packets * source.mss - source.size
+
+    def chunk(self, index):
+        return self._source.chunk(index * self._stripes + self._stripe)
+
+    def close(self):
+        self._source.close()
+
+
+class StripeSink:
+    """
+    writes in-order payload of one stripe at its place in the shared output file,
+    and publishes the packets delivered so far in delivered[stripe]
+    """
+    def __init__(self, fd, stripe, stripes, mss, delivered):
+        self._fd = fd  # output file opened for writing by this process
+        self._stripe = stripe
+        self._stripes = stripes
+        self._mss = mss
+        self._delivered = delivered  # shared array, one count per stripe
+
+    def write(self, data):
+        count = self._delivered[self._stripe]
+        os.pwrite(self._fd, data, (count * self._stripes + self._stripe) * self._mss)
+        self._delivered[self._stripe] = count + 1
+
+    def close(self):
+        os.close(self._fd)
+
+
+def frontier(delivered, total=None):
+    """
+    packets of the merged stream delivered in order : every stripe delivers its own packets in order,
+    so the first packet missing is the earliest next packet over all stripes
+    :param delivered: packets delivered by each stripe
+    :param total: packets of the transfer, None if unknown
+    :return length of the in-order prefix in packets
+    """
+    stripes = len(delivered)
+    merged = min(count * stripes + stripe for stripe, count in enumerate(delivered))
+    return merged if total is None else min(merged, total)
+
+
+def log_name(path, stripe):  # sendlog.bin -> sendlog.2.bin
+    root, ext = os.path.splitext(path)
+    return root + '.' + str(stripe) + ext
+
+
+def _send_worker(kind, path, stripe, stripes, transport, results):
+    local, peer = sender.ENDPOINTS[transport]
+    sock = transports.open_socket(transport, nth(local, stripe))
+    log = eventlog.EventLog(log_name(sender.SEND_LOG, stripe), sender.LOG_LEVEL)
+    source = StripeSource(utils.FileSource(path, sender.MSS), stripe, stripes) if path else None
+    core = protocol.new_sender(kind, sender.WINDOW_SIZE, *sender.rto_bounds(sender.TIMEOUT_THRESHOLD),
+                               sender.TIMER_TICK, sender.TIMER_SLOTS, dup_ack_threshold=sender.DUP_ACK_THRESHOLD,
+                               cc=sender.CONGESTION, pacing=sender.PACING)
+    started = time.perf_counter()
+    asyncio.run(engine.send(core, sock, nth(peer, stripe), sender.MAXIMUM_TIME if source is None else None,
+                            (sender.RTT_MIN, sender.RTT_MAX), sender.TIMER_TICK, log, source,
+                            (sender.SOCKET_BUFFER, sender.SOCKET_BUFFER) if sender.SOCKET_BUFFER else None,
+                            sender.USE_GSO, sender.FEC_GROUP))
+    log.close()
+    results.put((stripe, {'sent': core.sent, 'retransmitted': core.retransmitted,
+                          'bytes': source.size if source is not None else 0,
+                          'elapsed': time.perf_counter() - started}))
+    if source is not None:
+        source.close()
+
+
+def _receive_worker(kind, path, stripe, stripes, transport, delivered, results):  # delivered : shared counts
+    sock = transports.open_socket(transport, nth(sender.ENDPOINTS[transport][1], stripe))
+    log = eventlog.EventLog(log_name(receiver.RECV_LOG, stripe), sender.LOG_LEVEL)
+    core = protocol.new_receiver(kind, sender.WINDOW_SIZE, sender.ACK_EVERY, sender.ACK_DELAY,
+                                 buffer_size=sender.RECV_BUFFER, read_rate=sender.READ_RATE)
+    sink = None
+    if path:
+        sink = StripeSink(os.open(path, os.O_WRONLY), stripe, stripes, sender.MSS, delivered)
+    else:  # count deliveries for the merged stream
+        deliver = core.deliver
+
+        def counted(seq, data):
+            deliver(seq, data)
+            delivered[stripe] += 1
+        core.deliver = counted
+    asyncio.run(engine.receive(core, sock, sender.TIMER_TICK, log, sink=sink, mss=sender.MSS if path else 0,
+                               buffers=(sender.SOCKET_BUFFER, sender.SOCKET_BUFFER) if sender.SOCKET_BUFFER else None,
+                               gso=sender.USE_GSO, fec_group=sender.FEC_GROUP))
+    sock.close()
+    log.close()
+    if sink is not None:
+        sink.close()
+    results.put((stripe, {'delivered': core.delivered, 'bytes': core.bytes, 'elapsed': core.elapsed,
+                          'duplicates': core.duplicates, 'acks': core.acks}))
+
+
+def _run(target, stripes, args):  # one worker per stripe with args(stripe) and a result queue, wait for all
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=target, args=args(stripe) + (results,)) for stripe in range(stripes)]
+    for proc in procs:
+        proc.start()
+    collected = {}
+    while len(collected) < stripes:
+        try:
+            stripe, result = results.get(timeout=WORKER_POLL)
+        except queue.Empty:  # a worker that died never puts its result
+            for stripe, proc in enumerate(procs):
+                if stripe not in collected and proc.exitcode not in (None, 0):
+                    for other in procs:
+                        other.terminate()
+                    raise RuntimeError('stripe ' + str(stripe) + ' worker exited with code ' + str(proc.exitcode))
+            continue
+        collected[stripe] = result
+    for proc in procs:
+        proc.join()
+    return [collected[stripe] for stripe in range(stripes)]
+
+
+def send(kind, path, stripes, transport='udp'):
+    """
+    send one transfer over stripes sub-flows, each with its own socket, worker process, window and timers
+    :param kind: protocol type : gbn, sr
+    :param path: file to transfer, None to send sequence numbers for MAXIMUM_TIME
+    :param stripes: number of sub-flows
+    :param transport: datagram backend : udp, unix, shm
+    :return list of per-stripe result dicts
+    """
+    return _run(_send_worker, stripes, lambda stripe: (kind, path, stripe, stripes, transport))
+
+
+def receive(kind, path, stripes, transport='udp'):
+    """
+    receive one striped transfer and merge the sub-flows into one in-order stream, the output file,
+    every stripe writes its in-order packets straight to their place so no payload crosses processes
+    :param kind: protocol type : gbn, sr
+    :param path: file to write, None to receive sequence numbers only
+    :param stripes: number of sub-flows
+    :param transport: datagram backend : udp, unix, shm
+    :return (list of per-stripe result dicts, packets of the merged in-order stream)
+    """
+    if path:
+        open(path, 'wb').close()  # stripes write into it at their offsets
+    delivered = multiprocessing.Array('q', stripes, lock=False)  # in-order packets of every stripe
+    results = _run(_receive_worker, stripes, lambda stripe: (kind, path, stripe, stripes, transport, delivered))
+    return results, frontier(list(delivered))
+
+
+def write_receive(kind, results, merged, path):
+    """
+    append one results store row for the whole striped transfer, figures of the stripes added up
+    :param kind: protocol type : gbn, sr
+    :param results: per-stripe result dicts of receive()
+    :param merged: packets of the merged in-order stream, the transfer's received
+    :param path: file written, None if sequence numbers were received for MAXIMUM_TIME
+    """
+    elapsed = max(result['elapsed'] for result in results)
+    receiver.append_result(kind, {'received': merged, 'elapsed': elapsed,
+                                  'duplicates': sum(result['duplicates'] for result in results),
+                                  'acks': sum(result['acks'] for result in results),
+                                  'bytes': sum(result['bytes'] for result in results)},
+                           elapsed if path else sender.MAXIMUM_TIME, 'stripe')
+
+
+def _summary(name, results, packets, nbytes):  # one console line for the whole striped transfer
+    elapsed = max(result['elapsed'] for result in results)
+    return name + ' ' + str(packets) + ' packets, ' + str(nbytes) + ' bytes over ' + str(len(results)) \
+        + ' stripes, ' + str(round(elapsed, 3)) + 's, goodput ' + str(round(utils.goodput(nbytes, elapsed), 3)) \
+        + ' MB/s'
+
+
+def print_send(results):  # per-stripe and total figures of send()
+    for stripe, result in enumerate(results):
+        print('  stripe ' + str(stripe) + ' : sent ' + str(result['sent']) + ', retransmitted '
+              + str(result['retransmitted']) + ', ' + str(result['bytes']) + ' bytes in '
+              + str(round(result['elapsed'], 3)) + 's')
+    print(_summary('Sent', results, sum(result['sent'] - result['retransmitted'] for result in results),
+                   sum(result['bytes'] for result in results)))
+
+
+def print_receive(results, merged):  # per-stripe and total figures of receive()
+    for stripe, result in enumerate(results):
+        print('  stripe ' + str(stripe) + ' : delivered ' + str(result['delivered']) + ', duplicates '
+              + str(result['duplicates']) + ', ' + str(result['bytes']) + ' bytes in '
+              + str(round(result['elapsed'], 3)) + 's')
+    print(_summary('Received', results, sum(result['delivered'] for result in results),
+                   sum(result['bytes'] for result in results)) + ', ' + str(merged) + ' of them in order')
@@ -0,0 +1,120 @@
+"""
+Filename : sweep.py
+Summary  : run experiments over a parameter grid in parallel worker processes
+Author   : HyunJun KIM (2019204054)
+"""
+
+import argparse, asyncio, concurrent.futures, itertools, json, os, random, time, zlib  # python built-in modules
+import engine, eventlog, results, sender, sim, utils  # custom modules
+
+
+def grid(protocols, losses, timeouts, rtts, windows, repeat, ccs=(None,), fecs=(0,)):
+    """
+    expand parameter grid
+    :return list of experiment parameter dict
+    """
+    runs = []
+    for kind, loss, timeout, (rtt_min, rtt_max), window, cc, fec_group, i in itertools.product(
+            protocols, losses, timeouts, rtts, windows, ccs, fecs, range(repeat)):
+        if kind == 'rdt3' and (window != windows[0] or cc != ccs[0] or fec_group != fecs[0]):  # rdt 3.0 has no window
+            continue
+        runs.append({'protocol': kind, 'loss': loss, 'timeout': timeout, 'rtt_min': rtt_min,
+                     'rtt_max': rtt_max, 'window': 1 if kind == 'rdt3' else window,
+                     'cc': None if kind == 'rdt3' else cc, 'fec': 0 if kind == 'rdt3' else fec_group, 'repeat': i})
+    return runs
+
+
+def run_experiment(params, duration, out_dir, simulate, log_level, pacing=False):
+    """
+    run one sender/receiver pair in this worker process
+    :param params: experiment parameter dict
+    :param duration: sending time
+    :param out_dir: directory of this run's logs
+    :param simulate: use virtual clock simulation instead of loopback UDP
+    :param log_level: event log level
+    :param pacing: spread sends at the congestion controller's rate, or one window per RTT without one
+    :return params with measured results
+    """
+    seed = zlib.crc32(json.dumps(params, sort_keys=True).encode())  # same parameters, same seed
+    started = time.perf_counter()
+    if simulate:
+        core, receiver, _ = sim.simulate(params['protocol'], duration, params['window'],
+                                         *sender.rto_bounds(params['timeout']), sender.TIMER_TICK, sender.TIMER_SLOTS,
+                                         seed, params['loss'],
+                                         delay=('uniform', params['rtt_min'], params['rtt_max']),
+                                         ack_every=sender.ACK_EVERY, delayed_ack=sender.ACK_DELAY,
+                                         cc=params.get('cc'), pacing=pacing, fec_group=params.get('fec', 0))
+    else:
+        utils.LOSS_PROB = params['loss']  # one experiment at a time per worker process
+        random.seed(seed)
+        os.makedirs(out_dir, exist_ok=True)
+        send_log = eventlog.EventLog(os.path.join(out_dir, 'sendlog.bin'), log_level)
+        recv_log = eventlog.EventLog(os.path.join(out_dir, 'recvlog.bin'), log_level)
+        core, receiver = asyncio.run(engine.transfer(
+            params['protocol'], params['window'], *sender.rto_bounds(params['timeout']), sender.TIMER_TICK,
+            sender.TIMER_SLOTS, duration, (params['rtt_min'], params['rtt_max']),
+            send_log=send_log, recv_log=recv_log, ack_every=sender.ACK_EVERY, ack_delay=sender.ACK_DELAY,
+            cc=params.get('cc'), pacing=pacing, fec_group=params.get('fec', 0)))
+        send_log.close()
+        recv_log.close()
+    result = dict(params)
+    result.update({'duration': duration, 'seed': seed, 'received': receiver.delivered, 'sent': core.sent,
+                   'retransmitted': core.retransmitted, 'timeouts': core.timeouts,
+                   'fast_retransmits': core.fast_retransmits, 'rto': core.rtt_est.mean_rto(),
+                   'elapsed': round(time.perf_counter() - started, 3)})
+    return result
+
+
+def parse_rtt(text):  # '0.08-0.12' -> (0.08, 0.12)
+    low, high = text.split('-')
+    return float(low), float(high)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='parallel experiment sweep')
+    parser.add_argument('--protocol', default='rdt3,gbn,sr', help='comma separated : rdt3, gbn, sr')
+    parser.add_argument('--loss', default='0.1,0.01,0.001', help='comma separated loss probabilities')
+    parser.add_argument('--timeout', default=str(sender.TIMEOUT_THRESHOLD),
+                        help='comma separated fixed timeouts, None to adapt the timeout to measured RTT')
+    parser.add_argument('--rtt', default=str(sender.RTT_MIN) + '-' + str(sender.RTT_MAX),
+                        help='comma separated RTT ranges as min-max')
+    parser.add_argument('--window', default=str(sender.WINDOW_SIZE), help='comma separated window sizes')
+    parser.add_argument('--cc', default=str(sender.CONGESTION),
+                        help='comma separated congestion controls : None, reno, rate')
+    parser.add_argument('--pacing', action='store_true', default=sender.PACING,
+                        help='spread sends at the congestion controller rate, or one window per RTT without one')
+    parser.add_argument('--fec', default=str(sender.FEC_GROUP),
+                        help='comma separated data packets per XOR parity packet, 0 without FEC')
+    parser.add_argument('--duration', type=float, default=sender.MAXIMUM_TIME, help='sending time of each run')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per parameter set')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--sim', action='store_true', help='virtual clock simulation instead of loopback UDP')
+    parser.add_argument('--log-level', type=int, default=eventlog.WARN, help='event log level of each run')
+    parser.add_argument('--out', default='sweep', help='output directory')
+    parser.add_argument('--db', default=results.RESULTS_DB, help='results store the runs are appended to')
+    args = parser.parse_args()
+
+    runs = grid(args.protocol.split(','), [float(x) for x in args.loss.split(',')],
+                [None if x == 'None' else float(x) for x in args.timeout.split(',')],
+                [parse_rtt(x) for x in args.rtt.split(',')],
+                [int(x) for x in args.window.split(',')], args.repeat,
+                [None if x == 'None' else x for x in args.cc.split(',')], [int(x) for x in args.fec.split(',')])
+    os.makedirs(args.out, exist_ok=True)
+    print('running ' + str(len(runs)) + ' experiments on ' + str(args.jobs) + ' workers')
+    store = results.ResultStore(args.db)
+
+    with concurrent.futures.ProcessPoolExecutor(args.jobs) as pool, \
+            open(os.path.join(args.out, 'results.jsonl'), 'a') as f:
+        futures = [pool.submit(run_experiment, params, args.duration,
+                               os.path.join(args.out, 'run_' + str(i).zfill(5)), args.sim, args.log_level,
+                               args.pacing)
+                   for i, params in enumerate(runs)]
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            result = future.result()
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+            store.append([result], 'sim' if args.sim else 'sweep')
+            print('[' + str(done) + '/' + str(len(runs)) + '] ' + result['protocol'] + ' loss '
+                  + str(result['loss']) + ' window ' + str(result['window']) + ' : ' + str(result['received']))
+    store.close()
+    print("Results appended to '" + os.path.join(args.out, 'results.jsonl') + "' and '" + args.db + "'")
@@ -0,0 +1,69 @@
+"""
+Filename : test_analyze.py
+Summary  : text logs of the former receiver and sender are read by analyze.py
+Author   : HyunJun KIM (2019204054)
+"""
+
+import contextlib, io, os, sys, tempfile, unittest  # python built-in modules
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analyze, eventlog  # custom modules
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# lines made with the log.write() format strings of the former receiver.py and sender.py, spacing included :
+# the ack is logged before the expected sequence moves on, SelRep and unexpected RDT 3.0 lines have no space
+RECV_LOG = os.path.join(HERE, 'legacy_recvlog.txt')
+SEND_LOG = os.path.join(HERE, 'legacy_sendlog.txt')
+
+
+def read(path):  # events of a text log and what read_text printed on stderr
+    err = io.StringIO()
+    with contextlib.redirect_stderr(err):
+        events = list(analyze.read_text(path))
+    return events, err.getvalue()
+
+
+class LegacyLogTest(unittest.TestCase):
+    def test_receiver_lines(self):
+        events, err = read(RECV_LOG)
+        self.assertEqual(err, '')
+        self.assertEqual([(tag, event, seq) for _, tag, event, seq in events], [
+            ('GoBackN', eventlog.RECV_EXPECTED, 0), ('GoBackN', eventlog.SEND_ACK, 0),
+            ('GoBackN', eventlog.RECV_EXPECTED, 1), ('GoBackN', eventlog.SEND_ACK, 1),
+            ('GoBackN', eventlog.ACK_LOSS, 2),
+            ('GoBackN', eventlog.RECV_UNEXPECTED, 4), ('GoBackN', eventlog.SEND_ACK, 3),
+            ('SelRep', eventlog.RECV_EXPECTED, 5), ('SelRep', eventlog.SEND_ACK, 5),
+            ('SelRep', eventlog.RECV_UNEXPECTED, 7), ('SelRep', eventlog.SEND_ACK, 7),
+            ('SelRep', eventlog.ACK_LOSS, 6),
+            ('RDT 3.0', eventlog.RECV_EXPECTED, 0), ('RDT 3.0', eventlog.SEND_ACK, 0),
+            ('RDT 3.0', eventlog.RECV_UNEXPECTED, 0), ('RDT 3.0', eventlog.SEND_ACK, 0)])
+        self.assertEqual(events[0][0], events[1][0])  # arrival and its ack share the line's time
+
+    def test_sender_lines(self):
+        events, err = read(SEND_LOG)
+        self.assertEqual(err, '')
+        self.assertEqual([(tag, event, seq) for _, tag, event, seq in events], [
+            ('GoBackN', eventlog.SEND, 0), ('GoBackN', eventlog.DATA_LOSS, 3), ('GoBackN', eventlog.TIMEOUT, 3),
+            ('SelRep', eventlog.DUPLICATED, 5), ('SelRep', eventlog.SEND, 6)])
+
+    def test_analysis(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            analyzers = analyze.analyze([SEND_LOG, RECV_LOG])
+        summary = analyzers['GoBackN'].summary()
+        self.assertEqual(summary['events']['Received Expected'], 2)
+        self.assertEqual(summary['events']['ACK LOSS Occured'], 1)
+
+    def test_unknown_lines_counted(self):
+        with open(RECV_LOG) as f:
+            text = f.read()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'recvlog.txt')
+            with open(path, 'w') as f:
+                f.write(text + 'garbage\n2019-11-20 16:02:14.000000 [GoBackN] Something else : 3\n')
+            events, err = read(path)
+        self.assertEqual(len(events), 16)
+        self.assertIn('2 lines not understood', err)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+"""
+Filename : test_engine.py
+Summary  : flows of a server keep the shared buffer pool
+Author   : HyunJun KIM (2019204054)
+"""
+
+import os, sys, unittest  # python built-in modules
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import engine, protocol, utils  # custom modules
+
+
+class ReceiverProtocolTest(unittest.TestCase):
+    def test_shared_pool_without_free_buffers(self):
+        pool = utils.BufferPool(utils.HEADER_SIZE, 0)  # every buffer taken by other flows
+        core = protocol.new_receiver('sr', 10, 1, 0.0)
+        flow = engine.ReceiverProtocol(core, None, 0.01, pool=pool)
+        self.assertIs(flow.pool, pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
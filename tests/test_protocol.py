@@ -0,0 +1,34 @@
+"""
+Filename : test_protocol.py
+Summary  : sender state machines keep bounded state and their throughput, checked on the virtual clock
+Author   : HyunJun KIM (2019204054)
+"""
+
+import os, sys, unittest  # python built-in modules
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sender, sim  # custom modules
+
+
+def simulate(kind, duration, window, loss, **kwargs):  # one run with the constants of sender.py
+    return sim.simulate(kind, duration, window, *sender.rto_bounds(None), sender.TIMER_TICK, sender.TIMER_SLOTS,
+                        1, loss, **kwargs)
+
+
+class SendStateTest(unittest.TestCase):
+    def test_sr_forgets_acked_send_times(self):
+        for ack_every in (1, 2):
+            core, _, _ = simulate('sr', 100, 50, 0.1, delay=('uniform', 0.08, 0.12), ack_every=ack_every,
+                                  delayed_ack=sender.ACK_DELAY)
+            self.assertLessEqual(len(core.send_times), core.next_seq - core.base)
+
+    def test_sr_reno_keeps_lossless_throughput(self):  # spurious timer expiries must not collapse the window
+        for rtt in ((0.04, 0.05), (0.01, 0.02)):
+            for ack_every in (1, sender.ACK_EVERY):
+                runs = [simulate('sr', 20, 50, 0.0, delay=('uniform',) + rtt, ack_every=ack_every,
+                                 delayed_ack=sender.ACK_DELAY, cc=cc)[1].delivered for cc in (None, 'reno')]
+                self.assertGreater(runs[1], 0.9 * runs[0], str(rtt) + ' ack every ' + str(ack_every))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+"""
+Filename : test_transports.py
+Summary  : transport flag refuses the shared memory ring where python has no multiprocessing.shared_memory
+Author   : HyunJun KIM (2019204054)
+"""
+
+import os, sys, unittest  # python built-in modules
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import transports  # custom modules
+
+
+class TransportFlagTest(unittest.TestCase):
+    def test_flag_picked_out(self):
+        args = ['sender.py', 'sr', '--transport=unix']
+        self.assertEqual(transports.from_flag(args), 'unix')
+        self.assertEqual(args, ['sender.py', 'sr'])
+        self.assertEqual(transports.from_flag(args), 'udp')
+
+    def test_shm_without_shared_memory(self):  # python 3.7
+        with mock.patch.object(transports, 'shared_memory', None):
+            with self.assertRaisesRegex(ValueError, '3.8'):
+                transports.from_flag(['sender.py', '--transport=shm'])
+            with self.assertRaisesRegex(ValueError, '3.8'):
+                transports.open_socket('shm', 'rdt_test')
+
+
+if __name__ == '__main__':
+    unittest.main()
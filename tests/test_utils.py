@@ -0,0 +1,53 @@
+"""
+Filename : test_utils.py
+Summary  : timers of utils.py never expire early
+Author   : HyunJun KIM (2019204054)
+"""
+
+import os, sys, unittest  # python built-in modules
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils  # custom modules
+
+
+class Clock:  # virtual time source
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TimingWheelTest(unittest.TestCase):
+    def run_until_expired(self, wheel, clock, key, step):  # advance clock by step until key expires
+        while True:
+            clock.now += step
+            if key in wheel.expired():
+                return clock.now
+
+    def test_started_between_ticks(self):
+        clock = Clock()
+        wheel = utils.TimingWheel(0.01, 16, clock)
+        wheel.start('a', 1.0)  # keeps the wheel running
+        clock.now = 0.0199
+        wheel.expired()
+        wheel.start('b', 0.02)
+        self.assertGreaterEqual(self.run_until_expired(wheel, clock, 'b', 0.0001), 0.0199 + 0.02)
+
+    def test_no_early_expiry(self):
+        clock = Clock()
+        wheel = utils.TimingWheel(0.005, 8, clock)
+        wheel.start('keep', 100.0)
+        for i in range(200):
+            clock.now += 0.0013 * (i % 7)
+            wheel.expired()
+            started = clock.now
+            duration = 0.001 + 0.003 * (i % 13)  # below, at and beyond one turn of the wheel
+            wheel.start(i, duration)
+            fired = self.run_until_expired(wheel, clock, i, 0.0007)
+            self.assertGreaterEqual(fired, started + duration - 1e-9)
+            self.assertLess(fired, started + duration + 0.005 + 0.0007 + 1e-9)  # late by a tick at most
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,320 @@
+"""
+Filename : transports.py
+Summary  : interchangeable datagram backends : UDP, AF_UNIX datagram and a shared memory ring
+Author   : HyunJun KIM (2019204054)
+"""
+
+import ctypes, errno, itertools, os, socket, struct, sys, tempfile  # python built-in modules
+try:
+    from multiprocessing import shared_memory  # python 3.8+
+except ImportError:  # python 3.7 has no shared memory ring
+    shared_memory = None
+
+TRANSPORTS = ('udp', 'unix', 'shm') if shared_memory is not None else ('udp', 'unix')  # backends of this python
+SHM_MISSING = 'shm transport needs python 3.8+ (multiprocessing.shared_memory)'
+RING_SLOTS = 4096  # datagrams a shared memory ring holds
+SLOT_SIZE = 2048  # bytes per ring slot, length prefix included
+NAME_SIZE = 64  # bytes of the producer name in the ring header
+RING_HEAD = struct.Struct('<QQQ' + str(NAME_SIZE) + 's')  # write count, read count, reader sleeps, producer name
+NAME = struct.Struct(str(NAME_SIZE) + 's')  # producer name, after the three counts
+SLOT_LEN = struct.Struct('<H')  # datagram length in front of each slot
+
+_names = itertools.count()  # ephemeral name counter of this process
+_created = set()  # ring names created by this process, tracked by its resource tracker
+
+
+def ephemeral(kind):
+    """
+    fresh local address of backend, for in-process pairs
+    :param kind: backend : udp, unix, shm
+    :return (Address, 0) for udp, socket path for unix, ring name for shm
+    """
+    if kind == 'udp':
+        return '127.0.0.1', 0
+    name = 'rdt_' + str(os.getpid()) + '_' + str(next(_names))
+    return unix_path(name) if kind == 'unix' else name
+
+
+def unix_path(name):  # AF_UNIX socket path of name in the temporary directory
+    return os.path.join(tempfile.gettempdir(), name + '.sock')
+
+
+def open_socket(kind, addr):
+    """
+    bind a non-blocking datagram endpoint of backend, every backend has the socket methods utils and engine use
+    :param kind: backend : udp, unix, shm
+    :param addr: (Address, Port) for udp, socket path for unix, ring name for shm
+    :return socket-like object
+    """
+    if kind == 'udp':
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    elif kind == 'unix':
+        if os.path.exists(addr):  # left by an earlier run
+            os.unlink(addr)
+        sock = UnixSocket()
+    elif kind == 'shm':
+        if shared_memory is None:
+            raise ValueError(SHM_MISSING)
+        return RingSocket(addr)
+    else:
+        raise ValueError('unknown transport : ' + kind)
+    sock.bind(addr)
+    sock.setblocking(False)
+    return sock
+
+
+def from_flag(args, default='udp'):
+    """
+    pick the transport flag out of command line arguments
+    :param args: sys.argv, the flag is removed
+    :param default: backend without --transport
+    :return backend name
+    """
+    for arg in list(args):
+        if arg.startswith('--transport='):
+            args.remove(arg)
+            kind = arg.partition('=')[2]
+            if kind == 'shm' and shared_memory is None:
+                raise ValueError(SHM_MISSING)
+            if kind not in TRANSPORTS:
+                raise ValueError('transport is one of ' + ', '.join(TRANSPORTS))
+            return kind
+    return default
+
+
+class UnixSocket(socket.socket):
+    """
+    AF_UNIX datagram socket that removes its path when closed,
+    a datagram to a path nobody is bound to is dropped as UDP would instead of raising
+    the kernel queues at most net.unix.max_dgram_qlen datagrams (10 by default) for a socket unless it is
+    connected to the sender, so the socket connects to its one peer on the first datagram either way
+    """
+    def __init__(self):
+        super().__init__(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.peer = None  # path connected to
+
+    def connect(self, addr):
+        super().connect(addr)
+        self.peer = addr
+
+    def _connect(self, addr):  # connect to addr once, a missing path is tried again on the next datagram
+        if self.peer is None and addr:
+            try:
+                self.connect(addr)
+            except (FileNotFoundError, ConnectionRefusedError):
+                pass
+
+    def sendmsg(self, buffers, ancdata=(), flags=0, addr=None):
+        self._connect(addr)
+        try:
+            return super().sendmsg(buffers, ancdata, flags, addr)
+        except (FileNotFoundError, ConnectionRefusedError):  # peer not bound yet or gone
+            return sum(len(buf) for buf in buffers)
+
+    def sendto(self, data, addr):
+        self._connect(addr)
+        try:
+            return super().sendto(data, addr)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return len(data)
+
+    def recvfrom_into(self, buffer, nbytes=0, flags=0):
+        nbytes, addr = super().recvfrom_into(buffer, nbytes, flags)
+        self._connect(addr)
+        return nbytes, addr
+
+    def close(self):
+        path = self.getsockname() if self.fileno() != -1 else None
+        super().close()
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+
+class Ring:
+    """
+    single-producer single-consumer ring of datagrams in shared memory,
+    the producer writes a slot and then publishes the write count, the consumer copies a slot out and then
+    publishes the read count, each count has one writer and is one aligned 8-byte word, so no lock is needed
+    before waiting for a wakeup the consumer counts a sleep and looks once more, the producer wakes it once
+    per sleep it sees after publishing, so a burst costs one wakeup instead of one per datagram
+    """
+    def __init__(self, name, create, slots=RING_SLOTS):
+        self.name = name
+        self.slots = slots
+        self.owner = create  # owner unlinks the segment when closed
+        size = RING_HEAD.size + slots * SLOT_SIZE
+        if create:
+            try:
+                self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+            except FileExistsError:  # left by an earlier run
+                shared_memory.SharedMemory(name).unlink()
+                self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+            RING_HEAD.pack_into(self._shm.buf, 0, 0, 0, 0, b'')
+            _created.add(name)
+        else:
+            self._shm = shared_memory.SharedMemory(name)
+            if name not in _created:
+                _untrack(self._shm)
+        self._buf = self._shm.buf
+        self._head = ctypes.c_uint64.from_buffer(self._buf, 0)  # write count, written by producer only
+        self._tail = ctypes.c_uint64.from_buffer(self._buf, 8)  # read count, written by consumer only
+        self._sleeps = ctypes.c_uint64.from_buffer(self._buf, 16)  # consumer waits, written by consumer only
+        self._woken = None  # sleeps value of the last wakeup sent, producer side
+        self._producer = None  # producer name, read once the first datagram is in
+
+    def push(self, buffers, length):  # copy one datagram of length bytes in, False if the ring is full
+        head = self._head.value
+        if head - self._tail.value >= self.slots:
+            return False
+        if length > SLOT_SIZE - SLOT_LEN.size:
+            raise OSError(errno.EMSGSIZE, 'datagram larger than ring slot')
+        buf = self._buf
+        offset = RING_HEAD.size + (head % self.slots) * SLOT_SIZE
+        SLOT_LEN.pack_into(buf, offset, length)
+        offset += SLOT_LEN.size
+        for part in buffers:
+            end = offset + len(part)
+            buf[offset:end] = part
+            offset = end
+        self._head.value = head + 1  # publish after the slot is written
+        return True
+
+    def wake_due(self):  # producer : consumer went to sleep since the last wakeup, call after push
+        sleeps = self._sleeps.value
+        if sleeps == self._woken:
+            return False
+        self._woken = sleeps
+        return True
+
+    def sleep(self):  # consumer : count a sleep before the last look at the ring
+        self._sleeps.value += 1
+
+    def pop_into(self, target):  # copy one datagram out, return its length or None if empty, longer ones are cut
+        tail = self._tail.value
+        if tail == self._head.value:
+            return None
+        offset = RING_HEAD.size + (tail % self.slots) * SLOT_SIZE
+        length, = SLOT_LEN.unpack_from(self._buf, offset)
+        length = min(length, len(target))
+        offset += SLOT_LEN.size
+        target[:length] = self._buf[offset:offset + length]
+        self._tail.value = tail + 1  # slot is free again
+        return length
+
+    def set_producer(self, name):  # tell the consumer who writes, the reply address
+        NAME.pack_into(self._buf, 24, name.encode())
+
+    def producer(self):  # set before the first push, so fixed once a datagram was read
+        if self._producer is None:
+            self._producer = NAME.unpack_from(self._buf, 24)[0].rstrip(b'\0').decode()
+        return self._producer
+
+    def close(self):
+        del self._head, self._tail, self._sleeps  # exported pointers keep the segment open
+        self._buf.release()
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+            _created.discard(self.name)
+
+
+def _untrack(shm):  # attached segments belong to their creator, keep the resource tracker from unlinking them
+    if sys.version_info < (3, 13):
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+
+def _bell_path(name):  # doorbell FIFO of ring name
+    return os.path.join(tempfile.gettempdir(), name + '.bell')
+
+
+class RingSocket:
+    """
+    datagram endpoint on shared memory rings : it owns the ring it reads, named by its address,
+    and attaches to the ring of each peer on the first send to that name
+    a doorbell FIFO per ring gives the event loop a file descriptor to wait on, one byte wakes a sleeping reader,
+    ring slots carry the datagrams without passing through the kernel
+    """
+    def __init__(self, name):
+        self.name = name
+        self._ring = Ring(name, True)
+        path = _bell_path(name)
+        if os.path.exists(path):
+            os.unlink(path)
+        os.mkfifo(path)
+        self._bell = os.open(path, os.O_RDWR | os.O_NONBLOCK)  # read end, write end kept so it never hangs up
+        self._peers = {}  # peer name -> (Ring, doorbell write fd)
+        self._closed = False
+
+    def fileno(self):
+        return self._bell if not self._closed else -1
+
+    def getsockname(self):
+        return self.name
+
+    def setblocking(self, flag):  # rings are always non-blocking
+        pass
+
+    def getsockopt(self, level, option):
+        if level == socket.SOL_SOCKET and option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+            return RING_SLOTS * SLOT_SIZE
+        raise OSError(errno.ENOPROTOOPT, 'not supported by shared memory ring')
+
+    def setsockopt(self, level, option, value):  # ring size is fixed
+        if level != socket.SOL_SOCKET or option not in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+            raise OSError(errno.ENOPROTOOPT, 'not supported by shared memory ring')
+
+    def _peer(self, name):
+        peer = self._peers.get(name)
+        if peer is None:
+            try:
+                ring = Ring(name, False)
+            except FileNotFoundError:  # nobody reads there yet, dropped as UDP would
+                return None
+            ring.set_producer(self.name)
+            peer = self._peers[name] = (ring, os.open(_bell_path(name), os.O_WRONLY | os.O_NONBLOCK))
+        return peer
+
+    def sendmsg(self, buffers, ancdata=(), flags=0, addr=None):
+        if ancdata:
+            raise OSError(errno.EOPNOTSUPP, 'no ancillary data on shared memory ring')
+        length = sum(len(buf) for buf in buffers)
+        peer = self._peer(addr)
+        if peer is None:
+            return length
+        ring, bell = peer
+        if not ring.push(buffers, length):
+            raise BlockingIOError(errno.EAGAIN, 'ring is full')
+        if ring.wake_due():
+            try:
+                os.write(bell, b'\0')
+            except BlockingIOError:  # doorbell already full of wakeups
+                pass
+        return length
+
+    def sendto(self, data, addr):
+        return self.sendmsg([data], (), 0, addr)
+
+    def recvfrom_into(self, buffer):
+        length = self._ring.pop_into(buffer)
+        if length is None:
+            try:  # clear old wakeups, count the sleep, then look again so a send in between is not missed
+                os.read(self._bell, 4096)
+            except BlockingIOError:
+                pass
+            self._ring.sleep()
+            length = self._ring.pop_into(buffer)
+            if length is None:
+                raise BlockingIOError(errno.EAGAIN, 'ring is empty')
+        return length, self._ring.producer()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for ring, bell in self._peers.values():
+            os.close(bell)
+            ring.close()
+        os.close(self._bell)
+        os.unlink(_bell_path(self.name))
+        self._ring.close()
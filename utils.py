@@ -4,24 +4,45 @@ Summary  : define utilities
 Author   : HyunJun KIM (2019204054)
 """
 
+import math
+import mmap
+import os
 import random
+import socket
+import struct
+import sys
 import time
 
 LOSS_PROB = 0.1
+SEQ_SPACE = 2 ** 31  # sequence numbers on the wire wrap around at this value
+ACK_SACK = 0x01  # extended ack flag : cumulative ack followed by SACK ranges
+ACK_WINDOW = 0x02  # extended ack flag : advertised receive window follows the head
+MAX_SACK_RANGES = 32  # SACK ranges in one ack
+SACK_HEAD = struct.Struct('<iBB')  # cumulative ack, flags, number of ranges
+SACK_WINDOW = struct.Struct('<H')  # packets the receiver takes beyond the cumulative ack
+SACK_RANGE = struct.Struct('<IH')  # first sequence, length
+HEADER_SIZE = 4  # sequence number in front of payload
+ACK_SIZE = SACK_HEAD.size + SACK_WINDOW.size + MAX_SACK_RANGES * SACK_RANGE.size  # largest ack packet
+END_PACKET = b'\xff\xff\xff\xff'  # packet(-1), never lost
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)  # Linux UDP GSO option
+GSO_MAX_SEGMENTS = 64  # segments in one GSO send
+GSO_MAX_BYTES = 65000  # payload of one GSO send
+RECV_ERRORS = 16  # socket errors in a row before recv gives up
 
 
 class Timer:
     """
     Timer class to implement timeout
     """
-    def __init__(self, d):
+    def __init__(self, d, clock=time.time):
         self._ongoing = False
         self._curr_time = 0
         self._duration = d
+        self._clock = clock  # time source, virtual in simulation
 
     def start(self):  # timer start
         if not self._ongoing and self._curr_time == 0:
-            self._curr_time = time.time()
+            self._curr_time = self._clock()
             self._ongoing = True
 
     def isOngoing(self):  # check timer is working
@@ -37,36 +58,430 @@ class Timer:
         if not self.isOngoing():
             return False
         else:
-            return time.time() - self._curr_time >= self._duration
+            return self._clock() - self._curr_time >= self._duration
+
+    def set_duration(self, d):  # change timeout duration
+        self._duration = d
+
+
+class RttEstimator:
+    """
+    SRTT/RTTVAR estimator (RFC 6298) to derive retransmission timeout from measured RTT
+    samples must follow Karn's rule : never measure a retransmitted packet
+    """
+    ALPHA = 1 / 8  # SRTT gain
+    BETA = 1 / 4  # RTTVAR gain
+    K = 4  # RTTVAR multiplier
+
+    def __init__(self, initial, min_rto, max_rto):
+        self._srtt = None  # smoothed RTT
+        self._rttvar = None  # RTT variation
+        self._rto = initial  # timeout before backoff
+        self._backoff = 1  # exponential backoff multiplier
+        self._min_rto = min_rto
+        self._max_rto = max_rto
+        self._samples = 0  # RTT samples taken
+        self._rto_sum = 0.0  # timeout after each sample, summed for mean_rto
+
+    def sample(self, rtt):  # update estimate with a measured RTT
+        if self._srtt is None:  # first measurement
+            self._srtt = rtt
+            self._rttvar = rtt / 2
+        else:
+            self._rttvar = (1 - self.BETA) * self._rttvar + self.BETA * abs(self._srtt - rtt)
+            self._srtt = (1 - self.ALPHA) * self._srtt + self.ALPHA * rtt
+        self._rto = self._srtt + self.K * self._rttvar
+        self._backoff = 1  # fresh sample, drop backoff
+        self._samples += 1
+        self._rto_sum += min(self._max_rto, max(self._min_rto, self._rto))
+
+    def backoff(self):  # double timeout after a retransmission timeout
+        if self.rto() < self._max_rto:
+            self._backoff *= 2
+
+    def clear_backoff(self):  # new data acked, path works again
+        if self._srtt is not None:  # before the first sample backoff is all we know of the path
+            self._backoff = 1
+
+    def rto(self):  # current retransmission timeout
+        return min(self._max_rto, max(self._min_rto, self._rto) * self._backoff)
+
+    def srtt(self):  # smoothed RTT, None before the first sample
+        return self._srtt
+
+    def mean_rto(self):  # timeout derived from measured RTT averaged over samples, None before the first one
+        return self._rto_sum / self._samples if self._samples else None
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel to keep one retransmission timer per sequence number
+    start, cancel and expiry are O(1) per timer regardless of how many are running
+    """
+    def __init__(self, tick, slots=256, clock=time.time):
+        self._tick = tick  # time covered by one slot
+        self._slots = [{} for _ in range(slots)]  # slot -> {key: remaining rounds}
+        self._where = {}  # key -> slot index
+        self._cursor = 0  # current slot
+        self._clock = clock  # time source, virtual in simulation
+        self._last = clock()  # time of the last tick
+
+    def start(self, key, d):  # (re)start timer of key with duration d, it never expires before d has passed
+        self.cancel(key)
+        now = self._clock()
+        if not self._where:  # wheel was idle, align ticks with current time
+            self._last = now
+        ticks = max(1, math.ceil((d + now - self._last) / self._tick))  # counted from the cursor's time, not now
+        slot = (self._cursor + ticks) % len(self._slots)
+        self._slots[slot][key] = (ticks - 1) // len(self._slots)
+        self._where[key] = slot
+
+    def cancel(self, key):  # stop timer of key if it is running
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del self._slots[slot][key]
+
+    def isOngoing(self, key):  # check timer of key is working
+        return key in self._where
+
+    def __len__(self):  # number of running timers
+        return len(self._where)
+
+    def expired(self):  # advance wheel to current time, return expired keys
+        now = self._clock()
+        expired = []
+        while self._where and now - self._last >= self._tick:
+            self._last += self._tick
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            bucket = self._slots[self._cursor]
+            for key, rounds in list(bucket.items()):
+                if rounds:  # belongs to a later turn of the wheel
+                    bucket[key] = rounds - 1
+                else:
+                    del bucket[key]
+                    del self._where[key]
+                    expired.append(key)
+        return expired
+
+
+class SendWindow:
+    """
+    fixed-size circular ack bitmap of selective-repeat send window
+    slot of sequence number is seq mod size, so memory and per-packet cost stay constant
+    """
+    def __init__(self, size):
+        self._size = size
+        self._acked = bytearray(size)  # slot -> acked flag
+        self.base = 0  # oldest unacked sequence number
+
+    def __contains__(self, seq):  # check seq is inside window
+        return self.base <= seq < self.base + self._size
+
+    def mark(self, seq):  # mark seq acked, return False if outside window or already acked
+        if seq not in self or self._acked[seq % self._size]:
+            return False
+        self._acked[seq % self._size] = 1
+        return True
+
+    def isAcked(self, seq):  # check seq is acked
+        if seq < self.base:
+            return True
+        return seq in self and self._acked[seq % self._size] == 1
+
+    def advance(self):  # slide base over acked slots, return number of slots freed
+        freed = 0
+        while self._acked[self.base % self._size]:
+            self._acked[self.base % self._size] = 0
+            self.base += 1
+            freed += 1
+        return freed
+
+
+class RecvWindow:
+    """
+    selective-repeat receive window : out-of-order packets wait in slot seq mod size
+    until the gap before them closes, then the contiguous run is delivered in order
+    """
+    def __init__(self, size, deliver):
+        self._size = size
+        self._slots = [None] * size  # slot -> buffered data
+        self._filled = bytearray(size)  # slot -> buffered flag
+        self._deliver = deliver  # deliver(seq, data) called in sequence order
+        self.base = 0  # next sequence number to deliver
+        self.buffered = 0  # out-of-order packets waiting
+
+    def __contains__(self, seq):  # check seq is inside window
+        return self.base <= seq < self.base + self._size
+
+    def isReceived(self, seq):  # check seq is delivered or buffered
+        if seq < self.base:
+            return True
+        return seq in self and self._filled[seq % self._size] == 1
+
+    def put(self, seq, data=None):  # buffer seq, return False if duplicate or outside window
+        if seq not in self or self._filled[seq % self._size]:
+            return False
+        self._filled[seq % self._size] = 1
+        self._slots[seq % self._size] = data
+        self.buffered += 1
+        while self._filled[self.base % self._size]:  # deliver contiguous run
+            i = self.base % self._size
+            data = self._slots[i]
+            self._filled[i] = 0
+            self._slots[i] = None
+            self.buffered -= 1
+            self._deliver(self.base, data)
+            self.base += 1
+        return True
+
+    def ranges(self, limit):  # runs of buffered packets as (first seq, length), at most limit
+        runs = []
+        if not self.buffered:
+            return runs
+        start = None
+        for seq in range(self.base + 1, self.base + self._size + 1):
+            if seq < self.base + self._size and self._filled[seq % self._size]:
+                if start is None:
+                    start = seq
+            elif start is not None:
+                runs.append((start, seq - start))
+                start = None
+                if len(runs) == limit:
+                    break
+        return runs
+
+
+class FileSource:
+    """
+    memory-mapped input file handed out as MSS-sized memoryview chunks, nothing is copied
+    """
+    def __init__(self, path, mss):
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size  # bytes to transfer
+        self.mss = mss  # payload bytes per packet
+        self.packets = math.ceil(self.size / mss)  # packets to transfer
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._view = memoryview(self._map) if self.size else memoryview(b'')
+
+    def chunk(self, index):  # payload of index-th packet
+        return self._view[index * self.mss:(index + 1) * self.mss]
+
+    def close(self):
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class BufferPool:
+    """
+    preallocated receive buffers, taken for a datagram and given back once its data is consumed
+    """
+    def __init__(self, size, count):
+        self.size = size  # bytes per buffer
+        self._free = [bytearray(size) for _ in range(count)]
+
+    def take(self):  # free buffer, a new one if the pool ran dry
+        return self._free.pop() if self._free else bytearray(self.size)
+
+    def give(self, buf):  # buffer is free again
+        self._free.append(buf)
+
+    def __len__(self):  # free buffers
+        return len(self._free)
+
+
+def goodput(nbytes, seconds):  # delivered payload rate in MB/s
+    return nbytes / seconds / 1e6 if seconds > 0 else 0.0
+
+
+def unwrap(wire_seq, ref):
+    """
+    recover full sequence number from wrapped one on the wire
+    :param wire_seq: sequence number read from packet
+    :param ref: full sequence number close to the expected one (window base)
+    :return sequence number nearest to ref that matches wire_seq
+    """
+    half = SEQ_SPACE // 2
+    return ref + (wire_seq - ref + half) % SEQ_SPACE - half
 
 
 def send(packet, sock, addr):
     """
     send function implemented
-    :param packet: packet to send
+    :param packet: packet to send, or list of buffers sent as one datagram (header, payload)
     :param sock: python socket object
     :param addr: (Address, Port)tuple
     :return sent successfully
     """
     if random.random() > LOSS_PROB:  # if not loss
-        sock.sendto(packet, addr)
+        if isinstance(packet, list):  # gather write, payload is not copied into a packet
+            sock.sendmsg(packet, [], 0, addr)
+        else:
+            sock.sendto(packet, addr)
         return True
-    elif packet == b'\xff\xff\xff\xff':  # if received packet is packet(-1)
+    elif packet == END_PACKET:  # if received packet is packet(-1)
         sock.sendto(packet, addr)
         return True
     else: # if loss, don't send
         return False
 
-def recv(sock):  # packet receiver
-    pack, addr = sock.recvfrom(1024)
-    return pack, addr
+
+def send_batch(packets, sock, addr, gso=False):
+    """
+    send a burst of packets, each one may be lost as with send
+    :param packets: list of packets, each bytes-like or list of buffers sent as one datagram
+    :param sock: non-blocking python socket object
+    :param addr: (Address, Port)tuple
+    :param gso: let the kernel split runs of equal-sized packets (Linux UDP GSO)
+    :return list of sent flags, False for emulated loss or full kernel buffer
+    """
+    sent = [random.random() > LOSS_PROB or packet == END_PACKET for packet in packets]
+    todo = [i for i, ok in enumerate(sent) if ok]
+    while todo:
+        n = _gso_run(packets, todo) if gso else 1
+        run = todo[:n]
+        try:
+            if n == 1:
+                packet = packets[run[0]]
+                if isinstance(packet, list):
+                    sock.sendmsg(packet, [], 0, addr)
+                else:
+                    sock.sendto(packet, addr)
+            else:  # one syscall, one pass through the stack, split into datagrams of the first size
+                sock.sendmsg([buf for i in run for buf in _buffers(packets[i])],
+                             [(socket.SOL_UDP, UDP_SEGMENT, struct.pack('=H', _length(packets[run[0]])))], 0, addr)
+        except (BlockingIOError, InterruptedError):  # kernel buffer is full, the rest is dropped
+            for i in todo:
+                sent[i] = False
+            break
+        todo = todo[n:]
+    return sent
+
+
+def _buffers(packet):  # buffers of one datagram
+    return packet if isinstance(packet, list) else [packet]
+
+
+def _length(packet):  # bytes of one datagram
+    return sum(len(buf) for buf in packet) if isinstance(packet, list) else len(packet)
+
+
+def _gso_run(packets, todo):  # packets from todo[0] that fit one GSO send : equal size, last may be shorter
+    size = _length(packets[todo[0]])
+    n = 1
+    while n < len(todo) and n < GSO_MAX_SEGMENTS and (n + 1) * size <= GSO_MAX_BYTES:
+        length = _length(packets[todo[n]])
+        if length > size:
+            break
+        n += 1
+        if length < size:
+            break
+    return n
+
+
+def gso_supported(sock):  # check the kernel segments UDP for sock
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        sock.getsockopt(socket.SOL_UDP, UDP_SEGMENT)
+        return True
+    except OSError:
+        return False
+
+
+def tune_socket(sock, sndbuf=None, rcvbuf=None):
+    """
+    size kernel socket buffers so a full window burst is not dropped by the kernel
+    :param sock: python socket object
+    :param sndbuf: SO_SNDBUF bytes, None to keep
+    :param rcvbuf: SO_RCVBUF bytes, None to keep
+    :return (SO_SNDBUF, SO_RCVBUF) granted by the kernel
+    """
+    if sndbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    return sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF), sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+
+def recv(sock, pool=None, limit=64):
+    """
+    packet receiver, drains every datagram waiting in a non-blocking socket
+    :param sock: python socket object
+    :param pool: BufferPool to read into, a new buffer per datagram if None
+    :param limit: most datagrams per call
+    :return list of (memoryview of packet, addr), buffers go back with pool.give(view.obj)
+    :raise OSError when RECV_ERRORS errors come in a row before any packet is read
+    """
+    packets = []
+    errors = 0  # socket errors in a row
+    while len(packets) < limit:
+        buf = pool.take() if pool is not None else bytearray(1024)
+        try:
+            nbytes, addr = sock.recvfrom_into(buf)
+        except (BlockingIOError, InterruptedError):
+            if pool is not None:
+                pool.give(buf)
+            break
+        except OSError:  # ICMP error of an earlier send, skipped unless it keeps coming
+            if pool is not None:
+                pool.give(buf)
+            errors += 1
+            if errors < RECV_ERRORS:
+                continue
+            if packets:  # hand over what was read, the next call raises if the error stays
+                break
+            raise
+        errors = 0
+        packets.append((memoryview(buf)[:nbytes], addr))
+    return packets
 
 
 def make_packet(sequence):  # packet maker
+    if sequence >= 0:  # negative values are control signs
+        sequence %= SEQ_SPACE
     bytes = sequence.to_bytes(4, byteorder='little', signed=True)
     return bytes
 
 
+def make_sack_packet(cum_ack, ranges, window=None):
+    """
+    extended ack maker
+    :param cum_ack: every sequence number up to this one is received
+    :param ranges: received runs above cum_ack as (first seq, length)
+    :param window: advertised receive window in packets, None to leave it out
+    :return packet
+    """
+    ranges = ranges[:MAX_SACK_RANGES]
+    if cum_ack >= 0:
+        cum_ack %= SEQ_SPACE
+    flags = ACK_SACK if window is None else ACK_SACK | ACK_WINDOW
+    packet = bytearray(SACK_HEAD.pack(cum_ack, flags, len(ranges)))
+    if window is not None:
+        packet += SACK_WINDOW.pack(min(window, 0xffff))
+    for start, length in ranges:
+        packet += SACK_RANGE.pack(start % SEQ_SPACE, length)
+    return bytes(packet)
+
+
+def extract_sack_packet(packet):
+    """
+    extended ack extractor, a plain ack is read as one without ranges and window
+    :param packet: received ack
+    :return (cumulative ack, [(first seq, length)], advertised window or None)
+    """
+    if len(packet) < SACK_HEAD.size:
+        return extract_packet(packet), [], None
+    cum_ack, flags, count = SACK_HEAD.unpack_from(packet)
+    offset = SACK_HEAD.size
+    window = None
+    if flags & ACK_WINDOW:
+        window, = SACK_WINDOW.unpack_from(packet, offset)
+        offset += SACK_WINDOW.size
+    return cum_ack, [SACK_RANGE.unpack_from(packet, offset + i * SACK_RANGE.size) for i in range(count)], window
+
+
 def extract_packet(packet):  # packet extractor
     seq_num = int.from_bytes(packet[0:4], byteorder='little',signed=True)
     return seq_num
\ No newline at end of file